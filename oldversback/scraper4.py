@@ -3,7 +3,14 @@ import os
 import logging
 import re
 import random
+import hashlib
+import asyncio
+import threading
+import itertools
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
 from urllib.parse import urlparse, quote_plus
+from dataclasses import dataclass, asdict
 from typing import List, Dict, Any, Optional, Set, Tuple
 
 # --- Scrapy Imports ---
@@ -13,18 +20,39 @@ from scrapy.utils.project import get_project_settings
 from scrapy.spiders import Spider
 from scrapy import signals
 from scrapy.exceptions import CloseSpider
+from scrapy.utils.defer import maybe_deferred_to_future
+from twisted.internet.defer import Deferred
 
 # --- Other Libraries ---
 from dotenv import load_dotenv
 from duckduckgo_search import DDGS
+from duckduckgo_search.exceptions import DuckDuckGoSearchException
 import trafilatura
+from trafilatura.settings import Extractor
 from newspaper import Article, ArticleException
 
 # --- Дополнительные библиотеки для резервного поиска ---
-import requests
-from bs4 import BeautifulSoup
+import httpx
+import lxml.html
+from lxml import etree
+from lxml.cssselect import CSSSelector
 import urllib.parse
 
+# orjson (опционально) - быстрая сериализация результатов в JSON
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    import json
+    ORJSON_AVAILABLE = False
+
+# uvloop (опционально) - более быстрый цикл событий для asyncio
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
 # --- Начальная настройка ---
 load_dotenv()
 
@@ -36,7 +64,7 @@ logging.getLogger('duckduckgo_search').setLevel(logging.INFO)
 logging.getLogger('urllib3').propagate = False
 logging.getLogger('trafilatura').setLevel(logging.WARNING)
 logging.getLogger('newspaper').setLevel(logging.WARNING)
-logging.getLogger('requests').setLevel(logging.WARNING) # Уменьшаем шум от requests
+logging.getLogger('httpx').setLevel(logging.WARNING) # Уменьшаем шум от httpx
 
 # Создаем свой логгер для отслеживания процесса
 logger = logging.getLogger('search_spider')
@@ -51,7 +79,6 @@ if not logger.handlers:
 SEARCH_RESULTS_PER_QUERY = 8  # Увеличим количество запрашиваемых результатов
 SEARCH_DELAY = 4.0  # Немного уменьшаем задержку между запросами поисковиков
 MIN_CONTENT_LENGTH = 150  # Минимальная длина текста
-MAX_RETRIES = 2  # Максимальное количество попыток для поиска (DDG)
 DIVERSE_QUERY_COUNT = 2  # Количество альтернативных формулировок запроса
 
 # Список альтернативных user agents для запросов
@@ -63,9 +90,299 @@ USER_AGENTS = [
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/110.0.0.0 Safari/537.36', # More recent
     'Mozilla/5.0 (iPhone; CPU iPhone OS 14_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Mobile/15E148 Safari/604.1' # Mobile
 ]
+# Round-robin по User-Agent вместо random.choice (next() у itertools.cycle потокобезопасен под GIL)
+_UA_CYCLE = itertools.cycle(USER_AGENTS)
+
+# Домены, для которых подсказываем Newspaper3k русский язык (xn--p1ai - .рф в punycode, так его отдает Scrapy)
+_RU_TLDS = ('.ru', '.рф', '.xn--p1ai', '.su', '.by', '.ua', '.kz')
+# Регулярное выражение для поиска основного блока (компилируется один раз, а не на каждую страницу)
+_MAIN_CLS = re.compile(r'(content|main|body|post|entry)', re.I)
+# Таблица замены "пробельных" символов для очистки текста через str.translate
+_TR = str.maketrans({'\xa0': ' ', '\t': ' ', '\r': ' '})
+
+# Настройки Trafilatura для лучшего извлечения основного контента - собираются один раз.
+# URL не передаем: без метаданных, ссылок и картинок он нужен Trafilatura только для логов.
+_TRAFILATURA_OPTIONS = Extractor(
+    output_format='txt',   # Получить чистый текст
+    comments=False,        # Не включать комментарии
+    tables=True,           # Включать таблицы (могут быть полезны)
+    formatting=True,       # Сохранять базовое форматирование (абзацы)
+    links=False,           # Не включать сами ссылки
+)
+# Простой парсер HTML (последний резерв): основной блок, мусорные теги/блоки и абзацы
+# Все кандидаты на основной блок собираются за один обход дерева (EXSLT-регулярка вместо отдельного поиска по классу)
+_MAIN_CANDIDATES = etree.XPath("//main | //article | //div[@role='main'] | //div[re:test(@class, '(content|main|body|post|entry)', 'i')]",
+                               namespaces={'re': 'http://exslt.org/regular-expressions'})
+# CSS -> XPath компилируется один раз при импорте, а не на каждой странице
+_JUNK = CSSSelector('script, style, nav, footer, header, aside, form, iframe, noscript, .sidebar, #sidebar, .comments, #comments,'
+                    ' .related-posts, .social-links, .ad, [aria-hidden="true"]')
+_PARAGRAPHS_XPATH = etree.XPath('.//p|.//h1|.//h2|.//h3|.//h4|.//h5|.//h6|.//li|.//pre|.//code|.//td|.//th')
+# Для запасного пути через BeautifulSoup: теги абзацев и теги, которые вообще стоит разбирать
+_PARAGRAPH_TAGS = frozenset(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'pre', 'code', 'td', 'th'])
+_BS4_PARSE_TAGS = ['main', 'article', 'body', 'div', 'nav', 'footer', 'header', 'aside', 'script', 'style', *_PARAGRAPH_TAGS]
 
 # --- Вспомогательные функции ---
 
+def normalize_text(text: str) -> str:
+    """Единая очистка текста за один вызов: схлопывает пробелы внутри строк (любой длины серии - за линейное время)
+    и оставляет между абзацами ровно один пустой перенос.
+
+    Делается через str.translate + split/join (C-реализация) вместо нескольких проходов re.sub.
+    """
+    text = text.translate(_TR)
+    paragraphs = [' '.join(words) for words in (line.split() for line in text.split('\n')) if words]
+    return '\n\n'.join(paragraphs)
+
+def parse_html_document(body: bytes, encoding: Optional[str] = None) -> lxml.html.HtmlElement:
+    """Разбирает страницу переиспользуемым парсером текущего потока."""
+    try:
+        return lxml.html.fromstring(body, parser=_get_content_parser(encoding))
+    except Exception:
+        _TL.content_parsers = None # Пересоздадим парсеры при следующем вызове
+        raise
+
+def extract_simple_html_text(doc: lxml.html.HtmlElement) -> str:
+    """Простое извлечение текста из разобранного HTML: основной блок, без мусора, по абзацам.
+
+    Дерево изменяется на месте (мусорные элементы удаляются).
+    """
+    # Ищем основные теги контента
+    # Семантические теги приоритетнее div'ов с "контентным" классом (порядок документа внутри каждой группы)
+    candidates = _MAIN_CANDIDATES(doc)
+    main_content = next((el for el in candidates if el.tag != 'div' or el.get('role') == 'main'), None)
+    if main_content is None and candidates:
+        main_content = candidates[0]
+    if main_content is None:
+        # Если не нашли основной блок, берем body целиком (или весь фрагмент, если body нет)
+        body_element = doc.find('.//body')
+        main_content = body_element if body_element is not None else doc
+
+    # Удаляем ненужные элементы внутри основного блока
+    for element in _JUNK(main_content):
+        element.drop_tree()
+
+    # Получаем текст, сохраняя абзацы
+    paragraphs = _PARAGRAPHS_XPATH(main_content)
+    text_parts = [t for t in (el.text_content().strip() for el in paragraphs) if t] # Берем непустые
+    return '\n\n'.join(text_parts) # Соединяем через двойной перенос строки
+
+def extract_simple_html_text_bs4(body: bytes) -> Optional[str]:
+    """То же, что extract_simple_html_text, но через BeautifulSoup (на случай, если lxml не смог разобрать страницу)."""
+    from bs4 import BeautifulSoup, SoupStrainer # Импортируем только при необходимости - на основном пути bs4 не нужен
+
+    # SoupStrainer отбрасывает <head> и прочее ненужное еще при разборе - дерево заметно меньше
+    soup = BeautifulSoup(body, 'lxml', parse_only=SoupStrainer(_BS4_PARSE_TAGS))
+
+    # Ищем основные теги контента
+    main_content = soup.find('main') or soup.find('article') or soup.find('div', role='main') or soup.find('div', class_=_MAIN_CLS)
+
+    if not main_content:
+        # Если не нашли основной блок, берем body целиком
+        main_content = soup.body
+    if not main_content:
+        return None
+
+    # Удаляем ненужные элементы внутри основного блока
+    for element in main_content.select('script, style, nav, footer, header, aside, form, iframe, noscript, .sidebar, #sidebar, .comments, #comments, .related-posts, .social-links, .ad, [aria-hidden="true"]'):
+        element.extract()
+
+    # Получаем текст, сохраняя абзацы
+    paragraphs = (node for node in main_content.descendants if node.name in _PARAGRAPH_TAGS) # Строки имеют name=None
+    text_parts = [t for t in (p.get_text(strip=True) for p in paragraphs) if t] # Берем непустые, get_text один раз на тег
+    return '\n\n'.join(text_parts) # Соединяем через двойной перенос строки
+
+def extract_title(doc: lxml.html.HtmlElement) -> str:
+    """Заголовок страницы: <title>, а если он пустой или слишком общий - первый <h1>."""
+    title = (doc.findtext('.//title') or "").strip()
+    # Попробуем найти h1, если title пустой или слишком общий
+    if not title or title.lower() in ["home", "index", "blog", "article"]:
+        h1 = doc.find('.//h1')
+        if h1 is not None and h1.text and h1.text.strip():
+            title = h1.text.strip()
+    return title
+
+def extract_article_content(html_bytes: bytes, encoding: str, url: str, language: str, is_small_page: bool) -> Tuple[Optional[str], Optional[str], str]:
+    """Каскад извлечения текста Trafilatura -> Newspaper3k -> простой парсер HTML.
+
+    Функция модульного уровня, чтобы ее можно было выполнять в пуле процессов.
+    Возвращает (text, extraction_method, title); text и method - None, если извлечь не удалось.
+    """
+    extracted_text = None
+    extraction_method = None
+    title = ""
+    # Декодируем страницу один раз и используем текст для обоих тяжелых экстракторов
+    html_text = html_bytes.decode(encoding, errors='replace')
+
+    # 0. Разбираем HTML (lxml быстрее всего на байтах) и извлекаем заголовок
+    doc = None
+    try:
+        doc = parse_html_document(html_bytes, encoding)
+        title = extract_title(doc)
+        # logger.debug(f"  Title extracted: '{title}'")
+    except Exception as e:
+        logger.debug(f"  Could not parse HTML / extract title for {url}: {e}")
+
+    # 1. Попытка с Trafilatura (обычно лучший)
+    if not is_small_page:
+        try:
+            extracted_text = trafilatura.extract(html_text, options=_TRAFILATURA_OPTIONS)
+            if extracted_text:
+                 extracted_text = normalize_text(extracted_text) # Нормализуем пробелы и переносы строк (один раз)
+                 if len(extracted_text) >= MIN_CONTENT_LENGTH:
+                    extraction_method = "trafilatura"
+                    # logger.debug(f"  Extracted ~{len(extracted_text)} chars using Trafilatura.")
+                 else:
+                    # logger.debug(f"  Trafilatura extracted short text ({len(extracted_text)} chars). Discarding.")
+                    extracted_text = None
+            else:
+                 # logger.debug(f"  Trafilatura extracted no text.")
+                 extracted_text = None
+        except Exception as e:
+            extracted_text = None
+            logger.warning(f"  Trafilatura failed for {url}: {e}")
+
+    # 2. Попытка с Newspaper3k (если Trafilatura не сработал)
+    if not extracted_text and not is_small_page:
+        # logger.debug(f"  Trying Newspaper3k fallback for {url}...")
+        try:
+            article = Article(url=url, language=language) # Поможем с языком
+            # Передаем уже загруженный HTML
+            article.download(input_html=html_text)
+            article.parse()
+            if article.text:
+                 article_text = normalize_text(article.text)
+                 if len(article_text) >= MIN_CONTENT_LENGTH:
+                    extracted_text = article_text
+                    extraction_method = "newspaper3k"
+                    # logger.debug(f"  Extracted ~{len(extracted_text)} chars using Newspaper3k (fallback).")
+                    # Попробуем использовать заголовок из newspaper, если наш пуст
+                    if not title and article.title:
+                         title = article.title.strip()
+                 else:
+                     # logger.debug(f"  Newspaper3k extracted short text ({len(article_text)} chars). Discarding.")
+                     extracted_text = None
+            else:
+                 # logger.debug(f"  Newspaper3k extracted no text.")
+                 extracted_text = None
+        except ArticleException as e:
+            extracted_text = None
+            logger.debug(f"  Newspaper3k ArticleException for {url}: {e}")
+        except Exception as e:
+            extracted_text = None
+            logger.warning(f"  Newspaper3k failed unexpectedly for {url}: {e}")
+
+    # 3. Последняя попытка: простой парсинг HTML через lxml (если все остальное не удалось)
+    if not extracted_text:
+        # logger.debug(f"  Trying simple HTML parsing (lxml) for {url}...")
+        raw_text = None
+        try:
+            if doc is not None:
+                raw_text = extract_simple_html_text(doc)
+            else:
+                # lxml не справился с разметкой - пробуем более терпимый BeautifulSoup
+                raw_text = extract_simple_html_text_bs4(html_bytes)
+        except Exception as e:
+            logger.warning(f"  Simple HTML parsing failed for {url}: {e}")
+
+        if raw_text:
+            # Базовая чистка: лишние пробелы внутри строк и лишние переносы
+            clean_text = normalize_text(raw_text)
+
+            if len(clean_text) >= MIN_CONTENT_LENGTH:
+                extracted_text = clean_text
+                extraction_method = "simple_html"
+                # logger.debug(f"  Extracted ~{len(extracted_text)} chars using simple HTML parsing (last resort).")
+            # else: logger.debug(f"  Simple HTML parsing extracted short/no text ({len(clean_text)} chars).")
+        # else: logger.debug(f"  Could not find <body> or main content block for simple parsing.")
+
+    return extracted_text, extraction_method, title
+
+def _deferred_from_future(future: Future) -> Deferred:
+    """Оборачивает concurrent.futures.Future в Deferred, который срабатывает в потоке реактора."""
+    # Импорт здесь, а не на уровне модуля: к этому моменту Scrapy уже установил нужный реактор
+    from twisted.internet import reactor
+
+    d = Deferred()
+
+    def _on_done(f: Future) -> None:
+        try:
+            result = f.result()
+        except BaseException as e:
+            reactor.callFromThread(d.errback, e)
+        else:
+            reactor.callFromThread(d.callback, result)
+
+    future.add_done_callback(_on_done)
+    return d
+
+class BloomFilter:
+    """Простой Bloom-фильтр для дедупликации URL (нет ложноотрицательных, редкие ложноположительные).
+
+    Размер фиксирован (по умолчанию 128KB): ~1M бит, при k=10 хешах ошибка ~0.1% до ~70k URL.
+    """
+
+    def __init__(self, size_bytes: int = 128 * 1024, num_hashes: int = 10):
+        self.num_bits = size_bytes * 8
+        self.num_hashes = num_hashes
+        self.bits = bytearray(size_bytes)
+        self.count = 0 # Приблизительное число добавленных элементов
+
+    def _positions(self, item: str):
+        # Двойное хеширование: h1 + i*h2 из одного 128-битного дайджеста
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str) -> None:
+        is_new = False
+        for pos in self._positions(item):
+            byte_index, mask = pos >> 3, 1 << (pos & 7)
+            if not self.bits[byte_index] & mask:
+                self.bits[byte_index] |= mask
+                is_new = True
+        if is_new:
+            self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def __len__(self) -> int:
+        return self.count
+
+@dataclass(slots=True, frozen=True)
+class ScrapedArticle:
+    """Результат парсинга одной страницы (компактнее dict: без __dict__ на каждый экземпляр)."""
+    query: Optional[str]
+    plan_item: Optional[str]
+    plan_item_id: Optional[str]
+    query_id: Optional[str]
+    url: str
+    title: str
+    text: str
+    extraction_method: str
+    content_length: int
+
+def save_json(data: Any, path: str) -> None:
+    """Сохраняет данные в JSON (UTF-8, отступ 2) через orjson, если он установлен.
+
+    orjson сериализует dataclass'ы (ScrapedArticle) сам, для json они переводятся в dict.
+    """
+    if ORJSON_AVAILABLE:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, default=asdict)
+
+def to_jsonl_line(item: ScrapedArticle) -> bytes:
+    """Одна строка JSONL (UTF-8, с переводом строки) для потоковой записи результата."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(item) + b"\n"
+    return json.dumps(asdict(item), ensure_ascii=False).encode("utf-8") + b"\n"
+
 def generate_alternative_queries(original_query: str) -> List[str]:
     """Генерирует альтернативные формулировки исходного запроса."""
     query_templates = [
@@ -141,7 +458,126 @@ def is_valid_url(url: Optional[str]) -> bool:
 
     return True
 
-def fallback_search_yandex(query: str, num_results: int = 10) -> List[Dict[str, str]]:
+FALLBACK_TIMEOUT = httpx.Timeout(15.0)  # Увеличим таймаут
+FALLBACK_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=8)
+
+# Один долгоживущий цикл событий в отдельном потоке: asyncio.run нельзя вызывать из потока,
+# где уже крутится цикл (реактор Scrapy работает на asyncio), а постоянный цикл позволяет
+# держать один httpx-клиент с пулом соединений на все задачи (DNS/TCP/TLS переиспользуются).
+_fallback_loop: Optional[asyncio.AbstractEventLoop] = None
+_fallback_client: Optional[httpx.AsyncClient] = None
+_fallback_lock = threading.Lock()
+
+def _get_fallback_loop() -> asyncio.AbstractEventLoop:
+    global _fallback_loop
+    with _fallback_lock:
+        if _fallback_loop is None:
+            loop = uvloop.new_event_loop() if UVLOOP_AVAILABLE else asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='fallback_search', daemon=True).start()
+            _fallback_loop = loop
+    return _fallback_loop
+
+def _get_fallback_client() -> httpx.AsyncClient:
+    # Вызывается только из потока цикла, поэтому блокировка не нужна
+    global _fallback_client
+    if _fallback_client is None:
+        _fallback_client = httpx.AsyncClient(timeout=FALLBACK_TIMEOUT, limits=FALLBACK_LIMITS, follow_redirects=True)
+    return _fallback_client
+
+def close_fallback_client() -> None:
+    """Закрывает общий httpx-клиент резервного поиска (если он создавался)."""
+    global _fallback_client
+    if _fallback_loop is None or _fallback_client is None:
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(_fallback_client.aclose(), _fallback_loop).result(timeout=5)
+    except Exception as e:
+        logger.warning(f"Не удалось закрыть httpx-клиент резервного поиска: {e}")
+    _fallback_client = None
+
+_TL = threading.local()
+
+# Селекторы выдачи компилируются один раз (эквивалент 'li.serp-item h2 a[href]' и 'li.b_algo h2 a')
+_YANDEX_LINKS_XPATH = etree.XPath("//li[contains(concat(' ', normalize-space(@class), ' '), ' serp-item ')]//h2//a[@href]")
+_BING_LINKS_XPATH = etree.XPath("//li[contains(concat(' ', normalize-space(@class), ' '), ' b_algo ')]//h2//a")
+
+def _get_parser() -> etree.HTMLParser:
+    """Возвращает переиспользуемый HTMLParser текущего потока."""
+    parser = getattr(_TL, 'parser', None)
+    if parser is None:
+        parser = _TL.parser = etree.HTMLParser(recover=True, encoding='utf-8')
+    return parser
+
+def _get_content_parser(encoding: Optional[str] = None) -> lxml.html.HTMLParser:
+    """Возвращает переиспользуемый парсер страниц-статей текущего потока (по одному на кодировку).
+
+    Комментарии и processing instructions отбрасываются еще при разборе - дерево меньше,
+    обход быстрее. Кодировку берем из ответа (Scrapy уже определил ее по заголовкам/<meta>),
+    иначе lxml считает байты без <meta charset> латиницей.
+    """
+    parsers = getattr(_TL, 'content_parsers', None)
+    if parsers is None:
+        parsers = _TL.content_parsers = {}
+    parser = parsers.get(encoding)
+    if parser is None:
+        parser = parsers[encoding] = lxml.html.HTMLParser(encoding=encoding, remove_comments=True, remove_pis=True)
+    return parser
+
+def _parse_serp_links(body: bytes, links_xpath: etree.XPath) -> List[etree._Element]:
+    try:
+        tree = etree.fromstring(body, _get_parser())
+    except Exception:
+        # Парсер мог остаться в неконсистентном состоянии - пересоздадим при следующем вызове
+        _TL.parser = None
+        raise
+    if tree is None: # Пустой документ
+        return []
+    return links_xpath(tree)
+
+def _parse_yandex_serp(body: bytes, num_results: int) -> List[Dict[str, str]]:
+    """Разбирает выдачу Yandex и возвращает валидные результаты."""
+    results = []
+    # Ищем ссылки в результатах поиска. Селекторы могут меняться!
+    # Используем более общий селектор для ссылки внутри заголовка результата
+    links = _parse_serp_links(body, _YANDEX_LINKS_XPATH)
+
+    for link in links:
+        url = link.get('href')
+        # Яндекс может добавлять мусор, чистим URL
+        if url and url.startswith('http') and 'yandex.ru/clck/' not in url:
+             # Проверяем валидность *после* базовой очистки
+            if is_valid_url(url):
+                title = ''.join(link.itertext()).strip()
+                # logger.debug(f"  [Yandex Found]: {title} - {url}")
+                results.append({'href': url, 'title': title})
+                if len(results) >= num_results:
+                    break
+        # else: logger.debug(f"  [Yandex Skipped Invalid URL]: {url}")
+    return results
+
+def _parse_bing_serp(body: bytes, num_results: int) -> List[Dict[str, str]]:
+    """Разбирает выдачу Bing и возвращает валидные результаты."""
+    results = []
+    # Селектор для ссылок в результатах Bing (может измениться)
+    links = _parse_serp_links(body, _BING_LINKS_XPATH)
+
+    for link in links:
+        url = link.get('href')
+        if url and is_valid_url(url): # Bing обычно дает чистые URL
+            title = ''.join(link.itertext()).strip()
+            # logger.debug(f"  [Bing Found]: {title} - {url}")
+            results.append({'href': url, 'title': title})
+            if len(results) >= num_results:
+                break
+        # else: logger.debug(f"  [Bing Skipped Invalid URL]: {url}")
+    return results
+
+async def _fetch(client: httpx.AsyncClient, url: str, headers: Dict[str, str]) -> bytes:
+    response = await client.get(url, headers=headers)
+    response.raise_for_status() # Проверка на HTTP ошибки
+    return response.content
+
+async def _async_fallback_yandex(client: httpx.AsyncClient, query: str, num_results: int = 10) -> List[Dict[str, str]]:
     """Резервный поиск через Yandex (без использования API)."""
     results = []
     encoded_query = quote_plus(query)
@@ -149,42 +585,20 @@ def fallback_search_yandex(query: str, num_results: int = 10) -> List[Dict[str,
     search_url = f"https://yandex.ru/search/?text={encoded_query}&lr=213"
 
     headers = {
-        'User-Agent': random.choice(USER_AGENTS),
+        'User-Agent': next(_UA_CYCLE),
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
         'Accept-Language': 'ru-RU,ru;q=0.8,en-US;q=0.5,en;q=0.3',
         'Referer': 'https://yandex.ru/',
         'DNT': '1',
-        'Connection': 'keep-alive',
         'Upgrade-Insecure-Requests': '1',
         'Cache-Control': 'max-age=0',
     }
 
     try:
         #logger.info(f"Fallback search: Requesting Yandex for '{query}'")
-        response = requests.get(search_url, headers=headers, timeout=15) # Увеличим таймаут
-        response.raise_for_status() # Проверка на HTTP ошибки
-
-        soup = BeautifulSoup(response.text, 'html.parser')
-        # Ищем ссылки в результатах поиска. Селекторы могут меняться!
-        # Используем более общий селектор для ссылки внутри заголовка результата
-        links = soup.select('li.serp-item h2 a[href]')
-
-        found_count = 0
-        for link in links:
-            url = link.get('href')
-            # Яндекс может добавлять мусор, чистим URL
-            if url and url.startswith('http') and 'yandex.ru/clck/' not in url:
-                 # Проверяем валидность *после* базовой очистки
-                if is_valid_url(url):
-                    title = link.get_text(strip=True)
-                    # logger.debug(f"  [Yandex Found]: {title} - {url}")
-                    results.append({'href': url, 'title': title})
-                    found_count += 1
-                    if found_count >= num_results:
-                        break
-            # else: logger.debug(f"  [Yandex Skipped Invalid URL]: {url}")
-
-    except requests.exceptions.RequestException as e:
+        body = await _fetch(client, search_url, headers)
+        results = _parse_yandex_serp(body, num_results)
+    except httpx.HTTPError as e:
         logger.error(f"Ошибка при поиске через Yandex ({type(e).__name__}): {e}")
     except Exception as e:
         logger.error(f"Неожиданная ошибка при поиске через Yandex: {e}")
@@ -192,44 +606,26 @@ def fallback_search_yandex(query: str, num_results: int = 10) -> List[Dict[str,
     logger.info(f"Yandex fallback for '{query}' returned {len(results)} valid results.")
     return results
 
-def fallback_search_bing(query: str, num_results: int = 10) -> List[Dict[str, str]]:
+async def _async_fallback_bing(client: httpx.AsyncClient, query: str, num_results: int = 10) -> List[Dict[str, str]]:
     """Резервный поиск через Bing (без использования API)."""
     results = []
     encoded_query = quote_plus(query)
     search_url = f"https://www.bing.com/search?q={encoded_query}"
 
     headers = {
-        'User-Agent': random.choice(USER_AGENTS),
+        'User-Agent': next(_UA_CYCLE),
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
         'Accept-Language': 'en-US,en;q=0.9,ru;q=0.8', # Добавим русский язык
         'Referer': 'https://www.bing.com/',
         'DNT': '1',
-        'Connection': 'keep-alive',
         'Upgrade-Insecure-Requests': '1',
     }
 
     try:
         #logger.info(f"Fallback search: Requesting Bing for '{query}'")
-        response = requests.get(search_url, headers=headers, timeout=15) # Увеличим таймаут
-        response.raise_for_status()
-
-        soup = BeautifulSoup(response.text, 'html.parser')
-        # Селектор для ссылок в результатах Bing (может измениться)
-        links = soup.select("li.b_algo h2 a")
-
-        found_count = 0
-        for link in links:
-            url = link.get('href')
-            if url and is_valid_url(url): # Bing обычно дает чистые URL
-                title = link.get_text(strip=True)
-                # logger.debug(f"  [Bing Found]: {title} - {url}")
-                results.append({'href': url, 'title': title})
-                found_count += 1
-                if found_count >= num_results:
-                    break
-            # else: logger.debug(f"  [Bing Skipped Invalid URL]: {url}")
-
-    except requests.exceptions.RequestException as e:
+        body = await _fetch(client, search_url, headers)
+        results = _parse_bing_serp(body, num_results)
+    except httpx.HTTPError as e:
         logger.error(f"Ошибка при поиске через Bing ({type(e).__name__}): {e}")
     except Exception as e:
         logger.error(f"Неожиданная ошибка при поиске через Bing: {e}")
@@ -237,6 +633,19 @@ def fallback_search_bing(query: str, num_results: int = 10) -> List[Dict[str, st
     logger.info(f"Bing fallback for '{query}' returned {len(results)} valid results.")
     return results
 
+async def _async_fallback_all(query: str, num_results: int) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+    client = _get_fallback_client()
+    yandex_results, bing_results = await asyncio.gather(
+        _async_fallback_yandex(client, query, num_results),
+        _async_fallback_bing(client, query, num_results),
+    )
+    return yandex_results, bing_results
+
+def fallback_search_concurrent(query: str, num_results: int = 10) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+    """Параллельно запрашивает Yandex и Bing, возвращает (yandex_results, bing_results)."""
+    future = asyncio.run_coroutine_threadsafe(_async_fallback_all(query, num_results), _get_fallback_loop())
+    return future.result()
+
 # --- Улучшенный Spider ---
 
 class EnhancedArticleSpider(Spider):
@@ -246,8 +655,9 @@ class EnhancedArticleSpider(Spider):
     urls_found_for_task: Dict[Tuple[str, str], Set[str]] # {(plan_item_id, query_id): {set_of_urls}}
     urls_to_scrape: Dict[str, Dict[str, Any]]           # {url: original_task_info}
     failed_searches: List[Dict[str, Any]]               # Отслеживаем неудачные *задачи* (если ни один URL не найден)
-    processed_urls: Set[str]                            # URL, для которых уже был yield Request
-    visited_urls: Set[str]                              # URL, которые были успешно или неуспешно обработаны parse_article/handle_error
+    processed_urls: BloomFilter                         # URL, для которых уже был yield Request
+    visited_urls: BloomFilter                           # URL, которые были успешно или неуспешно обработаны parse_article/handle_error
+    _lang_cache: Dict[str, str]                         # {hostname: 'ru' | 'en'} - подсказка языка для Newspaper3k
 
     def __init__(self, search_tasks: List[Dict[str, Any]] = None, results_per_query: int = 3, *args, **kwargs):
         super(EnhancedArticleSpider, self).__init__(*args, **kwargs)
@@ -263,8 +673,10 @@ class EnhancedArticleSpider(Spider):
         self.urls_found_for_task = {}
         self.urls_to_scrape = {}
         self.failed_searches = []
-        self.processed_urls = set()
-        self.visited_urls = set()
+        self.processed_urls = BloomFilter()
+        self.visited_urls = BloomFilter()
+        self._lang_cache = {}
+        self._extraction_pool = None # ProcessPoolExecutor для извлечения текста, создается при первом ответе
 
         self.logger.info(f"Spider initialized for {len(search_tasks)} search tasks (target: {results_per_query} results per query).")
 
@@ -326,26 +738,14 @@ class EnhancedArticleSpider(Spider):
                 if not new_urls_from_ddg and query_index == 0 and task_urls_found_count < self.results_per_query:
                     self.logger.info(f"DDG found no new URLs for the primary query variation, trying fallback search...")
 
-                    # Пробуем Yandex
-                    if task_urls_found_count < self.results_per_query:
-                        try:
-                             new_urls_from_yandex = self._search_with_fallback(query, task_info, task_key, 'yandex')
-                             task_urls_found_count += len(new_urls_from_yandex)
-                             self.logger.info(f"Yandex added {len(new_urls_from_yandex)} new URLs. Total for task {task_key}: {task_urls_found_count}")
-                             if new_urls_from_yandex: time.sleep(SEARCH_DELAY * 0.5) # Краткая пауза после успешного fallback
-                        except Exception as e:
-                             self.logger.error(f"Unexpected error during Yandex fallback for '{query}': {e}")
-
-
-                    # Если все еще недостаточно, пробуем Bing
-                    if task_urls_found_count < self.results_per_query:
-                        try:
-                            new_urls_from_bing = self._search_with_fallback(query, task_info, task_key, 'bing')
-                            task_urls_found_count += len(new_urls_from_bing)
-                            self.logger.info(f"Bing added {len(new_urls_from_bing)} new URLs. Total for task {task_key}: {task_urls_found_count}")
-                            if new_urls_from_bing: time.sleep(SEARCH_DELAY * 0.5) # Краткая пауза
-                        except Exception as e:
-                            self.logger.error(f"Unexpected error during Bing fallback for '{query}': {e}")
+                    # Yandex и Bing запрашиваются параллельно, результаты разбираются по очереди
+                    try:
+                        new_urls_from_fallback = self._search_with_fallback(query, task_info, task_key)
+                        task_urls_found_count += len(new_urls_from_fallback)
+                        self.logger.info(f"Fallback search added {len(new_urls_from_fallback)} new URLs. Total for task {task_key}: {task_urls_found_count}")
+                        if new_urls_from_fallback: time.sleep(SEARCH_DELAY * 0.5) # Краткая пауза после успешного fallback
+                    except Exception as e:
+                        self.logger.error(f"Unexpected error during fallback search for '{query}': {e}")
 
             # Итоги по задаче
             self.logger.info(f"--- Task {task_key} Search Summary ---")
@@ -392,12 +792,13 @@ class EnhancedArticleSpider(Spider):
             # Не используем CloseSpider здесь, т.к. процесс должен завершиться штатно
             return # Просто не генерируем запросы
 
-        self.logger.info(f"\n--- Starting Scrapy Download Phase for {len(self.urls_to_scrape)} URLs ---")
+        total_urls_to_scrape = len(self.urls_to_scrape)
+        self.logger.info(f"\n--- Starting Scrapy Download Phase for {total_urls_to_scrape} URLs ---")
         request_count = 0
         for url, task_info in self.urls_to_scrape.items():
             if url not in self.processed_urls:
                 request_count += 1
-                self.logger.debug(f"Yielding request {request_count}/{len(self.urls_to_scrape)}: {url}")
+                self.logger.debug(f"Yielding request {request_count}/{total_urls_to_scrape}: {url}")
                 self.processed_urls.add(url)
                 yield scrapy.Request(
                     url,
@@ -412,11 +813,13 @@ class EnhancedArticleSpider(Spider):
                         'retry_times': 0
                     },
                     # Добавим случайный User-Agent для каждого запроса
-                    headers={'User-Agent': random.choice(USER_AGENTS)}
+                    headers={'User-Agent': next(_UA_CYCLE)}
                 )
             else:
                  self.logger.debug(f"Skipping already processed URL: {url}")
 
+        # task_info уже передан в meta каждого запроса, точный словарь больше не нужен
+        self.urls_to_scrape.clear()
 
     def _add_url_if_valid(self, url: str, task_info: Dict[str, Any], task_key: Tuple[str, str], source: str) -> bool:
         """Проверяет URL, добавляет его в общие и задачные списки, если он валиден и нов."""
@@ -449,9 +852,12 @@ class EnhancedArticleSpider(Spider):
             return False
 
     def _search_with_ddg(self, query: str, task_info: Dict[str, Any], task_key: Tuple[str, str]) -> List[str]:
-        """Выполняет поиск через DuckDuckGo и возвращает список *новых* URL, добавленных для этой задачи."""
+        """Выполняет поиск через DuckDuckGo и возвращает список *новых* URL, добавленных для этой задачи.
+
+        Повторные попытки не делаем: DDGS сам ретраит запросы, а ошибки обычно вызваны
+        rate-limit'ом, поэтому при сбое сразу возвращаемся, чтобы сработал резервный поиск.
+        """
         newly_added_urls = []
-        retry_count = 0
         task_urls = self.urls_found_for_task.setdefault(task_key, set())
         results_needed_for_task = self.results_per_query - len(task_urls)
 
@@ -459,101 +865,100 @@ class EnhancedArticleSpider(Spider):
              # self.logger.debug(f"DDG search skipped for '{query}', task {task_key} already has enough URLs.")
              return newly_added_urls # Уже достаточно URL для этой задачи
 
-        while retry_count < MAX_RETRIES:
-            try:
-                # Запрашиваем немного больше результатов, т.к. будем фильтровать
-                # Учитываем, сколько уже найдено для этой задачи
-                max_results_to_fetch = results_needed_for_task + 8
-                self.logger.info(f"DDG search for '{query}' (Task: {task_key}, Attempt: {retry_count+1}/{MAX_RETRIES}, Need: {results_needed_for_task}, Fetching: {max_results_to_fetch})")
-
-                # Используем контекстный менеджер DDGS
-                with DDGS(headers={'User-Agent': random.choice(USER_AGENTS)}, timeout=20) as ddgs:
-                    results_iterator = ddgs.text(query, max_results=max_results_to_fetch)
-
-                    results_processed = 0
-                    if results_iterator:
-                        for r in results_iterator:
-                             # Проверяем, не набрали ли уже достаточно для задачи *во время* итерации
-                             if len(self.urls_found_for_task[task_key]) >= self.results_per_query:
-                                 break
-
-                             if r and isinstance(r, dict) and 'href' in r:
-                                 url = r.get('href')
-                                 results_processed += 1
-                                 if self._add_url_if_valid(url, task_info, task_key, "DDG"):
-                                     newly_added_urls.append(url)
-                             else:
-                                 self.logger.debug(f"  [DDG Invalid Result Format]: {r}")
-
-
-                        self.logger.debug(f"DDG processed {results_processed} results for '{query}'.")
-                        # Если обработали результаты, выходим из цикла попыток
-                        break
-                    else:
-                        self.logger.warning(f"DDG returned no results iterator for query '{query}'")
-                        # Не выходим, попробуем еще раз
+        try:
+            # Запрашиваем немного больше результатов, т.к. будем фильтровать
+            # Учитываем, сколько уже найдено для этой задачи
+            max_results_to_fetch = results_needed_for_task + 8
+            self.logger.info(f"DDG search for '{query}' (Task: {task_key}, Need: {results_needed_for_task}, Fetching: {max_results_to_fetch})")
 
-            except Exception as e:
-                self.logger.error(f"Error during DDG search for '{query}' (Attempt {retry_count+1}): {type(e).__name__} - {e}")
-                # Можно добавить обработку специфических ошибок, например, таймаутов
-
-            # Увеличиваем счетчик попыток и делаем задержку перед следующей попыткой
-            retry_count += 1
-            if retry_count < MAX_RETRIES:
-                retry_delay = SEARCH_DELAY * (0.5 + retry_count * 0.3) # Увеличиваем задержку
-                self.logger.info(f"Retrying DDG search in {retry_delay:.2f}s...")
-                time.sleep(retry_delay)
-            else:
-                 self.logger.warning(f"Max retries reached for DDG search on '{query}'.")
+            # Используем контекстный менеджер DDGS
+            with DDGS(headers={'User-Agent': next(_UA_CYCLE)}, timeout=20) as ddgs:
+                results_iterator = ddgs.text(query, max_results=max_results_to_fetch)
+
+                if not results_iterator:
+                    self.logger.warning(f"DDG returned no results iterator for query '{query}'")
+                    return newly_added_urls
+
+                results_processed = 0
+                for r in results_iterator:
+                     # Проверяем, не набрали ли уже достаточно для задачи *во время* итерации
+                     if len(self.urls_found_for_task[task_key]) >= self.results_per_query:
+                         break
+
+                     if r and isinstance(r, dict) and 'href' in r:
+                         url = r.get('href')
+                         results_processed += 1
+                         if self._add_url_if_valid(url, task_info, task_key, "DDG"):
+                             newly_added_urls.append(url)
+                     else:
+                         self.logger.debug(f"  [DDG Invalid Result Format]: {r}")
+
+                self.logger.debug(f"DDG processed {results_processed} results for '{query}'.")
+
+        except DuckDuckGoSearchException as e:
+            # DDGS уже отработал свои внутренние ретраи - сразу уходим на резервный поиск
+            self.logger.warning(f"DDG search failed for '{query}': {type(e).__name__} - {e}")
+        except Exception as e:
+            self.logger.error(f"Unexpected error during DDG search for '{query}': {type(e).__name__} - {e}")
 
         return newly_added_urls
 
-    def _search_with_fallback(self, query: str, task_info: Dict[str, Any], task_key: Tuple[str, str], search_engine: str) -> List[str]:
-        """Выполняет поиск через запасной поисковик и возвращает список *новых* URL, добавленных для этой задачи."""
+    def _search_with_fallback(self, query: str, task_info: Dict[str, Any], task_key: Tuple[str, str]) -> List[str]:
+        """Выполняет поиск через запасные поисковики (Yandex и Bing параллельно) и возвращает список *новых* URL, добавленных для этой задачи."""
         newly_added_urls = []
         task_urls = self.urls_found_for_task.setdefault(task_key, set())
         results_needed_for_task = self.results_per_query - len(task_urls)
 
         if results_needed_for_task <= 0:
-            # self.logger.debug(f"{search_engine.capitalize()} fallback skipped for '{query}', task {task_key} already has enough URLs.")
+            # self.logger.debug(f"Fallback skipped for '{query}', task {task_key} already has enough URLs.")
             return newly_added_urls
 
-        self.logger.info(f"Trying fallback search via {search_engine.capitalize()} for '{query}' (Task: {task_key}, Need: {results_needed_for_task})")
+        self.logger.info(f"Trying fallback search via Yandex + Bing for '{query}' (Task: {task_key}, Need: {results_needed_for_task})")
 
         try:
-            results = []
-            # Выбираем функцию поиска
-            if search_engine == 'yandex':
-                results = fallback_search_yandex(query, num_results=results_needed_for_task + 5)
-            elif search_engine == 'bing':
-                results = fallback_search_bing(query, num_results=results_needed_for_task + 5)
-            else:
-                self.logger.error(f"Unknown fallback search engine: {search_engine}")
-                return newly_added_urls
+            yandex_results, bing_results = fallback_search_concurrent(query, num_results=results_needed_for_task + 5)
+        except Exception as e:
+            self.logger.error(f"Error during fallback search for '{query}': {type(e).__name__} - {e}")
+            return newly_added_urls
 
-            # Обрабатываем результаты
-            if results:
-                results_processed = 0
-                for r in results:
-                    # Проверяем лимит задачи внутри цикла
-                    if len(self.urls_found_for_task[task_key]) >= self.results_per_query:
-                        break
+        # Обрабатываем результаты: сначала Yandex, затем Bing, если URL все еще не хватает
+        for search_engine, results in (('Yandex', yandex_results), ('Bing', bing_results)):
+            if len(self.urls_found_for_task[task_key]) >= self.results_per_query:
+                break
+            if not results:
+                self.logger.warning(f"No results from {search_engine} fallback for query '{query}'")
+                continue
 
-                    url = r.get('href')
-                    results_processed += 1
-                    if self._add_url_if_valid(url, task_info, task_key, search_engine.capitalize()):
-                        newly_added_urls.append(url)
+            results_processed = 0
+            for r in results:
+                # Проверяем лимит задачи внутри цикла
+                if len(self.urls_found_for_task[task_key]) >= self.results_per_query:
+                    break
 
-                self.logger.debug(f"{search_engine.capitalize()} processed {results_processed} results for '{query}'.")
-            else:
-                self.logger.warning(f"No results from {search_engine.capitalize()} fallback for query '{query}'")
+                url = r.get('href')
+                results_processed += 1
+                if self._add_url_if_valid(url, task_info, task_key, search_engine):
+                    newly_added_urls.append(url)
 
-        except Exception as e:
-            self.logger.error(f"Error during {search_engine.capitalize()} fallback search for '{query}': {type(e).__name__} - {e}")
+            self.logger.debug(f"{search_engine} processed {results_processed} results for '{query}'.")
 
         return newly_added_urls
 
-    def parse_article(self, response):
+    def _guess_language(self, url: str) -> str:
+        """Подсказка языка для Newspaper3k по домену верхнего уровня (кэшируется по хосту)."""
+        host = urlparse(url).hostname or ''
+        lang = self._lang_cache.get(host)
+        if lang is None:
+            lang = self._lang_cache[host] = 'ru' if host.endswith(_RU_TLDS) else 'en'
+        return lang
+
+    def _get_extraction_pool(self) -> ProcessPoolExecutor:
+        # Пул создается лениво; 'spawn' - потому что в процессе уже работают потоки (реактор, резервный поиск)
+        if self._extraction_pool is None:
+            self._extraction_pool = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context('spawn'))
+        return self._extraction_pool
+
+    async def parse_article(self, response):
         # Шаг 3: Парсинг контента страницы
         url = response.url
         task_info = response.meta.get('task_info', {})
@@ -568,149 +973,48 @@ class EnhancedArticleSpider(Spider):
              # Не возвращаем item
              return
 
-        # Проверяем Content-Type (на всякий случай, если не HTML)
-        content_type = response.headers.get('Content-Type', b'').decode('utf-8', errors='ignore').lower()
-        if 'html' not in content_type and 'text' not in content_type:
-            self.logger.warning(f"Skipping non-HTML content: {url} (Type: {content_type})")
+        # Проверяем Content-Type (на всякий случай, если не HTML) - прямо в байтах, без декодирования
+        content_type = response.headers.get('Content-Type', b'').lower()
+        if b'html' not in content_type and b'text' not in content_type:
+            self.logger.warning(f"Skipping non-HTML content: {url} (Type: {content_type.decode('latin-1')})")
+            self.crawler.stats.inc_value('enhanced_spider/skipped_non_html')
             return
 
-        extracted_text = None
-        extraction_method = None
-        title = ""
-
-        # 0. Попытка извлечь заголовок (лучше сделать до извлечения текста)
-        try:
-            title = response.css('title::text').get() or ""
-            title = title.strip()
-            # Попробуем найти h1, если title пустой или слишком общий
-            if not title or title.lower() in ["home", "index", "blog", "article"]:
-                 h1_text = response.css('h1::text').get()
-                 if h1_text:
-                      title = h1_text.strip()
-            # self.logger.debug(f"  Title extracted: '{title}'")
-        except Exception as e:
-            self.logger.debug(f"  Could not extract title for {url}: {e}")
-            title = ""
+        html_bytes = response.body
+        # На крошечных страницах Trafilatura/Newspaper3k заведомо не наберут MIN_CONTENT_LENGTH - сразу к простому парсеру
+        is_small_page = len(html_bytes) < MIN_CONTENT_LENGTH * 3
+        if is_small_page:
+            self.crawler.stats.inc_value('enhanced_spider/small_page_heavy_extractors_skipped')
 
-
-        # 1. Попытка с Trafilatura (обычно лучший)
+        # Извлечение текста нагружает CPU - выполняем его в пуле процессов, реактор тем временем продолжает загрузки
         try:
-            # Настройки Trafilatura для лучшего извлечения основного контента
-            extracted_text = trafilatura.extract(
-                response.body,
-                include_comments=False,    # Не включать комментарии
-                include_tables=True,       # Включать таблицы (могут быть полезны)
-                include_formatting=True,   # Сохранять базовое форматирование (абзацы)
-                include_links=False,       # Не включать сами ссылки
-                output_format='text',      # Получить чистый текст
-                url=url                    # Передаем URL для контекста
+            future = self._get_extraction_pool().submit(
+                extract_article_content, html_bytes, response.encoding, url, self._guess_language(url), is_small_page
             )
-            if extracted_text:
-                 extracted_text = extracted_text.strip() # Убираем пробелы по краям
-                 if len(extracted_text) >= MIN_CONTENT_LENGTH:
-                    extraction_method = "trafilatura"
-                    # self.logger.debug(f"  Extracted ~{len(extracted_text)} chars using Trafilatura.")
-                 else:
-                    # self.logger.debug(f"  Trafilatura extracted short text ({len(extracted_text)} chars). Discarding.")
-                    extracted_text = None
-            else:
-                 # self.logger.debug(f"  Trafilatura extracted no text.")
-                 extracted_text = None
+            extracted_text, extraction_method, title = await maybe_deferred_to_future(_deferred_from_future(future))
         except Exception as e:
-            extracted_text = None
-            self.logger.warning(f"  Trafilatura failed for {url}: {e}")
-
-        # 2. Попытка с Newspaper3k (если Trafilatura не сработал)
-        if not extracted_text:
-            # self.logger.debug(f"  Trying Newspaper3k fallback for {url}...")
-            try:
-                article = Article(url=url, language='ru' if '.ru/' in url or '.рф/' in url else 'en') # Поможем с языком
-                # Передаем уже загруженный HTML
-                article.download(input_html=response.body.decode(response.encoding, errors='ignore'))
-                article.parse()
-                if article.text:
-                     article_text = article.text.strip()
-                     if len(article_text) >= MIN_CONTENT_LENGTH:
-                        extracted_text = article_text
-                        extraction_method = "newspaper3k"
-                        # self.logger.debug(f"  Extracted ~{len(extracted_text)} chars using Newspaper3k (fallback).")
-                        # Попробуем использовать заголовок из newspaper, если наш пуст
-                        if not title and article.title:
-                             title = article.title.strip()
-                     else:
-                         # self.logger.debug(f"  Newspaper3k extracted short text ({len(article_text)} chars). Discarding.")
-                         extracted_text = None
-                else:
-                     # self.logger.debug(f"  Newspaper3k extracted no text.")
-                     extracted_text = None
-            except ArticleException as e:
-                extracted_text = None
-                self.logger.debug(f"  Newspaper3k ArticleException for {url}: {e}")
-            except Exception as e:
-                extracted_text = None
-                self.logger.warning(f"  Newspaper3k failed unexpectedly for {url}: {e}")
-
-        # 3. Последняя попытка: простой парсинг HTML с BeautifulSoup (если все остальное не удалось)
-        if not extracted_text:
-            # self.logger.debug(f"  Trying simple HTML parsing (BeautifulSoup) for {url}...")
-            try:
-                soup = BeautifulSoup(response.body, 'lxml') # Используем lxml для скорости
-
-                # Ищем основные теги контента
-                main_content = soup.find('main') or soup.find('article') or soup.find('div', role='main') or soup.find('div', class_=re.compile(r'(content|main|body|post|entry)', re.I))
-
-                if not main_content:
-                    # Если не нашли основной блок, берем body целиком
-                    main_content = soup.body
-
-                if main_content:
-                    # Удаляем ненужные элементы внутри основного блока
-                    for element in main_content.select('script, style, nav, footer, header, aside, form, iframe, noscript, .sidebar, #sidebar, .comments, #comments, .related-posts, .social-links, .ad, [aria-hidden="true"]'):
-                        element.extract()
-
-                    # Получаем текст, сохраняя абзацы
-                    paragraphs = main_content.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'pre', 'code', 'td', 'th'])
-                    text_parts = [p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True)] # Берем непустые
-                    raw_text = '\n\n'.join(text_parts) # Соединяем через двойной перенос строки
-
-                    # Базовая чистка
-                    clean_text = re.sub(r'\s{2,}', ' ', raw_text).strip() # Убираем лишние пробелы внутри
-                    clean_text = re.sub(r'\n{3,}', '\n\n', clean_text)    # Убираем лишние переносы строк
-
-                    if len(clean_text) >= MIN_CONTENT_LENGTH:
-                        extracted_text = clean_text
-                        extraction_method = "simple_html"
-                        # self.logger.debug(f"  Extracted ~{len(extracted_text)} chars using simple HTML parsing (last resort).")
-                    else:
-                        # self.logger.debug(f"  Simple HTML parsing extracted short/no text ({len(clean_text)} chars).")
-                        pass # Не сбрасываем extracted_text в None здесь
-                else:
-                     # self.logger.debug(f"  Could not find <body> or main content block for simple parsing.")
-                     pass
-
-            except Exception as e:
-                self.logger.warning(f"  Simple HTML parsing failed for {url}: {e}")
+            self.logger.error(f"  Content extraction failed for {url}: {type(e).__name__} - {e}")
+            return
 
         # Генерируем результат, если удалось извлечь текст
         if extracted_text:
-            self.logger.info(f"✅ Successfully extracted text from: {url} (Method: {extraction_method}, Length: {len(extracted_text)})")
-            # Финальная очистка текста
-            cleaned_text = re.sub(r'\s{2,}', ' ', extracted_text.strip())
-            cleaned_text = re.sub(r'(\r\n|\r|\n){2,}', '\n\n', cleaned_text) # Нормализуем переносы строк
+            # Текст уже нормализован сразу после извлечения - длину считаем один раз
+            content_length = len(extracted_text)
+            self.logger.info(f"✅ Successfully extracted text from: {url} (Method: {extraction_method}, Length: {content_length})")
 
-            yield {
+            yield ScrapedArticle(
                 # Метаданные из исходной задачи
-                'query': task_info.get('query'),
-                'plan_item': task_info.get('plan_item'),
-                'plan_item_id': task_info.get('plan_item_id'),
-                'query_id': task_info.get('query_id'),
+                query=task_info.get('query'),
+                plan_item=task_info.get('plan_item'),
+                plan_item_id=task_info.get('plan_item_id'),
+                query_id=task_info.get('query_id'),
                 # Результаты парсинга
-                'url': url,
-                'title': title or "No Title Found", # Предоставляем значение по умолчанию
-                'text': cleaned_text,
-                'extraction_method': extraction_method,
-                'content_length': len(cleaned_text)
-            }
+                url=url,
+                title=title or "No Title Found", # Предоставляем значение по умолчанию
+                text=extracted_text,
+                extraction_method=extraction_method,
+                content_length=content_length
+            )
         else:
             self.logger.warning(f"❌ Failed to extract significant text content from: {url} after all attempts.")
             # Можно вернуть item с пустым текстом или не возвращать ничего
@@ -747,10 +1051,18 @@ class EnhancedArticleSpider(Spider):
             self.logger.error(f"  Retry attempt: {retry_times}")
             # Можно добавить логику для отслеживания постоянно падающих URL или доменов
 
+    def closed(self, reason):
+        # Освобождаем пул соединений резервного поиска и пул процессов извлечения текста
+        close_fallback_client()
+        if self._extraction_pool is not None:
+            self._extraction_pool.shutdown(wait=False, cancel_futures=True)
+            self._extraction_pool = None
+
 
 # --- Функция для запуска Scrapy из скрипта ---
 
-def run_enhanced_scrape(search_tasks: List[Dict[str, Any]], results_per_query: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+def run_enhanced_scrape(search_tasks: List[Dict[str, Any]], results_per_query: int, max_concurrency: int = 32,
+                        jsonl_path: Optional[str] = None) -> Tuple[List[ScrapedArticle], List[Dict[str, Any]]]:
     """
     Запускает улучшенный процесс поиска и скрапинга для всех задач.
 
@@ -759,10 +1071,15 @@ def run_enhanced_scrape(search_tasks: List[Dict[str, Any]], results_per_query: i
                       Каждый словарь должен содержать как минимум 'query'.
                       Желательно также 'plan_item', 'plan_item_id', 'query_id' для лучшей организации.
         results_per_query: Желаемое количество *успешно спарсенных* сайтов на каждый запрос (цель, не гарантия).
+        max_concurrency: Общее число одновременных загрузок. Вежливость обеспечивается лимитом
+                         в 1 запрос на домен, поэтому глобальный лимит можно держать высоким.
+        jsonl_path: Если задан, каждый результат сразу дописывается строкой в этот JSONL-файл
+                    и не накапливается в памяти (расход памяти не зависит от размера обхода).
 
     Returns:
         Кортеж из двух списков:
-        1. Успешно спарсенные источники (list of dicts, как yield паука).
+        1. Успешно спарсенные источники (list of ScrapedArticle, как yield паука).
+           При заданном jsonl_path список пуст - результаты находятся в файле.
         2. Задачи, для которых не удалось найти ни одного URL (list of dicts, исходные задачи).
     """
     if not search_tasks:
@@ -774,6 +1091,9 @@ def run_enhanced_scrape(search_tasks: List[Dict[str, Any]], results_per_query: i
     if not isinstance(results_per_query, int) or results_per_query <= 0:
         logger.error("Ошибка: 'results_per_query' должен быть положительным целым числом.")
         return [], []
+    if not isinstance(max_concurrency, int) or max_concurrency <= 0:
+        logger.error("Ошибка: 'max_concurrency' должен быть положительным целым числом.")
+        return [], []
 
     logger.info(f"\n=== Запуск улучшенного поиска и скрапинга для {len(search_tasks)} задач ===")
     logger.info(f"Целевое количество URL на задачу: {results_per_query}")
@@ -781,13 +1101,21 @@ def run_enhanced_scrape(search_tasks: List[Dict[str, Any]], results_per_query: i
 
     # Списки для сбора результатов
     scraped_items = []
+    scraped_count = 0
     final_failed_searches = [] # Задачи, где не нашли URL
+    # Потоковая запись результатов (JSONL), если задан файл
+    jsonl_file = open(jsonl_path, "ab") if jsonl_path else None
 
     # Обработчик сигнала item_scraped
     def item_scraped_handler(item, response, spider):
-        if item and isinstance(item, dict):
-            scraped_items.append(dict(item)) # Копируем item
-            spider.logger.info(f"Item collected: {item.get('url')} (Query: '{item.get('query')}')")
+        nonlocal scraped_count
+        if isinstance(item, ScrapedArticle):
+            scraped_count += 1
+            if jsonl_file is not None:
+                jsonl_file.write(to_jsonl_line(item))
+            else:
+                scraped_items.append(item) # Запись неизменяемая - копировать незачем
+            spider.logger.info(f"Item collected: {item.url} (Query: '{item.query}')")
 
     # Обработчик сигнала spider_closed
     def spider_closed_handler(spider, reason):
@@ -822,11 +1150,19 @@ def run_enhanced_scrape(search_tasks: List[Dict[str, Any]], results_per_query: i
 
     # Количество одновременных запросов к одному домену (важно для вежливости)
     settings.set('CONCURRENT_REQUESTS_PER_DOMAIN', 1) # Не более 1 запроса к одному сайту одновременно
-    # Общее количество одновременных запросов (AutoThrottle может переопределить)
-    settings.set('CONCURRENT_REQUESTS', 8) # Уменьшим общее число
+    # Общее количество одновременных запросов: загрузка упирается в сеть, поэтому ограничиваем
+    # только по домену (выше), а глобально держим много параллельных соединений
+    settings.set('CONCURRENT_REQUESTS', max_concurrency)
+    # Пул потоков реактора используется для DNS-резолвинга - расширяем под число соединений
+    settings.set('REACTOR_THREADPOOL_MAXSIZE', max(10, max_concurrency // 2))
+    settings.set('DNSCACHE_ENABLED', True)
+    # Реактор поверх asyncio (и uvloop, если установлен) - быстрее стандартного select/epoll-реактора Twisted
+    settings.set('TWISTED_REACTOR', 'twisted.internet.asyncioreactor.AsyncioSelectorReactor')
+    if UVLOOP_AVAILABLE:
+        settings.set('ASYNCIO_EVENT_LOOP', 'uvloop.Loop')
 
     # Устанавливаем случайный User-Agent по умолчанию (паук может переопределять)
-    settings.set('USER_AGENT', random.choice(USER_AGENTS))
+    settings.set('USER_AGENT', next(_UA_CYCLE))
     settings.set('DOWNLOAD_TIMEOUT', 35) # Чуть больше времени на загрузку
     settings.set('DNS_TIMEOUT', 25)      # Чуть больше времени на DNS
 
@@ -857,12 +1193,17 @@ def run_enhanced_scrape(search_tasks: List[Dict[str, Any]], results_per_query: i
         logger.info("--- CrawlerProcess finished successfully ---")
     except Exception as e:
         logger.error(f"--- CrawlerProcess encountered an error: {e} ---", exc_info=True)
+    finally:
+        if jsonl_file is not None:
+            jsonl_file.close()
     # Реактор останавливается либо сам по завершении работы, либо по ошибке
 
     end_time = time.time()
     logger.info(f"\n=== Scrape Run Complete ===")
     logger.info(f"Total execution time: {end_time - start_time:.2f} seconds.")
-    logger.info(f"Collected {len(scraped_items)} items (successfully parsed sources).")
+    logger.info(f"Collected {scraped_count} items (successfully parsed sources).")
+    if jsonl_path:
+        logger.info(f"Items were streamed to {jsonl_path}")
     if final_failed_searches:
          logger.warning(f"Found {len(final_failed_searches)} tasks where no URLs could be found initially.")
          # logger.debug(f"Failed tasks details: {final_failed_searches}")
@@ -935,9 +1276,9 @@ if __name__ == '__main__':
         # Группируем результаты по исходной задаче для наглядности
         results_by_task = {}
         for item in scraped_results:
-            task_key = (item.get('plan_item_id'), item.get('query_id'))
+            task_key = (item.plan_item_id, item.query_id)
             if task_key not in results_by_task:
-                 results_by_task[task_key] = {'query': item.get('query'), 'plan_item': item.get('plan_item'), 'items': []}
+                 results_by_task[task_key] = {'query': item.query, 'plan_item': item.plan_item, 'items': []}
             results_by_task[task_key]['items'].append(item)
 
         task_counter = 0
@@ -949,17 +1290,15 @@ if __name__ == '__main__':
              print(f"  Scraped Items ({len(task_data['items'])}):")
              for i, item in enumerate(task_data['items']):
                   print(f"\n  Item {i+1}:")
-                  print(f"    URL: {item.get('url')}")
-                  print(f"    Title: {item.get('title', 'N/A')}")
-                  print(f"    Method: {item.get('extraction_method')}")
-                  text_preview = item.get('text', '')[:250].replace('\n', ' ') # Показываем начало текста
-                  print(f"    Text Preview ({len(item.get('text', ''))} chars): {text_preview}...")
+                  print(f"    URL: {item.url}")
+                  print(f"    Title: {item.title}")
+                  print(f"    Method: {item.extraction_method}")
+                  text_preview = item.text[:250].replace('\n', ' ') # Показываем начало текста
+                  print(f"    Text Preview ({item.content_length} chars): {text_preview}...")
 
         # Сохраняем успешные результаты в JSON файл
         try:
-            with open("scraped_content_enhanced.json", "w", encoding="utf-8") as f:
-                import json
-                json.dump(scraped_results, f, ensure_ascii=False, indent=2)
+            save_json(scraped_results, "scraped_content_enhanced.json")
             print("\nFull successful results saved to scraped_content_enhanced.json")
         except Exception as e:
             print(f"\nFailed to save successful results to JSON: {e}")
@@ -978,9 +1317,7 @@ if __name__ == '__main__':
 
         # Можно сохранить и этот список
         try:
-            with open("failed_search_tasks.json", "w", encoding="utf-8") as f:
-                import json
-                json.dump(failed_search_tasks, f, ensure_ascii=False, indent=2)
+            save_json(failed_search_tasks, "failed_search_tasks.json")
             print("\nList of tasks with no URLs found saved to failed_search_tasks.json")
         except Exception as e:
             print(f"\nFailed to save failed tasks list to JSON: {e}")
@@ -1,10 +1,20 @@
 import time
 import os
+import json
+import hashlib
+import importlib.util
 import logging
 import re
 import random
+import asyncio
+import functools
+import itertools
+import queue
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, asdict
 from urllib.parse import urlparse, quote_plus
-from typing import List, Dict, Any, Optional, Set, Tuple
+from typing import List, Dict, Any, Optional, Set, Tuple, Union
 
 # --- Scrapy Imports ---
 import scrapy
@@ -12,8 +22,11 @@ from scrapy.crawler import CrawlerProcess
 from scrapy.utils.project import get_project_settings
 from scrapy.spiders import Spider
 from scrapy import signals
-from scrapy.exceptions import CloseSpider, IgnoreRequest
-from scrapy.http import HtmlResponse # To create response object from Selenium source
+from scrapy.exceptions import CloseSpider, IgnoreRequest, DontCloseSpider
+from scrapy.utils.defer import maybe_deferred_to_future
+from w3lib.url import canonicalize_url
+from twisted.internet.defer import Deferred, DeferredSemaphore
+from twisted.internet.threads import deferToThread
 
 # --- Selenium Imports ---
 try:
@@ -22,9 +35,7 @@ try:
     from selenium.webdriver.chrome.options import Options as ChromeOptions
     from selenium.webdriver.firefox.service import Service as FirefoxService
     from selenium.webdriver.firefox.options import Options as FirefoxOptions
-    from selenium.webdriver.common.by import By
     from selenium.webdriver.support.ui import WebDriverWait
-    from selenium.webdriver.support import expected_conditions as EC
     from selenium.common.exceptions import WebDriverException, TimeoutException
     SELENIUM_AVAILABLE = True
 except ImportError:
@@ -34,15 +45,27 @@ except ImportError:
     class TimeoutException(Exception): pass
 
 
+# --- HTTP/2 для httpx (нужен пакет h2) ---
+# find_spec только проверяет наличие пакета, не импортируя его
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+# --- orjson (опционально) - быстрая сериализация результатов в JSON ---
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # --- Other Libraries ---
 from dotenv import load_dotenv
 from duckduckgo_search import DDGS
 import trafilatura
-from newspaper import Article, ArticleException
 
 # --- Дополнительные библиотеки для резервного поиска ---
-import requests
-from bs4 import BeautifulSoup
+import httpx
+import lxml.html
+from lxml import etree
+from lxml.cssselect import CSSSelector
 import urllib.parse
 
 # --- Начальная настройка ---
@@ -55,8 +78,7 @@ logging.getLogger('scrapy').propagate = False
 logging.getLogger('duckduckgo_search').setLevel(logging.INFO)
 logging.getLogger('urllib3').propagate = False
 logging.getLogger('trafilatura').setLevel(logging.WARNING)
-logging.getLogger('newspaper').setLevel(logging.WARNING)
-logging.getLogger('requests').setLevel(logging.WARNING)
+logging.getLogger('httpx').setLevel(logging.WARNING)
 
 logger = logging.getLogger('search_spider')
 logger.setLevel(logging.INFO)
@@ -73,6 +95,8 @@ SEARCH_DELAY = 4.0
 MIN_CONTENT_LENGTH = 150
 MAX_RETRIES = 2
 DIVERSE_QUERY_COUNT = 2
+SUCCESS_NDJSON = "scraped_content_successful.ndjson"
+FAILED_NDJSON = "scraped_content_failed_urls.ndjson"
 
 # --- Selenium Configuration ---
 USE_SELENIUM_FALLBACK = True # Set to False to disable Selenium
@@ -80,8 +104,14 @@ USE_SELENIUM_FALLBACK = True # Set to False to disable Selenium
 # e.g., '/path/to/your/chromedriver' or 'C:/path/to/your/chromedriver.exe'
 WEBDRIVER_PATH = None # Set to your path or leave as None if in PATH
 SELENIUM_BROWSER = 'chrome' # or 'firefox'
-SELENIUM_WAIT_TIMEOUT = 20 # Max time Selenium waits for page elements (seconds)
-SELENIUM_PAGE_LOAD_TIMEOUT = 30 # Max time Selenium waits for driver.get() (seconds)
+SELENIUM_WAIT_TIMEOUT = 5 # Max time Selenium waits for the content container after an eager load (seconds)
+SELENIUM_READY_SCRIPT = ("return document.readyState === 'complete' || (document.readyState !== 'loading'"
+                         " && document.querySelector('article, main, [role=main]') !== null)")
+SELENIUM_POOL_SIZE = 2 # Browsers (and concurrent Selenium fallbacks); independent of CONCURRENT_REQUESTS
+SELENIUM_PAGE_LOAD_TIMEOUT = 15 # Max time Selenium waits for driver.get() (seconds); eager returns at DOMContentLoaded
+# URL patterns Chrome must not fetch at all (CDP Network.setBlockedURLs): images, fonts, styles, media
+SELENIUM_BLOCKED_URL_PATTERNS = ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+                                 '*.woff', '*.woff2', '*.ttf', '*.otf', '*.css', '*.mp4', '*.webm', '*.mp3']
 
 USER_AGENTS = [
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/110.0.0.0 Safari/537.36',
@@ -92,107 +122,360 @@ USER_AGENTS = [
 # Use a consistent User Agent for Selenium if needed, or random
 SELENIUM_USER_AGENT = random.choice(USER_AGENTS)
 
+# Ротация User-Agent по кругу для резервного поиска; next() у itertools.cycle атомарен под GIL, безопасно из потоков
+_UA_CYCLE = itertools.cycle(USER_AGENTS)
+
+# Одни и те же URL приходят из разных поисковиков и вариантов запроса - кэшируем результат разбора
+_cached_urlparse = functools.lru_cache(maxsize=8192)(urlparse)
+
+class BloomFilter:
+    """Простой Bloom-фильтр для учета URL (нет ложноотрицательных, редкие ложноположительные).
+
+    Память фиксирована (по умолчанию 128KB) и не растет с числом URL: ~1M бит, при k=10 хешах ошибка ~0.1% до ~70k URL.
+    """
+
+    def __init__(self, size_bytes: int = 128 * 1024, num_hashes: int = 10):
+        self.num_bits = size_bytes * 8
+        self.num_hashes = num_hashes
+        self.bits = bytearray(size_bytes)
+        self.count = 0 # Приблизительное число добавленных элементов
+
+    def _positions(self, item: str):
+        # Двойное хеширование: h1 + i*h2 из одного 128-битного дайджеста
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str) -> None:
+        is_new = False
+        for pos in self._positions(item):
+            byte_index, mask = pos >> 3, 1 << (pos & 7)
+            if not self.bits[byte_index] & mask:
+                self.bits[byte_index] |= mask
+                is_new = True
+        if is_new:
+            self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def __len__(self) -> int:
+        return self.count
+
+# Резервный поиск: Yandex и Bing запрашиваются параллельно через httpx.AsyncClient
+FALLBACK_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=30)
+FALLBACK_TIMEOUT = httpx.Timeout(15.0)
+FALLBACK_HEADERS = {'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8'}
+
+@dataclass(slots=True, frozen=True)
+class ScrapedArticle:
+    """Результат обработки одного URL (успех или неудача); без __dict__, передаётся по ссылке."""
+    query: Optional[str]
+    plan_item: Optional[str]
+    plan_item_id: Optional[str]
+    query_id: Optional[str]
+    url: str
+    title: str
+    text: str
+    extraction_method: str
+    content_length: int
+    status: str
+    failure_reason: Optional[str] = None
+
+def save_json(data: Any, path: str) -> None:
+    """Сохраняет данные в JSON (UTF-8, отступ 2) через orjson, если он установлен, иначе через json."""
+    if ORJSON_AVAILABLE:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, default=asdict)
+
+def to_ndjson_line(item: ScrapedArticle) -> bytes:
+    """Одна строка NDJSON (UTF-8, с переводом строки) для потоковой записи результата."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(item) + b"\n" # dataclass сериализуется напрямую, без asdict
+    return json.dumps(asdict(item), ensure_ascii=False).encode("utf-8") + b"\n"
+
 
 # --- Вспомогательные функции (generate_alternative_queries, is_valid_url, fallback searches remain the same) ---
 # ... (keep the helper functions from the previous version) ...
+_QUERY_TEMPLATES = (
+    "%s подробное объяснение",
+    "что такое %s",
+    "%s руководство",
+    "%s документация",
+    "%s примеры использования",
+    "%s tutorial",
+    "%s how to",
+    "%s explained",
+    "understanding %s",
+    "%s guide",
+    "%s best practices",
+    "%s introduction"
+)
+# Вместо random.sample - скользящее окно по шаблонам: у соседних задач разные формулировки, без ГСЧ
+_TEMPLATE_OFFSETS = itertools.count()
+
 def generate_alternative_queries(original_query: str) -> List[str]:
     """Генерирует альтернативные формулировки исходного запроса."""
-    query_templates = [
-        "{} подробное объяснение",
-        "что такое {}",
-        "{} руководство",
-        "{} документация",
-        "{} примеры использования",
-        "{} tutorial",
-        "{} how to",
-        "{} explained",
-        "understanding {}",
-        "{} guide",
-        "{} best practices",
-        "{} introduction"
-    ]
-    num_to_select = min(DIVERSE_QUERY_COUNT, len(query_templates))
-    selected_templates = random.sample(query_templates, num_to_select)
-    alternative_queries = [template.format(original_query) for template in selected_templates]
-    if original_query not in alternative_queries:
-        alternative_queries.insert(0, original_query)
-    return alternative_queries[:DIVERSE_QUERY_COUNT + 1]
+    n = len(_QUERY_TEMPLATES)
+    start = next(_TEMPLATE_OFFSETS) * DIVERSE_QUERY_COUNT
+    alternative_queries = [original_query]
+    alternative_queries.extend(_QUERY_TEMPLATES[(start + i) % n] % original_query for i in range(min(DIVERSE_QUERY_COUNT, n)))
+    return alternative_queries
+
+# Фильтры is_valid_url собираются один раз при импорте, а не на каждый URL
+_EXCLUDED_EXTENSIONS = frozenset(('.pdf', '.docx', '.xlsx', '.pptx', '.zip', '.rar', '.jpg', '.png', '.gif', '.mp3', '.mp4',
+                                  '.avi', '.exe', '.dmg', '.iso', '.xml', '.json', '.css', '.js', '.svg', '.webp', '.ico'))
+_EXCLUDED_DOMAINS = ('facebook.com', 'twitter.com', 'instagram.com', 'youtube.com', 'tiktok.com', 'pinterest.com',
+                     'linkedin.com', 't.me', 'telegram.org', 'vk.com', 'ok.ru', 'quora.com', 'reddit.com',
+                     'amazon.', 'ebay.', 'aliexpress.', 'google.com/search', 'yandex.ru/search', 'bing.com/search',
+                     'slideshare.net', 'scribd.com', 'academia.edu', 'researchgate.net',
+                     'codepen.io', 'jsfiddle.net')
+# Одна альтернация вместо any(... in domain): поиск подстроки идет в C за один проход
+_EXCLUDED_DOMAINS_RE = re.compile('|'.join(map(re.escape, _EXCLUDED_DOMAINS)))
+# Все проверки по строке URL одним регулярным выражением: 'search'/'find' в любом регистре,
+# либо '?' вместе с 'q='/'query=' (в любом порядке - как в прежних проверках через in)
+_SEARCH_URL_RE = re.compile(r'(?i:search|find)|(?s:\?.*(?:q=|query=)|(?:q=|query=).*\?)')
 
 def is_valid_url(url: Optional[str]) -> bool:
     """Проверяет, является ли URL подходящим для парсинга."""
     if not url or not isinstance(url, str): return False
     if not (url.startswith('http://') or url.startswith('https://')): return False
-    excluded_extensions = ('.pdf', '.docx', '.xlsx', '.pptx', '.zip', '.rar', '.jpg', '.png', '.gif', '.mp3', '.mp4',
-                          '.avi', '.exe', '.dmg', '.iso', '.xml', '.json', '.css', '.js', '.svg', '.webp', '.ico')
+    if _SEARCH_URL_RE.search(url): return False # Самая дешевая проверка - до разбора URL
     try:
-        parsed_url = urlparse(url)
+        parsed_url = _cached_urlparse(url)
         path = parsed_url.path.lower()
-        if path and path.endswith(excluded_extensions): return False
-    except Exception: return False
-    excluded_domains = ('facebook.com', 'twitter.com', 'instagram.com', 'youtube.com', 'tiktok.com', 'pinterest.com',
-                       'linkedin.com', 't.me', 'telegram.org', 'vk.com', 'ok.ru', 'quora.com', 'reddit.com',
-                       'amazon.', 'ebay.', 'aliexpress.', 'google.com/search', 'yandex.ru/search', 'bing.com/search',
-                       'slideshare.net', 'scribd.com', 'academia.edu', 'researchgate.net',
-                       'codepen.io', 'jsfiddle.net')
-    try:
+        if path and os.path.splitext(path)[1] in _EXCLUDED_EXTENSIONS: return False
         domain = parsed_url.netloc.lower()
-        if domain.startswith('www.'): domain = domain[4:]
-        if domain and any(bad_domain in domain for bad_domain in excluded_domains): return False
-    except Exception: pass
-    if 'search' in url.lower() or 'find' in url.lower() or '?' in url and ('q=' in url or 'query=' in url): return False
+    except Exception: return False
+    if domain.startswith('www.'): domain = domain[4:]
+    if domain and _EXCLUDED_DOMAINS_RE.search(domain): return False
     return True
 
-def fallback_search_yandex(query: str, num_results: int = 10) -> List[Dict[str, str]]:
-    """Резервный поиск через Yandex."""
+# Выдачу разбираем через lxml (C-парсер) с заранее скомпилированными XPath; рекламные ссылки Yandex отсекаются в самом XPath
+_YANDEX_LINKS = etree.XPath("//li[contains(concat(' ', normalize-space(@class), ' '), ' serp-item ')]//h2//a"
+                            "[starts-with(@href, 'http') and not(contains(@href, 'yandex.ru/clck/'))]")
+_BING_LINKS = etree.XPath("//li[contains(concat(' ', normalize-space(@class), ' '), ' b_algo ')]//h2//a[@href]")
+
+def _serp_tree(content: bytes, encoding: Optional[str]):
+    return lxml.html.fromstring(content, parser=lxml.html.HTMLParser(encoding=encoding or 'utf-8'))
+
+def _parse_yandex_results(content: bytes, encoding: Optional[str], num_results: int) -> List[Dict[str, str]]:
     results = []
-    encoded_query = quote_plus(query)
-    search_url = f"https://yandex.ru/search/?text={encoded_query}&lr=213"
-    headers = {'User-Agent': random.choice(USER_AGENTS), 'Accept-Language': 'ru-RU,ru;q=0.8,en-US;q=0.5,en;q=0.3'}
-    try:
-        response = requests.get(search_url, headers=headers, timeout=15)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        links = soup.select('li.serp-item h2 a[href]')
-        found_count = 0
-        for link in links:
-            url = link.get('href')
-            if url and url.startswith('http') and 'yandex.ru/clck/' not in url and is_valid_url(url):
-                title = link.get_text(strip=True)
-                results.append({'href': url, 'title': title})
-                found_count += 1
-                if found_count >= num_results: break
-    except requests.exceptions.RequestException as e: logger.error(f"Ошибка Yandex Search ({type(e).__name__}): {e}")
-    except Exception as e: logger.error(f"Неожиданная ошибка Yandex Search: {e}")
-    # logger.info(f"Yandex fallback for '{query}' -> {len(results)} valid results.")
+    for link in _YANDEX_LINKS(_serp_tree(content, encoding)):
+        url = link.get('href')
+        if is_valid_url(url):
+            title = ''.join(s.strip() for s in link.itertext())
+            results.append({'href': url, 'title': title})
+            if len(results) >= num_results: break
     return results
 
-def fallback_search_bing(query: str, num_results: int = 10) -> List[Dict[str, str]]:
-    """Резервный поиск через Bing."""
+def _parse_bing_results(content: bytes, encoding: Optional[str], num_results: int) -> List[Dict[str, str]]:
     results = []
-    encoded_query = quote_plus(query)
-    search_url = f"https://www.bing.com/search?q={encoded_query}"
-    headers = {'User-Agent': random.choice(USER_AGENTS), 'Accept-Language': 'en-US,en;q=0.9,ru;q=0.8'}
-    try:
-        response = requests.get(search_url, headers=headers, timeout=15)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        links = soup.select("li.b_algo h2 a")
-        found_count = 0
-        for link in links:
-            url = link.get('href')
-            if url and is_valid_url(url):
-                title = link.get_text(strip=True)
-                results.append({'href': url, 'title': title})
-                found_count += 1
-                if found_count >= num_results: break
-    except requests.exceptions.RequestException as e: logger.error(f"Ошибка Bing Search ({type(e).__name__}): {e}")
-    except Exception as e: logger.error(f"Неожиданная ошибка Bing Search: {e}")
-    # logger.info(f"Bing fallback for '{query}' -> {len(results)} valid results.")
+    for link in _BING_LINKS(_serp_tree(content, encoding)):
+        url = link.get('href')
+        if is_valid_url(url):
+            title = ''.join(s.strip() for s in link.itertext())
+            results.append({'href': url, 'title': title})
+            if len(results) >= num_results: break
     return results
 
+def _new_fallback_client() -> httpx.AsyncClient:
+    # httpx сам объявляет br/zstd в Accept-Encoding, если установлены brotli/zstandard
+    return httpx.AsyncClient(http2=HTTP2_AVAILABLE, limits=FALLBACK_LIMITS, timeout=FALLBACK_TIMEOUT,
+                             headers=FALLBACK_HEADERS, follow_redirects=True)
+
+async def _fallback_gather(client: httpx.AsyncClient, query: str, num_results: int = 10) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+    """Резервный поиск через Yandex и Bing одновременно. Возвращает (yandex_results, bing_results)."""
+    encoded_query = quote_plus(query)
+    yandex_url = f"https://yandex.ru/search/?text={encoded_query}&lr=213"
+    bing_url = f"https://www.bing.com/search?q={encoded_query}"
+    yandex_headers = {'User-Agent': next(_UA_CYCLE), 'Accept-Language': 'ru-RU,ru;q=0.8,en-US;q=0.5,en;q=0.3'}
+    bing_headers = {'User-Agent': next(_UA_CYCLE), 'Accept-Language': 'en-US,en;q=0.9,ru;q=0.8'}
+
+    yandex_response, bing_response = await asyncio.gather(
+        client.get(yandex_url, headers=yandex_headers),
+        client.get(bing_url, headers=bing_headers),
+        return_exceptions=True, # Ошибка одного поисковика не должна отменять другой
+    )
+
+    all_results = []
+    for engine, response, parse_results in (('Yandex', yandex_response, _parse_yandex_results),
+                                            ('Bing', bing_response, _parse_bing_results)):
+        results = []
+        try:
+            if isinstance(response, BaseException): raise response
+            response.raise_for_status()
+            results = parse_results(response.content, response.encoding, num_results)
+        except httpx.HTTPError as e: logger.error(f"Ошибка {engine} Search ({type(e).__name__}): {e}")
+        except Exception as e: logger.error(f"Неожиданная ошибка {engine} Search: {e}")
+        # logger.info(f"{engine} fallback for '{query}' -> {len(results)} valid results.")
+        all_results.append(results)
+    return all_results[0], all_results[1]
+
+
+# --- Простое извлечение текста (lxml) ---
+# Регулярки очистки текста компилируются один раз (simple-HTML и _create_item)
+_RE_WS = re.compile(r'\s{2,}')
+# Признаки текстовой разметки: без них Trafilatura не запускаем (bytes - ответ Scrapy, str - page_source Selenium).
+# Только <p>/<p ...>/<article (любой регистр): голое '<p' совпадало бы и с <path>, <pre>, <param>, <picture>
+_TEXT_MARKERS_RE = re.compile(rb'<(?:p[\s>]|article[\s>])', re.I)
+_TEXT_MARKERS_RE_STR = re.compile(_TEXT_MARKERS_RE.pattern.decode('ascii'), re.I)
+# Сигнатуры HTML в начале тела: без них (PDF, JSON, бинарные данные с неверным Content-Type) парсеры не запускаем
+_HTML_SNIFF_BYTES = 1024
+_HTML_SIGNATURES = (b'<html', b'<!doctype html', b'<head', b'<body')
+
+def _looks_like_html(body: bytes) -> bool:
+    """Дешевая проверка по первому килобайту тела, до передачи его в пул извлечения."""
+    head = body[:_HTML_SNIFF_BYTES].lower()
+    return any(signature in head for signature in _HTML_SIGNATURES)
+# Очистка в _create_item за один проход: пробельная серия с 2+ переводами строки -> разрыв абзаца, прочие серии -> пробел
+_RE_CLEAN = re.compile(r'(\s*\n\s*\n\s*)|\s{2,}')
+
+def _clean_repl(m: re.Match) -> str:
+    return '\n\n' if m.group(1) else ' '
+_RE_NL3 = re.compile(r'\n{3,}')
+# lxml не принимает str с XML-декларацией кодировки (XHTML) - она уже не нужна после декодирования
+_RE_XML_DECL = re.compile(r'^\s*<\?xml[^>]*\?>')
+# Кандидаты на основной блок в порядке приоритета; div с "контентным" классом ищем через EXSLT-регулярку
+_CONTENT_DIV = etree.XPath("(//div[re:test(@class, '(content|main|body|post|entry)', 'i')])[1]",
+                           namespaces={'re': 'http://exslt.org/regular-expressions'})
+# CSS -> XPath компилируется один раз при импорте, а не на каждой странице
+_JUNK = CSSSelector('script, style, nav, footer, header, aside, form, iframe, noscript, .sidebar, #sidebar, .comments, #comments,'
+                    ' .related-posts, .social-links, .ad, [aria-hidden="true"]')
+# Заголовок берется из уже разобранного дерева одним XPath-вызовом в libxml2 (string() сразу отдает str)
+_TITLE_XPATH = etree.XPath('string((//title)[1])', smart_strings=False)
+_H1_XPATH = etree.XPath('string((//h1)[1])', smart_strings=False)
+_GENERIC_TITLES = frozenset(("home", "index", "blog", "article"))
+_PARAGRAPHS_XPATH = etree.XPath('.//p|.//h1|.//h2|.//h3|.//h4|.//h5|.//h6|.//li|.//pre|.//code|.//td|.//th')
+
+def _find_main_content(tree):
+    """main -> article -> div[role=main] -> div с контентным классом -> body (или весь документ)."""
+    for path in ('.//main', './/article', ".//div[@role='main']"):
+        element = tree.find(path)
+        if element is not None: return element
+    divs = _CONTENT_DIV(tree)
+    if divs: return divs[0]
+    body = tree.find('.//body')
+    return body if body is not None else tree
+
+
+def extract_content_from_html(html_content: Union[bytes, str], encoding: Optional[str], url: str) -> Tuple[Optional[str], Optional[str], str]:
+    """Extracts text with Trafilatura (fast) -> Trafilatura (fallbacks + metadata) -> simple HTML. Returns (text, method, title).
+
+    Accepts an already decoded str (Scrapy's response.text, Selenium's page_source) or raw bytes decoded with `encoding`.
+    Top-level and pickle-safe: runs in the spider's ProcessPoolExecutor workers.
+    """
+    extracted_text = None
+    extraction_method = None
+    title = ""
+    # Текст не длиннее разметки: из документа короче MIN_CONTENT_LENGTH нужного объема не извлечь - парсеры не запускаем
+    if len(html_content) < MIN_CONTENT_LENGTH: return extracted_text, extraction_method, title
+
+    # HTML разбирается один раз: дерево нужно и для заголовка, и для Trafilatura
+    is_text = isinstance(html_content, str)
+    if is_text and html_content.lstrip().startswith('<?xml'): html_content = _RE_XML_DECL.sub('', html_content, count=1)
+    parser = lxml.html.HTMLParser(remove_comments=True) if is_text else lxml.html.HTMLParser(encoding=encoding, remove_comments=True)
+    try: tree = lxml.html.fromstring(html_content, parser=parser)
+    except Exception: tree = None # Empty/broken document - Trafilatura gets the raw bytes
+
+    # 0. Extract Title (from the parsed tree)
+    if tree is not None:
+        title = _TITLE_XPATH(tree).strip()
+        if not title or title.lower() in _GENERIC_TITLES:
+            h1_text = _H1_XPATH(tree).strip()
+            if h1_text: title = h1_text
+
+    # 1-2. Trafilatura - только если в разметке вообще есть абзацы/статья (один поиск по регулярке)
+    text_markers = _TEXT_MARKERS_RE_STR if is_text else _TEXT_MARKERS_RE
+    has_text_markup = text_markers.search(html_content) is not None
+
+    # 1. Trafilatura (fast)
+    if has_text_markup:
+        try:
+            text = trafilatura.extract(tree if tree is not None else html_content, include_comments=False, include_tables=True,
+                                       include_formatting=False, include_links=False, output_format='txt', url=url,
+                                       fast=True, favor_precision=True) # Свой fallback - шаг 2, разметка для txt не нужна
+            if text:
+                text = text.strip()
+                if len(text) >= MIN_CONTENT_LENGTH:
+                    # logger.debug(f"  _extract: Trafilatura success (~{len(text)} chars)")
+                    return text, "trafilatura", title # Достаточный текст получен - остальные парсеры не запускаем
+        except Exception as e: logger.debug(f"  _extract: Trafilatura failed for {url}: {e}")
+
+    # 2. Trafilatura с внутренними fallback-алгоритмами - на том же дереве, без повторного разбора;
+    #    метаданные (htmldate и т.д.) запрашиваем, только если заголовок так и не найден
+    if not extracted_text and has_text_markup:
+        try:
+            document = trafilatura.bare_extraction(tree if tree is not None else html_content, url=url, with_metadata=not title,
+                                                   include_comments=False, include_tables=True, include_links=False)
+            if document is not None and document.text:
+                 text = document.text.strip()
+                 if len(text) >= MIN_CONTENT_LENGTH:
+                    extracted_text = text
+                    extraction_method = "trafilatura_fallback"
+                    # logger.debug(f"  _extract: Trafilatura fallback success (~{len(text)} chars)")
+                    if not title and document.title: title = document.title.strip() # Update title if needed
+        except Exception as e: logger.debug(f"  _extract: Trafilatura fallback failed for {url}: {e}")
+
+    # 3. Simple HTML (lxml, на уже разобранном дереве) - Only if others failed significantly
+    if not extracted_text and MIN_CONTENT_LENGTH > 50 and tree is not None: # Avoid if min length is very small
+         try:
+             main_content = _find_main_content(tree)
+             for element in _JUNK(main_content):
+                 element.drop_tree()
+             text_parts = [t for t in (el.text_content().strip() for el in _PARAGRAPHS_XPATH(main_content)) if t]
+             raw_text = '\n\n'.join(text_parts)
+             clean_text = _RE_WS.sub(' ', raw_text).strip()
+             clean_text = _RE_NL3.sub('\n\n', clean_text)
+             if len(clean_text) >= MIN_CONTENT_LENGTH:
+                 extracted_text = clean_text
+                 extraction_method = "simple_html"
+                 # logger.debug(f"  _extract: Simple HTML success (~{len(clean_text)} chars)")
+         except Exception as e: logger.debug(f"  _extract: Simple HTML parsing failed for {url}: {e}")
+
+
+    # Return extracted text, method used, and title found
+    return extracted_text, extraction_method, title
+
+def _deferred_from_future(future: Future) -> Deferred:
+    """Оборачивает concurrent.futures.Future в Deferred, который срабатывает в потоке реактора."""
+    # Импорт здесь, а не на уровне модуля: к этому моменту Scrapy уже установил нужный реактор
+    from twisted.internet import reactor
+
+    d = Deferred()
+
+    def _on_done(f: Future) -> None:
+        try:
+            result = f.result()
+        except BaseException as e:
+            reactor.callFromThread(d.errback, e)
+        else:
+            reactor.callFromThread(d.callback, result)
+
+    future.add_done_callback(_on_done)
+    return d
+
 
 # --- Улучшенный Spider с поддержкой Selenium ---
 
+# Постоянная часть meta для запросов статей; Request копирует meta, так что общий словарь не изменяется
+_REQUEST_META = {'handle_httpstatus_list': [403, 404, 500, 503, 429, 502, 504], 'download_timeout': 30, 'retry_times': 0}
+
+class RotatingUserAgentMiddleware:
+    """Downloader middleware: каждый запрос получает следующий User-Agent из перемешанной колоды паука."""
+
+    def process_request(self, request, spider):
+        ua_cycle = getattr(spider, '_ua_cycle', None)
+        if ua_cycle is not None:
+            request.headers['User-Agent'] = next(ua_cycle)
+        return None
+
 class EnhancedArticleSpider(Spider):
     name = 'enhanced_article_spider'
 
@@ -201,8 +484,8 @@ class EnhancedArticleSpider(Spider):
     urls_to_scrape: Dict[str, Dict[str, Any]]
     failed_searches: List[Dict[str, Any]]
     processed_urls: Set[str]
-    visited_urls: Set[str]
-    selenium_driver = None # Initialize Selenium driver variable
+    visited_urls: BloomFilter # Канонизированные URL, обработанные parse_article/handle_error
+    _driver_pool: Optional[queue.Queue] = None # Pool of Selenium drivers, filled in spider_opened
 
     def __init__(self, search_tasks: List[Dict[str, Any]] = None, results_per_query: int = 3, *args, **kwargs):
         super(EnhancedArticleSpider, self).__init__(*args, **kwargs)
@@ -215,9 +498,20 @@ class EnhancedArticleSpider(Spider):
         self.urls_to_scrape = {}
         self.failed_searches = []
         self.processed_urls = set()
-        self.visited_urls = set()
-        self.selenium_driver = None # Ensure it's None initially
+        self.visited_urls = BloomFilter()
+        self._search_phase_running = False
+        self._ddgs = None # Shared DDGS instance, created by the search thread
+        self._fallback_loop = None # Event loop and httpx client of the search thread (Yandex/Bing fallback)
+        self._fallback_client = None
+        # id(task_info) -> (task_info, поля задачи для ScrapedArticle); заполняется только задачами паука
+        self._task_fields_cache = {id(task_info): (task_info, self._read_task_fields(task_info)) for task_info in search_tasks}
+        self._extraction_pool = None # ProcessPoolExecutor для извлечения текста, создается при первом ответе
+        self._driver_pool = None # Ensure it's None initially
+        # Не больше SELENIUM_POOL_SIZE fallback'ов одновременно: остальные ждут в реакторе, а не занимают потоки пула
+        self._selenium_sem = DeferredSemaphore(SELENIUM_POOL_SIZE)
         self.use_selenium = USE_SELENIUM_FALLBACK and SELENIUM_AVAILABLE
+        # Колода User-Agent перемешивается один раз, дальше RotatingUserAgentMiddleware берет ее по кругу
+        self._ua_cycle = itertools.cycle(random.sample(USER_AGENTS, len(USER_AGENTS)))
 
         if self.use_selenium:
             self.logger.info("Selenium fallback is ENABLED.")
@@ -231,20 +525,49 @@ class EnhancedArticleSpider(Spider):
         spider = super(EnhancedArticleSpider, cls).from_crawler(crawler, *args, **kwargs)
         crawler.signals.connect(spider.spider_opened, signal=signals.spider_opened)
         crawler.signals.connect(spider.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(spider.spider_idle, signal=signals.spider_idle)
         return spider
 
     def spider_opened(self, spider):
-        """Initialize Selenium WebDriver when spider starts."""
+        """Initialize a pool of Selenium WebDrivers when spider starts."""
         if not self.use_selenium:
             return
 
-        self.logger.info(f"Initializing Selenium WebDriver ({SELENIUM_BROWSER})...")
+        # Несколько драйверов, чтобы тяжелые страницы обрабатывались параллельно, а не в очередь к одному браузеру
+        pool_size = SELENIUM_POOL_SIZE
+        self.logger.info(f"Starting {pool_size} Selenium WebDriver(s) ({SELENIUM_BROWSER}) in the background...")
+        self._driver_pool = queue.Queue()
+        self._drivers_pending = pool_size
+        self._drivers_ready = 0
+        # Браузеры запускаются параллельно в пуле потоков: реактор не ждет их старта, а первые загрузки
+        # и поиск идут, пока драйверы прогреваются. _parse_with_selenium ждет первый готовый драйвер.
+        for _ in range(pool_size):
+            deferToThread(self._create_selenium_driver).addCallback(self._on_driver_ready)
+
+    def _on_driver_ready(self, driver):
+        """Adds a freshly started driver to the pool. Runs in the reactor thread."""
+        self._drivers_pending -= 1
+        if driver is not None:
+            if self._driver_pool is None: # Паук уже закрыт
+                driver.quit()
+                return
+            self._drivers_ready += 1
+            self._driver_pool.put(driver)
+            if self._drivers_pending == 0: self.logger.info(f"Selenium WebDriver pool ready ({self._drivers_ready} driver(s)).")
+        elif self._drivers_pending == 0 and self._drivers_ready == 0 and self._driver_pool is not None:
+            self.logger.error("No Selenium WebDriver could be started. Disabling Selenium fallback.")
+            self.use_selenium = False # Disable Selenium usage if init fails
+            self._driver_pool.put(None) # Будит потоки, которые уже ждут драйвер
+
+    def _create_selenium_driver(self):
+        """Creates one headless WebDriver. Returns None if initialization fails."""
         try:
             service = None
             options = None
 
             if SELENIUM_BROWSER.lower() == 'chrome':
                 options = ChromeOptions()
+                options.page_load_strategy = 'eager' # driver.get() returns at DOMContentLoaded, not after every ad/tracker
                 options.add_argument("--headless")
                 options.add_argument("--disable-gpu") # Often needed for headless mode
                 options.add_argument("--no-sandbox") # Often needed in Docker/Linux environments
@@ -253,64 +576,123 @@ class EnhancedArticleSpider(Spider):
                 options.add_argument("--disable-blink-features=AutomationControlled") # Try to appear less like a bot
                 options.add_experimental_option('excludeSwitches', ['enable-logging', 'enable-automation']) # Further hide automation
                 options.add_experimental_option('useAutomationExtension', False)
-                # Disable images for faster loading
-                # options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+                # Картинки, стили, шрифты и PDF для извлечения текста не нужны - не загружаем их
+                options.add_experimental_option("prefs", {
+                    "profile.managed_default_content_settings.images": 2,
+                    "profile.managed_default_content_settings.stylesheets": 2,
+                    "profile.managed_default_content_settings.fonts": 2,
+                    "plugins.always_open_pdf_externally": True,
+                })
+                options.add_argument("--blink-settings=imagesEnabled=false")
+                options.add_argument("--autoplay-policy=user-gesture-required") # Do not start audio/video
 
                 if WEBDRIVER_PATH:
                     service = ChromeService(executable_path=WEBDRIVER_PATH)
-                    self.selenium_driver = webdriver.Chrome(service=service, options=options)
+                    driver = webdriver.Chrome(service=service, options=options)
                 else: # Assume chromedriver is in PATH
-                    self.selenium_driver = webdriver.Chrome(options=options) # Service auto-detects if in PATH
+                    driver = webdriver.Chrome(options=options) # Service auto-detects if in PATH
+                # Блокируем ресурсы на уровне сети через CDP: запросы отменяются еще до отправки
+                try:
+                    driver.execute_cdp_cmd('Network.enable', {})
+                    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': SELENIUM_BLOCKED_URL_PATTERNS})
+                except WebDriverException as e: self.logger.debug(f"CDP URL blocking unavailable: {e}")
 
             elif SELENIUM_BROWSER.lower() == 'firefox':
                 options = FirefoxOptions()
+                options.page_load_strategy = 'eager'
                 options.add_argument("--headless")
                 options.add_argument("--disable-gpu")
                 options.set_preference("general.useragent.override", SELENIUM_USER_AGENT)
-                # options.set_preference("permissions.default.image", 2) # Disable images
+                options.set_preference("permissions.default.image", 2) # Disable images
+                options.set_preference("permissions.default.stylesheet", 2) # Disable CSS
+                options.set_preference("gfx.downloadable_fonts.enabled", False) # Disable web fonts
+                options.set_preference("media.autoplay.default", 5) # Block audio/video autoplay
 
                 if WEBDRIVER_PATH:
                     service = FirefoxService(executable_path=WEBDRIVER_PATH)
-                    self.selenium_driver = webdriver.Firefox(service=service, options=options)
+                    driver = webdriver.Firefox(service=service, options=options)
                 else: # Assume geckodriver is in PATH
-                    self.selenium_driver = webdriver.Firefox(options=options)
+                    driver = webdriver.Firefox(options=options)
 
             else:
                 self.logger.error(f"Unsupported Selenium browser: {SELENIUM_BROWSER}")
-                self.use_selenium = False # Disable if browser is wrong
-                return
+                return None
 
-            self.selenium_driver.set_page_load_timeout(SELENIUM_PAGE_LOAD_TIMEOUT)
+            driver.set_page_load_timeout(SELENIUM_PAGE_LOAD_TIMEOUT)
             # Implicit wait can sometimes be problematic, prefer explicit waits
-            # self.selenium_driver.implicitly_wait(5)
+            # driver.implicitly_wait(5)
             self.logger.info("Selenium WebDriver initialized successfully.")
+            return driver
 
         except WebDriverException as e:
             self.logger.error(f"Failed to initialize Selenium WebDriver: {e}", exc_info=True)
             self.logger.error("Ensure the correct WebDriver is installed and its path is specified correctly (if needed).")
-            self.selenium_driver = None # Ensure it's None if failed
-            self.use_selenium = False # Disable Selenium usage if init fails
         except Exception as e:
             self.logger.error(f"An unexpected error occurred during Selenium initialization: {e}", exc_info=True)
-            self.selenium_driver = None
-            self.use_selenium = False
+        return None
 
 
     def spider_closed(self, spider):
-        """Quit Selenium WebDriver when spider closes."""
-        if self.selenium_driver:
-            self.logger.info("Closing Selenium WebDriver...")
+        """Shut down the extraction process pool and quit all pooled Selenium WebDrivers when spider closes."""
+        if self._extraction_pool is not None:
+            self._extraction_pool.shutdown(wait=False, cancel_futures=True)
+            self._extraction_pool = None
+        if self._driver_pool is None: return
+        self.logger.info("Closing Selenium WebDriver pool...")
+        while True:
+            try: driver = self._driver_pool.get_nowait()
+            except queue.Empty: break
+            if driver is None: continue # Маркер "драйверов нет" из _on_driver_ready
             try:
-                self.selenium_driver.quit()
+                driver.quit()
                 self.logger.info("Selenium WebDriver closed.")
             except Exception as e:
                 self.logger.error(f"Error closing Selenium WebDriver: {e}")
+        self._driver_pool = None
 
     # --- start_requests, _add_url_if_valid, _search_with_ddg, _search_with_fallback ---
     # These methods remain unchanged from the previous version.
     # Copy them here.
     def start_requests(self):
+        # Поиск (DDGS, резервные поисковики, паузы между запросами) блокирующий, поэтому он идет в пуле потоков
+        # реактора, а каждый найденный URL сразу передается движку - загрузки не ждут окончания поиска.
         self.logger.info("--- Starting Search Phase ---")
+        self._search_phase_running = True
+        d = deferToThread(self._run_search_phase)
+        d.addErrback(lambda failure: self.logger.error(f"Search phase failed: {failure.getErrorMessage()}"))
+        d.addBoth(self._search_phase_finished)
+        return iter(())
+
+    def spider_idle(self, spider):
+        """Не даем пауку закрыться, пока поиск еще добавляет URL."""
+        if self._search_phase_running: raise DontCloseSpider
+
+    def _search_phase_finished(self, _):
+        self._search_phase_running = False
+
+    def _schedule_request(self, url: str, task_info: Dict[str, Any]):
+        """Передает найденный URL движку. Вызывается только в потоке реактора."""
+        if url in self.processed_urls:
+            self.logger.debug(f"Skipping already processed URL: {url}")
+            return
+        self.processed_urls.add(url)
+        self.logger.debug(f"Scheduling request: {url}")
+        self.crawler.engine.crawl(scrapy.Request(url, callback=self.parse_article, errback=self.handle_error,
+            meta={'task_info': task_info, **_REQUEST_META}))
+
+    def _run_search_phase(self):
+        """Выполняется в рабочем потоке: time.sleep здесь не останавливает реактор."""
+        # Один event loop и один httpx-клиент на весь поиск: соединения с Yandex/Bing переиспользуются между задачами
+        self._fallback_loop = asyncio.new_event_loop()
+        self._fallback_client = _new_fallback_client()
+        try: self._search_all_tasks()
+        finally:
+            self._fallback_loop.run_until_complete(self._fallback_client.aclose())
+            self._fallback_loop.close()
+            self._fallback_loop = self._fallback_client = None
+            self._ddgs = None # Поиск завершен, сессия DDGS больше не нужна
+
+    def _search_all_tasks(self):
         search_requests_made = 0
         total_urls_collected = 0
         for task_index, task_info in enumerate(self.search_tasks):
@@ -347,20 +729,13 @@ class EnhancedArticleSpider(Spider):
                     time.sleep(delay)
                 if not new_urls_from_ddg and query_index == 0 and task_urls_found_count < self.results_per_query:
                     self.logger.info(f"DDG found no new URLs for the primary query variation, trying fallback search...")
-                    if task_urls_found_count < self.results_per_query:
-                        try:
-                            new_urls_from_yandex = self._search_with_fallback(query, task_info, task_key, 'yandex')
-                            task_urls_found_count += len(new_urls_from_yandex)
-                            self.logger.info(f"Yandex added {len(new_urls_from_yandex)} new URLs. Total for task {task_key}: {task_urls_found_count}")
-                            if new_urls_from_yandex: time.sleep(SEARCH_DELAY * 0.5)
-                        except Exception as e: self.logger.error(f"Unexpected error during Yandex fallback for '{query}': {e}")
-                    if task_urls_found_count < self.results_per_query:
-                        try:
-                            new_urls_from_bing = self._search_with_fallback(query, task_info, task_key, 'bing')
-                            task_urls_found_count += len(new_urls_from_bing)
-                            self.logger.info(f"Bing added {len(new_urls_from_bing)} new URLs. Total for task {task_key}: {task_urls_found_count}")
-                            if new_urls_from_bing: time.sleep(SEARCH_DELAY * 0.5)
-                        except Exception as e: self.logger.error(f"Unexpected error during Bing fallback for '{query}': {e}")
+                    try:
+                        # Yandex и Bing запрашиваются одновременно - одна задержка вместо двух
+                        new_urls_from_fallback = self._search_with_fallback(query, task_info, task_key)
+                        task_urls_found_count += len(new_urls_from_fallback)
+                        self.logger.info(f"Fallback search added {len(new_urls_from_fallback)} new URLs. Total for task {task_key}: {task_urls_found_count}")
+                        if new_urls_from_fallback: time.sleep(SEARCH_DELAY * 0.5)
+                    except Exception as e: self.logger.error(f"Unexpected error during fallback search for '{query}': {e}")
             self.logger.info(f"--- Task {task_key} Search Summary ---")
             self.logger.info(f"Attempted {attempted_queries} query variations.")
             self.logger.info(f"Collected {task_urls_found_count} unique valid URLs for this task.")
@@ -372,52 +747,30 @@ class EnhancedArticleSpider(Spider):
                 delay = SEARCH_DELAY * 1.2 * (0.9 + 0.2 * random.random())
                 self.logger.info(f"--- Pausing for {delay:.2f}s before next task ---")
                 time.sleep(delay)
-        allowed_domains_set = set()
-        for url in self.urls_to_scrape.keys():
-            try:
-                domain = urlparse(url).netloc
-                if domain:
-                    if domain.startswith('www.'): domain = domain[4:]
-                    allowed_domains_set.add(domain)
-            except Exception as e: self.logger.warning(f"Could not parse domain from URL '{url}': {e}")
-        self.allowed_domains = list(allowed_domains_set)
-        # self.logger.info(f"Configured allowed_domains: {len(self.allowed_domains)} domains") # Less verbose
         self.logger.info(f"\n--- Search Phase Complete ---")
         self.logger.info(f"Total unique URLs collected across all tasks: {len(self.urls_to_scrape)}")
         self.logger.info(f"Total search engine requests made (approx): {search_requests_made} (excluding fallbacks)")
         if self.failed_searches: self.logger.warning(f"Found {len(self.failed_searches)} tasks with zero results.")
         if not self.urls_to_scrape:
             self.logger.warning("No valid URLs found to scrape after all searches. Stopping spider.")
-            return
-        self.logger.info(f"\n--- Starting Scrapy Download Phase for {len(self.urls_to_scrape)} URLs ---")
-        request_count = 0
-        for url, task_info in self.urls_to_scrape.items():
-            if url not in self.processed_urls:
-                request_count += 1
-                self.logger.debug(f"Yielding request {request_count}/{len(self.urls_to_scrape)}: {url}")
-                self.processed_urls.add(url)
-                yield scrapy.Request(url, callback=self.parse_article, errback=self.handle_error,
-                    meta={'task_info': task_info, 'handle_httpstatus_list': [403, 404, 500, 503, 429, 502, 504], 'download_timeout': 30, 'retry_times': 0},
-                    headers={'User-Agent': random.choice(USER_AGENTS)}
-                )
-            else: self.logger.debug(f"Skipping already processed URL: {url}")
-
-    def _add_url_if_valid(self, url: str, task_info: Dict[str, Any], task_key: Tuple[str, str], source: str) -> bool:
-        task_urls = self.urls_found_for_task.setdefault(task_key, set())
+
+    def _add_url_if_valid(self, url: str, task_info: Dict[str, Any], task_urls: Set[str], source: str) -> bool:
+        # task_urls передает вызывающий код: множество URL задачи не ищется в словаре заново для каждого кандидата
         if len(task_urls) >= self.results_per_query: return False
-        if is_valid_url(url):
-            if url not in self.urls_to_scrape:
-                self.urls_to_scrape[url] = task_info
-                task_urls.add(url)
-                self.logger.debug(f"  [+] Added URL from {source}: {url} (Task: {task_key})")
-                return True
-            else:
-                if url not in task_urls:
-                    task_urls.add(url)
-                    self.logger.debug(f"  [=] Added existing URL to task {task_key}: {url} (From: {source})")
-                    return False
-                else: return False
-        else: return False
+        # Дешевые проверки членства раньше is_valid_url: URL из urls_to_scrape уже прошел валидацию
+        if url in task_urls: return False
+        if url in self.urls_to_scrape:
+            task_urls.add(url)
+            self.logger.debug(f"  [=] Added existing URL to task {task_info.get('plan_item_id')}: {url} (From: {source})")
+            return False
+        if not is_valid_url(url): return False
+        self.urls_to_scrape[url] = task_info
+        task_urls.add(url)
+        self.logger.debug(f"  [+] Added URL from {source}: {url} (Task: {task_info.get('plan_item_id')})")
+        # Загрузка начинается сразу, пока поиск по остальным запросам продолжается
+        from twisted.internet import reactor
+        reactor.callFromThread(self._schedule_request, url, task_info)
+        return True
 
     def _search_with_ddg(self, query: str, task_info: Dict[str, Any], task_key: Tuple[str, str]) -> List[str]:
         newly_added_urls = []
@@ -425,65 +778,77 @@ class EnhancedArticleSpider(Spider):
         task_urls = self.urls_found_for_task.setdefault(task_key, set())
         results_needed_for_task = self.results_per_query - len(task_urls)
         if results_needed_for_task <= 0: return newly_added_urls
+        if self._ddgs is None: self._ddgs = DDGS(headers={'User-Agent': random.choice(USER_AGENTS)}, timeout=20)
         while retry_count < MAX_RETRIES:
             try:
                 max_results_to_fetch = results_needed_for_task + 8
                 self.logger.info(f"DDG search for '{query}' (Task: {task_key}, Attempt: {retry_count+1}/{MAX_RETRIES}, Need: {results_needed_for_task}, Fetching: {max_results_to_fetch})")
-                with DDGS(headers={'User-Agent': random.choice(USER_AGENTS)}, timeout=20) as ddgs:
-                    results_iterator = ddgs.text(query, max_results=max_results_to_fetch)
-                    results_processed = 0
-                    if results_iterator:
-                        for r in results_iterator:
-                            if len(self.urls_found_for_task[task_key]) >= self.results_per_query: break
-                            if r and isinstance(r, dict) and 'href' in r:
-                                url = r.get('href')
-                                results_processed += 1
-                                if self._add_url_if_valid(url, task_info, task_key, "DDG"):
-                                    newly_added_urls.append(url)
-                            else: self.logger.debug(f"  [DDG Invalid Result Format]: {r}")
-                        self.logger.debug(f"DDG processed {results_processed} results for '{query}'.")
-                        break
-                    else:
-                        self.logger.warning(f"DDG returned no results iterator for query '{query}'")
+                # Один экземпляр DDGS на весь поиск: соединение с duckduckgo.com не устанавливается заново
+                results_iterator = self._ddgs.text(query, max_results=max_results_to_fetch)
+                results_processed = 0
+                if results_iterator:
+                    for r in results_iterator:
+                        if len(task_urls) >= self.results_per_query: break
+                        if r and isinstance(r, dict) and 'href' in r:
+                            url = r.get('href')
+                            results_processed += 1
+                            if self._add_url_if_valid(url, task_info, task_urls, "DDG"):
+                                newly_added_urls.append(url)
+                        else: self.logger.debug(f"  [DDG Invalid Result Format]: {r}")
+                    self.logger.debug(f"DDG processed {results_processed} results for '{query}'.")
+                    break
+                else:
+                    self.logger.warning(f"DDG returned no results iterator for query '{query}'")
             except Exception as e: self.logger.error(f"Error during DDG search for '{query}' (Attempt {retry_count+1}): {type(e).__name__} - {e}")
             retry_count += 1
             if retry_count < MAX_RETRIES:
-                retry_delay = SEARCH_DELAY * (0.5 + retry_count * 0.3)
+                # Экспоненциальная задержка с джиттером; поток поиска не держит реактор
+                retry_delay = SEARCH_DELAY * (2 ** (retry_count - 1)) * (0.8 + 0.4 * random.random())
                 self.logger.info(f"Retrying DDG search in {retry_delay:.2f}s...")
                 time.sleep(retry_delay)
             else: self.logger.warning(f"Max retries reached for DDG search on '{query}'.")
         return newly_added_urls
 
-    def _search_with_fallback(self, query: str, task_info: Dict[str, Any], task_key: Tuple[str, str], search_engine: str) -> List[str]:
+    def _search_with_fallback(self, query: str, task_info: Dict[str, Any], task_key: Tuple[str, str]) -> List[str]:
         newly_added_urls = []
         task_urls = self.urls_found_for_task.setdefault(task_key, set())
         results_needed_for_task = self.results_per_query - len(task_urls)
         if results_needed_for_task <= 0: return newly_added_urls
-        self.logger.info(f"Trying fallback search via {search_engine.capitalize()} for '{query}' (Task: {task_key}, Need: {results_needed_for_task})")
+        self.logger.info(f"Trying fallback search via Yandex + Bing for '{query}' (Task: {task_key}, Need: {results_needed_for_task})")
         try:
-            results = []
-            if search_engine == 'yandex': results = fallback_search_yandex(query, num_results=results_needed_for_task + 5)
-            elif search_engine == 'bing': results = fallback_search_bing(query, num_results=results_needed_for_task + 5)
-            else: self.logger.error(f"Unknown fallback search engine: {search_engine}"); return newly_added_urls
-            if results:
-                results_processed = 0
-                for r in results:
-                    if len(self.urls_found_for_task[task_key]) >= self.results_per_query: break
-                    url = r.get('href')
-                    results_processed += 1
-                    if self._add_url_if_valid(url, task_info, task_key, search_engine.capitalize()):
-                        newly_added_urls.append(url)
-                self.logger.debug(f"{search_engine.capitalize()} processed {results_processed} results for '{query}'.")
-            else: self.logger.warning(f"No results from {search_engine.capitalize()} fallback for query '{query}'")
-        except Exception as e: self.logger.error(f"Error during {search_engine.capitalize()} fallback search for '{query}': {type(e).__name__} - {e}")
+            yandex_results, bing_results = self._fallback_loop.run_until_complete(
+                _fallback_gather(self._fallback_client, query, num_results=results_needed_for_task + 5))
+        except Exception as e:
+            self.logger.error(f"Error during fallback search for '{query}': {type(e).__name__} - {e}")
+            return newly_added_urls
+        # Сначала Yandex, затем Bing - как и при последовательном поиске
+        for search_engine, results in (('Yandex', yandex_results), ('Bing', bing_results)):
+            if len(task_urls) >= self.results_per_query: break
+            if not results:
+                self.logger.warning(f"No results from {search_engine} fallback for query '{query}'")
+                continue
+            results_processed = 0
+            for r in results:
+                if len(task_urls) >= self.results_per_query: break
+                url = r.get('href')
+                results_processed += 1
+                if self._add_url_if_valid(url, task_info, task_urls, search_engine):
+                    newly_added_urls.append(url)
+            self.logger.debug(f"{search_engine} processed {results_processed} results for '{query}'.")
         return newly_added_urls
 
     # --- parse_article (MODIFIED to include Selenium fallback) ---
-    def parse_article(self, response):
+    def _get_extraction_pool(self) -> ProcessPoolExecutor:
+        # Пул создается лениво; 'spawn' - потому что в процессе уже работают потоки (реактор, поиск, Selenium)
+        if self._extraction_pool is None:
+            self._extraction_pool = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context('spawn'))
+        return self._extraction_pool
+
+    async def parse_article(self, response):
         url = response.url
         task_info = response.meta.get('task_info', {})
         status = response.status
-        self.visited_urls.add(url)
+        self.visited_urls.add(canonicalize_url(url)) # Порядок параметров и фрагмент не дают лишних записей
 
         self.logger.info(f"Processing response from: {url} (Status: {status})")
 
@@ -494,15 +859,19 @@ class EnhancedArticleSpider(Spider):
              #    return self._parse_with_selenium(url, task_info) # Return the generator
              return # Skip for other errors
 
-        content_type = response.headers.get('Content-Type', b'').decode('utf-8', errors='ignore').lower()
-        if 'html' not in content_type and 'text' not in content_type:
-            self.logger.warning(f"Skipping non-HTML content: {url} (Type: {content_type})")
+        content_type = (response.headers.get('Content-Type') or b'').lower() # Сравниваем байты, без декодирования
+        if b'html' not in content_type and b'text' not in content_type:
+            self.logger.warning(f"Skipping non-HTML content: {url} (Type: {content_type.decode('latin-1')})")
+            return
+        if not _looks_like_html(response.body):
+            self.logger.warning(f"Skipping body without HTML markup: {url} (Type: {content_type.decode('latin-1')})")
             return
 
         # Initial extraction attempt using Scrapy's response body
-        extracted_text, extraction_method, title = self._extract_content_from_html(
-            response.body, response.encoding, url
-        )
+        # Извлечение CPU-bound - выполняется в пуле процессов, реактор тем временем продолжает загрузки
+        # response.text декодирован один раз по кодировке, определенной Scrapy (заголовки/meta/BOM) - парсеры не угадывают ее заново
+        future = self._get_extraction_pool().submit(extract_content_from_html, response.text, None, url)
+        extracted_text, extraction_method, title = await maybe_deferred_to_future(_deferred_from_future(future))
 
         # Check if extraction was successful enough
         if extracted_text and len(extracted_text) >= MIN_CONTENT_LENGTH:
@@ -510,14 +879,12 @@ class EnhancedArticleSpider(Spider):
             yield self._create_item(task_info, url, title, extracted_text, extraction_method)
 
         # If Scrapy+Libraries failed or got too little text, try Selenium fallback
-        elif self.use_selenium and self.selenium_driver:
+        elif self.use_selenium and self._driver_pool is not None:
             self.logger.warning(f"Initial extraction failed or yielded short text ({len(extracted_text or '')} chars) for {url}. Attempting Selenium fallback...")
-            # Use 'yield from' if _parse_with_selenium becomes a generator
-            # yield from self._parse_with_selenium(url, task_info)
-            # Since _parse_with_selenium will yield the item directly, just call it
             try:
-                # Directly yield the result from the selenium parsing attempt
-                yield from self._parse_with_selenium(url, task_info)
+                # Selenium блокирующий - выполняем его в пуле потоков реактора, загрузки продолжаются
+                items = await maybe_deferred_to_future(self._selenium_sem.run(deferToThread, self._parse_with_selenium_sync, url, task_info))
+                for item in items: yield item
             except Exception as e:
                  self.logger.error(f"Error occurred during Selenium fallback processing for {url}: {e}", exc_info=True)
                  # Optionally yield a failure item or just log
@@ -529,77 +896,28 @@ class EnhancedArticleSpider(Spider):
             yield self._create_failure_item(task_info, url, title, "extraction_failed")
 
 
-    def _extract_content_from_html(self, html_content: bytes, encoding: str, url: str) -> Tuple[Optional[str], Optional[str], str]:
-        """Helper function to extract content using libraries from HTML source."""
-        extracted_text = None
-        extraction_method = None
-        title = ""
-        decoded_html = html_content.decode(encoding, errors='ignore')
+    def _ensure_driver_alive(self, driver):
+        """Returns the driver if its browser still responds, otherwise a fresh replacement (the old one is quit).
 
-        # 0. Extract Title (from initial HTML)
+        Keeps a crashed browser from poisoning the pool: every later page would otherwise fail on it.
+        """
         try:
-             temp_response = HtmlResponse(url=url, body=html_content, encoding=encoding)
-             title = temp_response.css('title::text').get() or ""
-             title = title.strip()
-             if not title or title.lower() in ["home", "index", "blog", "article"]:
-                  h1_text = temp_response.css('h1::text').get()
-                  if h1_text: title = h1_text.strip()
-        except Exception: pass # Ignore errors here
-
-        # 1. Trafilatura
-        try:
-            text = trafilatura.extract(html_content, include_comments=False, include_tables=True,
-                                       include_formatting=True, include_links=False, output_format='text', url=url)
-            if text:
-                text = text.strip()
-                if len(text) >= MIN_CONTENT_LENGTH:
-                    extracted_text = text
-                    extraction_method = "trafilatura"
-                    # self.logger.debug(f"  _extract: Trafilatura success (~{len(text)} chars)")
-        except Exception as e: self.logger.debug(f"  _extract: Trafilatura failed for {url}: {e}")
-
-        # 2. Newspaper3k
-        if not extracted_text:
-            try:
-                article = Article(url=url, language='ru' if '.ru/' in url or '.рф/' in url else 'en')
-                article.download(input_html=decoded_html) # Use decoded HTML
-                article.parse()
-                if article.text:
-                     text = article.text.strip()
-                     if len(text) >= MIN_CONTENT_LENGTH:
-                        extracted_text = text
-                        extraction_method = "newspaper3k"
-                        # self.logger.debug(f"  _extract: Newspaper3k success (~{len(text)} chars)")
-                        if not title and article.title: title = article.title.strip() # Update title if needed
-            except Exception as e: self.logger.debug(f"  _extract: Newspaper3k failed for {url}: {e}")
-
-        # 3. Simple HTML (BeautifulSoup) - Only if others failed significantly
-        if not extracted_text and MIN_CONTENT_LENGTH > 50: # Avoid if min length is very small
-             try:
-                 soup = BeautifulSoup(html_content, 'lxml')
-                 main_content = soup.find('main') or soup.find('article') or soup.find('div', role='main') or soup.find('div', class_=re.compile(r'(content|main|body|post|entry)', re.I)) or soup.body
-                 if main_content:
-                     for element in main_content.select('script, style, nav, footer, header, aside, form, iframe, noscript, .sidebar, #sidebar, .comments, #comments, .related-posts, .social-links, .ad, [aria-hidden="true"]'):
-                         element.extract()
-                     paragraphs = main_content.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'pre', 'code', 'td', 'th'])
-                     text_parts = [p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True)]
-                     raw_text = '\n\n'.join(text_parts)
-                     clean_text = re.sub(r'\s{2,}', ' ', raw_text).strip()
-                     clean_text = re.sub(r'\n{3,}', '\n\n', clean_text)
-                     if len(clean_text) >= MIN_CONTENT_LENGTH:
-                         extracted_text = clean_text
-                         extraction_method = "simple_html"
-                         # self.logger.debug(f"  _extract: Simple HTML success (~{len(clean_text)} chars)")
-             except Exception as e: self.logger.debug(f"  _extract: Simple HTML parsing failed for {url}: {e}")
-
-
-        # Return extracted text, method used, and title found
-        return extracted_text, extraction_method, title
-
+            driver.current_url # Дешевый запрос к браузеру: падает, если сессия мертва
+            return driver
+        except Exception: pass
+        self.logger.warning("Selenium WebDriver session is dead, starting a replacement...")
+        try: driver.quit()
+        except Exception: pass
+        replacement = self._create_selenium_driver()
+        return replacement if replacement is not None else driver # Без замены пул не должен уменьшаться
+
+    def _parse_with_selenium_sync(self, url: str, task_info: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Runs in a reactor worker thread: collects the items of _parse_with_selenium into a list."""
+        return list(self._parse_with_selenium(url, task_info))
 
     def _parse_with_selenium(self, url: str, task_info: Dict[str, Any]):
-        """Fetches page with Selenium and attempts extraction again. Yields item on success."""
-        if not self.use_selenium or not self.selenium_driver:
+        """Fetches page with a pooled Selenium driver and attempts extraction again. Yields item on success."""
+        if not self.use_selenium or self._driver_pool is None:
              self.logger.error(f"Selenium parsing called for {url} but Selenium is disabled or driver not initialized.")
              yield self._create_failure_item(task_info, url, "N/A", "selenium_disabled")
              return # Explicitly return instead of yielding None
@@ -607,20 +925,24 @@ class EnhancedArticleSpider(Spider):
         self.logger.info(f"🚀 Attempting Selenium fetch for: {url}")
         page_source = None
         selenium_title = None
+        driver = self._driver_pool.get() # Ждем свободный драйвер из пула
+        if driver is None: # Ни один драйвер не запустился - передаем маркер следующим ожидающим
+            self._driver_pool.put(None)
+            yield self._create_failure_item(task_info, url, "N/A", "selenium_disabled")
+            return
 
         try:
-            self.selenium_driver.get(url)
+            driver.get(url)
 
-            # Wait for the body element to be present, indicating basic page load
-            # A better wait might target a specific content container if known
-            WebDriverWait(self.selenium_driver, SELENIUM_WAIT_TIMEOUT).until(
-                EC.presence_of_element_located((By.TAG_NAME, "body"))
-            )
+            # Один execute_script за итерацию: DOM разобран и есть контентный контейнер (или страница загружена полностью)
+            try: WebDriverWait(driver, SELENIUM_WAIT_TIMEOUT).until(lambda d: d.execute_script(SELENIUM_READY_SCRIPT))
+            except TimeoutException: # eager: DOM уже разобран, просто нет контейнера и 'complete' - извлекаем из того, что есть
+                self.logger.info(f"Selenium wait timed out for {url} ({SELENIUM_WAIT_TIMEOUT}s); extracting from the loaded DOM")
             # Optional: Add a small explicit wait for JS rendering if needed
             # time.sleep(3)
 
-            page_source = self.selenium_driver.page_source
-            selenium_title = self.selenium_driver.title # Get title from Selenium
+            page_source = driver.page_source
+            selenium_title = driver.title # Get title from Selenium
 
             if not page_source:
                  self.logger.warning(f"Selenium got empty page source for {url}")
@@ -630,9 +952,7 @@ class EnhancedArticleSpider(Spider):
             self.logger.info(f"Selenium fetch successful for {url}. Re-attempting extraction...")
 
             # Re-run extraction on Selenium's page source
-            extracted_text, extraction_method, _ = self._extract_content_from_html(
-                page_source.encode('utf-8'), 'utf-8', url # Assume UTF-8 from Selenium source
-            )
+            extracted_text, extraction_method, _ = extract_content_from_html(page_source, None, url) # str, no re-encoding; already off the reactor thread
 
             final_title = selenium_title or "No Title Found" # Use Selenium's title
 
@@ -644,57 +964,66 @@ class EnhancedArticleSpider(Spider):
                  yield self._create_failure_item(task_info, url, final_title, "selenium_extraction_failed")
 
 
-        except TimeoutException:
-            self.logger.error(f"Selenium timed out waiting for page elements on: {url} (Timeout: {SELENIUM_WAIT_TIMEOUT}s)")
+        except TimeoutException: # driver.get() не дождался DOMContentLoaded
+            self.logger.error(f"Selenium timed out loading: {url} (Timeout: {SELENIUM_PAGE_LOAD_TIMEOUT}s)")
             yield self._create_failure_item(task_info, url, "N/A", "selenium_timeout")
         except WebDriverException as e:
             # Catch broader Selenium errors (e.g., navigation errors, crashes)
             self.logger.error(f"Selenium WebDriverException occurred for {url}: {e}")
+            driver = self._ensure_driver_alive(driver)
             yield self._create_failure_item(task_info, url, "N/A", "selenium_webdriver_error")
         except Exception as e:
             self.logger.error(f"Unexpected error during Selenium processing for {url}: {e}", exc_info=True)
             yield self._create_failure_item(task_info, url, "N/A", "selenium_unexpected_error")
+        finally:
+            self._driver_pool.put(driver)
+
+
+    @staticmethod
+    def _read_task_fields(task_info: Dict[str, Any]) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]:
+        return task_info.get('query'), task_info.get('plan_item'), task_info.get('plan_item_id'), task_info.get('query_id')
 
+    def _task_fields(self, task_info: Dict[str, Any]) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]:
+        """(query, plan_item, plan_item_id, query_id) задачи - считаются один раз на задачу, а не на каждый URL."""
+        # Ключ - id(), а сам task_info хранится рядом: объект жив, и его id не достанется другому словарю.
+        # Чужие словари (пустые {} по умолчанию и т.п.) не кэшируются - иначе кэш рос бы весь обход
+        entry = self._task_fields_cache.get(id(task_info))
+        if entry is None or entry[0] is not task_info:
+            return self._read_task_fields(task_info)
+        return entry[1]
 
-    def _create_item(self, task_info, url, title, text, method):
+    def _create_item(self, task_info, url, title, text, method) -> ScrapedArticle:
         """Helper to create a standard result item."""
-        cleaned_text = re.sub(r'\s{2,}', ' ', text.strip())
-        cleaned_text = re.sub(r'(\r\n|\r|\n){2,}', '\n\n', cleaned_text)
-        return {
-            'query': task_info.get('query'),
-            'plan_item': task_info.get('plan_item'),
-            'plan_item_id': task_info.get('plan_item_id'),
-            'query_id': task_info.get('query_id'),
-            'url': url,
-            'title': title or "No Title Found",
-            'text': cleaned_text,
-            'extraction_method': method,
-            'content_length': len(cleaned_text),
-            'status': 'success' # Add status field
-        }
+        cleaned_text = _RE_CLEAN.sub(_clean_repl, text.strip()) # Один проход вместо двух
+        return ScrapedArticle(
+            *self._task_fields(task_info),
+            url=url,
+            title=title or "No Title Found",
+            text=cleaned_text,
+            extraction_method=method,
+            content_length=len(cleaned_text),
+            status='success'
+        )
 
-    def _create_failure_item(self, task_info, url, title, failure_reason):
+    def _create_failure_item(self, task_info, url, title, failure_reason) -> ScrapedArticle:
          """Helper to create an item indicating failure for a specific URL."""
-         return {
-            'query': task_info.get('query'),
-            'plan_item': task_info.get('plan_item'),
-            'plan_item_id': task_info.get('plan_item_id'),
-            'query_id': task_info.get('query_id'),
-            'url': url,
-            'title': title or "N/A",
-            'text': "",
-            'extraction_method': "failed",
-            'content_length': 0,
-            'status': 'failure', # Add status field
-            'failure_reason': failure_reason # Explain why it failed
-        }
+         return ScrapedArticle(
+            *self._task_fields(task_info),
+            url=url,
+            title=title or "N/A",
+            text="",
+            extraction_method="failed",
+            content_length=0,
+            status='failure',
+            failure_reason=failure_reason # Explain why it failed
+        )
 
 
     # --- handle_error (Keep previous version or enhance) ---
     def handle_error(self, failure):
         request = failure.request
         url = request.url
-        self.visited_urls.add(url)
+        self.visited_urls.add(canonicalize_url(url))
 
         error_type = failure.type.__name__ if failure.type else 'Unknown Error'
         error_message = str(failure.value)
@@ -714,7 +1043,7 @@ class EnhancedArticleSpider(Spider):
             # For example, try Selenium on a timeout or a specific HTTP error like 403
             # Be careful, this can significantly slow down the process if many requests fail
             # should_try_selenium_on_error = (
-            #     self.use_selenium and self.selenium_driver and
+            #     self.use_selenium and self._driver_pool is not None and
             #     (failure.check(IgnoreRequest) is None) and # Don't retry if we explicitly ignored it
             #     (failure.check(scrapy.spidermiddlewares.httperror.HttpError) and failure.value.response.status == 403) # Example: Retry on 403
             #     # or failure.check(twisted.internet.error.TimeoutError, twisted.internet.defer.TimeoutError) # Example: Retry on timeout
@@ -735,16 +1064,21 @@ class EnhancedArticleSpider(Spider):
 # --- Функция для запуска Scrapy из скрипта (run_enhanced_scrape) ---
 # Needs minor adjustments to mention WebDriver setup
 
-def run_enhanced_scrape(search_tasks: List[Dict[str, Any]], results_per_query: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+def run_enhanced_scrape(search_tasks: List[Dict[str, Any]], results_per_query: int,
+                        ndjson_dir: Optional[str] = None) -> Tuple[List[Union[ScrapedArticle, Dict[str, Any]]], List[Dict[str, Any]]]:
     """
     Запускает улучшенный процесс поиска и скрапинга с опциональным Selenium fallback.
 
     Args:
         search_tasks: Список словарей с поисковыми задачами ('query' required).
         results_per_query: Целевое количество URL на задачу.
+        ndjson_dir: Если задан, каждый результат сразу дописывается строкой в
+            scraped_content_successful.ndjson / scraped_content_failed_urls.ndjson в этой папке.
 
     Returns:
-        Кортеж: (успешно/неуспешно спарсенные источники, задачи без найденных URL)
+        Кортеж: (успешно/неуспешно спарсенные источники (ScrapedArticle), задачи без найденных URL).
+           При заданном ndjson_dir вместо ScrapedArticle возвращаются сводки {'url', 'status', 'content_length'},
+           а полные результаты находятся в файлах.
     """
     # (Input validation remains the same)
     if not search_tasks: logger.error("Нет задач."); return [], []
@@ -774,19 +1108,32 @@ def run_enhanced_scrape(search_tasks: List[Dict[str, Any]], results_per_query: i
     start_time = time.time()
 
     scraped_items = [] # Includes both success and failure items for URLs
+    status_counts = {'success': 0, 'failure': 0}
     final_failed_searches = [] # Tasks where *no* URLs were found
+    # Потоковая запись результатов (NDJSON): память не растёт с числом статей
+    ndjson_files = {}
+    if ndjson_dir:
+        ndjson_files['success'] = open(os.path.join(ndjson_dir, SUCCESS_NDJSON), "wb")
+        ndjson_files['failure'] = open(os.path.join(ndjson_dir, FAILED_NDJSON), "wb")
 
     def item_scraped_handler(item, response, spider):
-        if item and isinstance(item, dict):
-            scraped_items.append(dict(item))
-            status = item.get('status', 'unknown')
-            spider.logger.info(f"Item collected (Status: {status}): {item.get('url')} (Query: '{item.get('query')}')")
+        if isinstance(item, ScrapedArticle):
+            status = item.status
+            if status in status_counts: status_counts[status] += 1
+            out = ndjson_files.get(status)
+            if out is not None:
+                # Полный текст уходит только в файл, в памяти остаётся краткая сводка
+                out.write(to_ndjson_line(item))
+                scraped_items.append({'url': item.url, 'status': status, 'content_length': item.content_length})
+            else:
+                scraped_items.append(item) # Запись неизменяемая - копировать незачем
+            spider.logger.info(f"Item collected (Status: {status}): {item.url} (Query: '{item.query}')")
 
     def spider_closed_handler(spider, reason):
         nonlocal final_failed_searches
         logger.info(f"Spider closed. Reason: {reason}")
         final_failed_searches = getattr(spider, 'failed_searches', [])
-        visited = getattr(spider, 'visited_urls', set())
+        visited = getattr(spider, 'visited_urls', ())
         processed = getattr(spider, 'processed_urls', set())
         logger.info(f"Spider stats: Processed {len(processed)} URL requests, Visited {len(visited)} URLs.")
 
@@ -799,49 +1146,65 @@ def run_enhanced_scrape(search_tasks: List[Dict[str, Any]], results_per_query: i
     settings.set('AUTOTHROTTLE_ENABLED', True)
     settings.set('DOWNLOAD_DELAY', 1.0)
     settings.set('AUTOTHROTTLE_MAX_DELAY', 15.0)
-    settings.set('AUTOTHROTTLE_TARGET_CONCURRENCY', 1.0) # More conservative with Selenium potentially running
+    settings.set('AUTOTHROTTLE_TARGET_CONCURRENCY', 1.0)
     settings.set('AUTOTHROTTLE_DEBUG', False)
-    settings.set('CONCURRENT_REQUESTS_PER_DOMAIN', 1) # Keep low
-    settings.set('CONCURRENT_REQUESTS', 4) # Reduce total concurrency if using Selenium frequently
+    settings.set('CONCURRENT_REQUESTS_PER_DOMAIN', 4) # Вежливость по доменам обеспечивает AutoThrottle
+    settings.set('CONCURRENT_REQUESTS', 64) # Selenium ограничен отдельно (SELENIUM_POOL_SIZE), обычные загрузки - нет
     settings.set('USER_AGENT', random.choice(USER_AGENTS))
+    # Встроенный UserAgentMiddleware ставит один USER_AGENT на весь запуск - заменяем ротацией
+    settings.set('DOWNLOADER_MIDDLEWARES', {
+        'scrapy.downloadermiddlewares.useragent.UserAgentMiddleware': None,
+        RotatingUserAgentMiddleware: 500,
+    })
     settings.set('DOWNLOAD_TIMEOUT', 35)
-    settings.set('DNS_TIMEOUT', 25)
+    settings.set('DNS_TIMEOUT', 10)
+    settings.set('DNSCACHE_ENABLED', True) # Один резолв на домен за весь запуск
+    settings.set('DNSCACHE_SIZE', 10000)
     settings.set('REDIRECT_ENABLED', True)
     settings.set('RETRY_ENABLED', True)
     settings.set('RETRY_TIMES', 1) # Reduce Scrapy retries if Selenium handles failures
     settings.set('RETRY_HTTP_CODES', [500, 502, 503, 504, 522, 524, 408, 429])
     settings.set('COOKIES_ENABLED', False)
+    # Кэш ответов на диске: URL, общие для пересекающихся запросов и повторных запусков, не скачиваются заново
+    settings.set('HTTPCACHE_ENABLED', True)
+    settings.set('HTTPCACHE_EXPIRATION_SECS', 86400)
+    settings.set('HTTPCACHE_DIR', '.scrapy_httpcache')
+    # RFC2616: кэшируются только ответы, которые сервер разрешает кэшировать (Cache-Control/Expires/ETag)
+    settings.set('HTTPCACHE_POLICY', 'scrapy.extensions.httpcache.RFC2616Policy')
+    # Ошибки и коды для повтора в кэш не попадают: иначе RetryMiddleware получал бы их с диска вместо сети
+    settings.set('HTTPCACHE_IGNORE_HTTP_CODES', [403, 404, 408, 429, 500, 502, 503, 504, 522, 524])
+    settings.set('HTTPCACHE_STORAGE', 'scrapy.extensions.httpcache.FilesystemCacheStorage')
+    settings.set('REACTOR_THREADPOOL_MAXSIZE', 20) # Поиск и Selenium-драйверы работают в пуле потоков реактора
 
     # --- Запуск процесса ---
     process = CrawlerProcess(settings)
-    # Crawler is created inside EnhancedArticleSpider.from_crawler now
-    # crawler = process.create_crawler(EnhancedArticleSpider) # No need to create here
+    crawler = process.create_crawler(EnhancedArticleSpider)
 
-    # Connect signals here or rely on from_crawler
-    # process.signals.connect(item_scraped_handler, signal=signals.item_scraped) # Handled in crawler now
-    # process.signals.connect(spider_closed_handler, signal=signals.spider_closed) # Handled in crawler now
+    # Обработчики подключаются к сигналам конкретного краулера
+    crawler.signals.connect(item_scraped_handler, signal=signals.item_scraped)
+    crawler.signals.connect(spider_closed_handler, signal=signals.spider_closed)
 
     logger.info("--- Starting CrawlerProcess ---")
     # Pass args to the spider constructor via process.crawl
-    process.crawl(EnhancedArticleSpider, search_tasks=search_tasks, results_per_query=results_per_query)
+    process.crawl(crawler, search_tasks=search_tasks, results_per_query=results_per_query)
 
     try:
         process.start()
         logger.info("--- CrawlerProcess finished successfully ---")
     except Exception as e:
         logger.error(f"--- CrawlerProcess encountered an error: {e} ---", exc_info=True)
+    finally:
+        for out in ndjson_files.values(): out.close()
 
     end_time = time.time()
     logger.info(f"\n=== Scrape Run Complete ===")
     logger.info(f"Total execution time: {end_time - start_time:.2f} seconds.")
 
-    # Separate successful and failed items based on the 'status' field
-    successful_items = [item for item in scraped_items if item.get('status') == 'success']
-    failed_url_items = [item for item in scraped_items if item.get('status') == 'failure']
-
-    logger.info(f"Collected {len(successful_items)} successfully scraped items.")
-    if failed_url_items:
-        logger.warning(f"Encountered {len(failed_url_items)} failures during URL processing (check logs and results file).")
+    logger.info(f"Collected {status_counts['success']} successfully scraped items.")
+    if status_counts['failure']:
+        logger.warning(f"Encountered {status_counts['failure']} failures during URL processing (check logs and results file).")
+    if ndjson_dir:
+        logger.info(f"Items were streamed to {os.path.join(ndjson_dir, SUCCESS_NDJSON)} and {os.path.join(ndjson_dir, FAILED_NDJSON)}")
     if final_failed_searches:
          logger.warning(f"Found {len(final_failed_searches)} tasks where no URLs could be found initially.")
 
@@ -876,61 +1239,24 @@ if __name__ == '__main__':
     num_sites_to_parse_per_query = 2
 
     print("\n--- Starting Test Scrape with Selenium Fallback ---")
-    all_scraped_items, failed_search_tasks = run_enhanced_scrape(
+    # Результаты пишутся построчно по мере парсинга, а не одним json.dump в конце
+    summaries, failed_search_tasks = run_enhanced_scrape(
         search_tasks=test_tasks,
-        results_per_query=num_sites_to_parse_per_query
+        results_per_query=num_sites_to_parse_per_query,
+        ndjson_dir="."
     )
 
     print(f"\n--- Scraping Finished ---")
-
-    # Separate results
-    successful_items = [item for item in all_scraped_items if item.get('status') == 'success']
-    failed_items = [item for item in all_scraped_items if item.get('status') == 'failure']
-
-    if successful_items:
-        print(f"\n--- Successfully Scraped Content Summary ({len(successful_items)} items) ---")
-        # (Optional: Grouping and detailed printing like before)
-        for i, item in enumerate(successful_items[:5]): # Print first 5 successful
-            print(f"\n Success Item {i+1}:")
-            print(f"  Query: {item.get('query')}")
-            print(f"  URL: {item.get('url')}")
-            print(f"  Method: {item.get('extraction_method')}")
-            print(f"  Title: {item.get('title', 'N/A')}")
-            print(f"  Length: {item.get('content_length')}")
-        if len(successful_items) > 5: print("  ...")
-
-        try:
-            with open("scraped_content_successful.json", "w", encoding="utf-8") as f:
-                import json
-                json.dump(successful_items, f, ensure_ascii=False, indent=2)
-            print("\nFull successful results saved to scraped_content_successful.json")
-        except Exception as e: print(f"\nFailed to save successful results to JSON: {e}")
-    else:
-        print("\n--- No content was successfully scraped ---")
-
-    if failed_items:
-        print(f"\n--- Failed URL Processing Summary ({len(failed_items)} items) ---")
-        for i, item in enumerate(failed_items[:5]): # Print first 5 failures
-             print(f"\n Failure Item {i+1}:")
-             print(f"  Query: {item.get('query')}")
-             print(f"  URL: {item.get('url')}")
-             print(f"  Reason: {item.get('failure_reason')}")
-        if len(failed_items) > 5: print("  ...")
-        try:
-            with open("scraped_content_failed_urls.json", "w", encoding="utf-8") as f:
-                import json
-                json.dump(failed_items, f, ensure_ascii=False, indent=2)
-            print("\nFull failed URL results saved to scraped_content_failed_urls.json")
-        except Exception as e: print(f"\nFailed to save failed URL results to JSON: {e}")
+    success_count = sum(1 for summary in summaries if summary['status'] == 'success')
+    print(f"Successful results ({success_count}) saved to {SUCCESS_NDJSON}")
+    print(f"Failed URL results ({len(summaries) - success_count}) saved to {FAILED_NDJSON}")
 
     if failed_search_tasks:
         print(f"\n--- Tasks With No URLs Found ({len(failed_search_tasks)}) ---")
         # (Printing logic remains the same)
         for i, task in enumerate(failed_search_tasks): print(f"  Task {i+1}: Query='{task.get('query')}', Plan='{task.get('plan_item')}'")
         try:
-            with open("failed_search_tasks.json", "w", encoding="utf-8") as f:
-                import json
-                json.dump(failed_search_tasks, f, ensure_ascii=False, indent=2)
+            save_json(failed_search_tasks, "failed_search_tasks.json")
             print("\nList of tasks with no URLs found saved to failed_search_tasks.json")
         except Exception as e: print(f"\nFailed to save failed tasks list to JSON: {e}")
     else:
@@ -3,10 +3,19 @@ import os
 import logging
 import re
 import random
+import threading
+import functools
+import itertools
+import types
+import importlib.util
+import hashlib
+import queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse, quote_plus
-from typing import List, Dict, Any, Optional, Set, Tuple
+from typing import List, Dict, Any, Optional, Set, Tuple, Union
 from collections import defaultdict
-import asyncio # Although not used for async search in this version, kept for potential future use
+from dataclasses import dataclass, field
+import asyncio # Search requests run on a private event loop (see SearchYieldingSpider._run_search)
 
 # --- Scrapy Imports ---
 import scrapy
@@ -17,34 +26,72 @@ from scrapy import signals
 from scrapy.exceptions import CloseSpider, IgnoreRequest
 from scrapy.http import HtmlResponse
 from scrapy.settings import Settings # To easily override settings
+from w3lib.url import canonicalize_url, url_query_cleaner
 
-# --- Selenium Imports ---
-try:
-    from selenium import webdriver
-    from selenium.webdriver.chrome.service import Service as ChromeService
-    from selenium.webdriver.chrome.options import Options as ChromeOptions
-    from selenium.webdriver.firefox.service import Service as FirefoxService
-    from selenium.webdriver.firefox.options import Options as FirefoxOptions
-    from selenium.webdriver.common.by import By
-    from selenium.webdriver.support.ui import WebDriverWait
-    from selenium.webdriver.support import expected_conditions as EC
-    from selenium.common.exceptions import WebDriverException, TimeoutException
-    SELENIUM_AVAILABLE = True
-except ImportError:
-    SELENIUM_AVAILABLE = False
-    # Define dummy classes if Selenium is not installed, to avoid NameErrors later
-    class WebDriverException(Exception): pass
-    class TimeoutException(Exception): pass
+# --- Selenium (imported on first use, see _get_selenium) ---
+# find_spec only checks that the package is installed, without importing it
+SELENIUM_AVAILABLE = importlib.util.find_spec('selenium') is not None
 
 
 # --- Other Libraries ---
 from dotenv import load_dotenv
 # --- REMOVED: from duckduckgo_search import DDGS --- # No longer needed
-import trafilatura
-from newspaper import Article, ArticleException
-import requests
+# trafilatura, newspaper and requests are imported on first use (see _get_trafilatura / _get_newspaper_article / _get_search_session)
 from bs4 import BeautifulSoup
-import urllib.parse
+import httpx
+import lxml.html
+from lxml.cssselect import CSSSelector
+
+# --- HTTP/2 for httpx (needs the h2 package) ---
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+# --- Lazy imports of heavy, optional-path libraries ---
+_selenium = None
+_trafilatura = None
+_newspaper_article = None
+_search_session = None
+
+def _get_selenium() -> types.SimpleNamespace:
+    """Imports Selenium on first use (only the browser fallback needs it). Raises ImportError if not installed."""
+    global _selenium
+    if _selenium is None:
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service as ChromeService
+        from selenium.webdriver.chrome.options import Options as ChromeOptions
+        from selenium.webdriver.firefox.service import Service as FirefoxService
+        from selenium.webdriver.firefox.options import Options as FirefoxOptions
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.common.exceptions import WebDriverException, TimeoutException
+        _selenium = types.SimpleNamespace(
+            webdriver=webdriver, ChromeService=ChromeService, ChromeOptions=ChromeOptions,
+            FirefoxService=FirefoxService, FirefoxOptions=FirefoxOptions, By=By,
+            WebDriverWait=WebDriverWait, EC=EC,
+            WebDriverException=WebDriverException, TimeoutException=TimeoutException)
+    return _selenium
+
+def _get_trafilatura():
+    global _trafilatura
+    if _trafilatura is None: import trafilatura as _trafilatura
+    return _trafilatura
+
+def _get_newspaper_article():
+    global _newspaper_article
+    if _newspaper_article is None: from newspaper import Article as _newspaper_article
+    return _newspaper_article
+
+def _get_search_session():
+    """Shared requests.Session for the fallback search functions: keep-alive pool per host, small retry budget."""
+    global _search_session
+    if _search_session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=Retry(total=2, backoff_factor=0.3)))
+        _search_session = session
+    return _search_session
 
 # --- Начальная настройка ---
 load_dotenv()
@@ -58,6 +105,7 @@ logging.getLogger('urllib3').propagate = False
 logging.getLogger('trafilatura').setLevel(logging.WARNING)
 logging.getLogger('newspaper').setLevel(logging.WARNING)
 logging.getLogger('requests').setLevel(logging.WARNING) # Less verbose requests logs
+logging.getLogger('httpx').setLevel(logging.WARNING)
 
 # Наш основной логгер
 logger = logging.getLogger('search_yielding_spider_logger') # Changed name slightly
@@ -71,8 +119,9 @@ if not logger.handlers:
 
 # --- Configuration (Using Selenium for Search) ---
 SEARCH_RESULTS_PER_QUERY = 10 # Target results per task
-SEARCH_DELAY_BETWEEN_VARIATIONS = 4.0 # Increased delay between query variations when using Selenium search
-SEARCH_DELAY_AFTER_TASK = 6.0   # Increased delay after finishing all variations for one task
+SEARCH_ENGINES = ('yandex', 'bing') # Engines queried for every query variation (results are used in this order)
+SEARCH_ENGINE_CONCURRENCY = 4 # Max concurrent HTTP searches per engine; different engines run in parallel
+SEARCH_ENGINE_DELAY = 1.0 # Seconds a per-engine slot stays busy after each search (politeness towards the engine)
 MIN_CONTENT_LENGTH = 150
 DIVERSE_QUERY_COUNT = 1 # Fewer variations initially
 
@@ -82,6 +131,12 @@ WEBDRIVER_PATH = None # Set to your path (e.g., '/path/to/chromedriver') or leav
 SELENIUM_BROWSER = 'chrome' # or 'firefox'
 SELENIUM_WAIT_TIMEOUT = 15 # Max time Selenium waits for elements during search/parse (seconds)
 SELENIUM_PAGE_LOAD_TIMEOUT = 30 # Max time Selenium waits for driver.get() (seconds)
+SELENIUM_POOL_SIZE = 2 # Browsers in the shared driver pool; a task's Selenium searches run concurrently on them
+# Subresources Chrome never fetches (via CDP): we only parse the HTML, so styles, fonts, media and trackers are wasted bytes
+SELENIUM_BLOCKED_URLS = [
+    '*.css', '*.woff', '*.woff2', '*.ttf', '*.otf', '*.mp4', '*.webm', '*.mp3',
+    '*google-analytics*', '*googletagmanager*', '*doubleclick*', '*facebook.net*', '*mc.yandex.ru*',
+]
 
 USER_AGENTS = [ # Diverse user agents
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36', # Updated Chrome
@@ -91,31 +146,178 @@ USER_AGENTS = [ # Diverse user agents
 ]
 SELENIUM_USER_AGENT = random.choice(USER_AGENTS) # User agent for Selenium requests
 
+# Prebuilt per-user-agent headers, rotated with itertools.cycle instead of building dicts and calling random.choice per request.
+# The dicts are read-only (MappingProxyType): requests/Scrapy copy headers into their own structures.
+_REQUEST_HEADERS_BASE = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
+    'Accept-Language': 'en-US,en;q=0.9,ru;q=0.8', 'Cache-Control': 'max-age=0', 'Connection': 'keep-alive', 'DNT': '1',
+    'Sec-Ch-Ua': '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"', 'Sec-Ch-Ua-Mobile': '?0',
+    'Sec-Ch-Ua-Platform': '"Windows"', 'Sec-Fetch-Dest': 'document', 'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'same-origin', 'Sec-Fetch-User': '?1', 'Upgrade-Insecure-Requests': '1',
+}
+
+def _header_cycle(referer: str):
+    return itertools.cycle(tuple(types.MappingProxyType({**_REQUEST_HEADERS_BASE, 'User-Agent': ua, 'Referer': referer})
+                                 for ua in random.sample(USER_AGENTS, len(USER_AGENTS))))
+
+_YANDEX_HEADERS = _header_cycle('https://yandex.ru/')
+_BING_HEADERS = _header_cycle('https://www.bing.com/')
+# Article requests only vary the User-Agent
+_UA_HEADERS = itertools.cycle(tuple(types.MappingProxyType({'User-Agent': ua}) for ua in USER_AGENTS))
+
+# --- HTTP Search Configuration (primary search path; Selenium is only the last resort) ---
+# One pooled httpx client per spider: keep-alive (and HTTP/2 if h2 is installed) across all search queries
+SEARCH_HTTP_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20)
+SEARCH_HTTP_TIMEOUT = httpx.Timeout(15.0)
+SEARCH_HTTP_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9,ru;q=0.8',
+}
+# --- !!! CRITICAL: UPDATE THESE SELECTORS BASED ON MANUAL INSPECTION !!! ---
+SERP_SELECTORS = {
+    'yandex': 'li.serp-item ul.serp-list li.serp-item h2 a[href]', # Example Yandex Selector (Likely needs update)
+    'bing': 'li.b_algo h2 a',                                     # Example Bing Selector (Likely needs update)
+}
+# A SERP needs the browser only when the engine served a CAPTCHA/stub page instead of results
+SERP_CAPTCHA_MARKERS = (b'showcaptcha', b'captcha-form')
+SERP_MIN_BODY_BYTES = 2048 # Real result pages are far larger; anything smaller is a block/redirect stub
+# Selectors compiled to XPath once; SERPs are parsed with lxml (C) instead of BeautifulSoup + html.parser
+_SERP_LINKS = {search_engine: CSSSelector(selector) for search_engine, selector in SERP_SELECTORS.items()}
+_YANDEX_ALT_LINKS = CSSSelector('a.Link.OrganicTitle-Link[href]') # Fallback selector for the requests-based Yandex search
+
+# --- URL Filtering ---
+# Excluded domains: a URL is rejected if its host (without 'www.') is one of these or a subdomain of one
+EXCLUDED_DOMAINS = frozenset({
+    'facebook.com', 'twitter.com', 'instagram.com', 'youtube.com', 'tiktok.com', 'pinterest.com', 'linkedin.com',
+    't.me', 'telegram.org', 'vk.com', 'ok.ru', # Social media
+    'wikipedia.org', # Often too general or requires specific handling
+    'wikihow.com',
+    'quora.com', 'reddit.com', 'stackexchange.com', 'stackoverflow.com', # Q&A sites
+    'walmart.com', 'target.com', # E-commerce
+    'google.com', 'yandex.ru', 'bing.com', 'duckduckgo.com', # Search engines themselves
+    'slideshare.net', 'scribd.com', 'academia.edu', 'researchgate.net', # Document sharing (often require login)
+    'github.com', 'gitlab.com', # Code repositories (unless specifically targeting code)
+    'codepen.io', 'jsfiddle.net', 'replit.com', # Code playgrounds
+    'archive.org', # Web archive - handle separately if needed
+    'goo.gl', 'bit.ly', 't.co', # URL shorteners
+    'microsoft.com', # Often support/product pages, less tutorial content unless specific subdomain
+    'apple.com',
+    'adobe.com',
+    'play.google.com', 'apps.apple.com', # App stores
+    # Add any other domains consistently giving poor results
+})
+# Sites excluded under any TLD (amazon.com, amazon.de, ebay.co.uk, ...): matched against the host's non-TLD labels
+EXCLUDED_DOMAIN_NAMES = frozenset({'amazon', 'ebay', 'aliexpress'}) # E-commerce
+
+def _is_excluded_domain(domain: str) -> bool:
+    """Checks the host and each of its parent domains against the excluded sets (O(labels) hash lookups)."""
+    # Walk the suffixes with partition: each step slices off one label instead of re-joining a list
+    while True:
+        label, dot, parent = domain.partition('.')
+        if not dot: # Bare TLD left
+            return False
+        if domain in EXCLUDED_DOMAINS or label in EXCLUDED_DOMAIN_NAMES:
+            return True
+        domain = parent
+
+# File extensions (without the dot): one hash lookup on the path's last suffix
+_EXCLUDED_EXTENSIONS = frozenset({
+    'pdf', 'docx', 'xlsx', 'pptx', 'zip', 'rar', 'jpg', 'jpeg', 'png', 'gif', 'bmp', 'mp3', 'wav', 'mp4', 'avi', 'mov', 'wmv', 'flv',
+    'exe', 'dmg', 'iso', 'xml', 'json', 'css', 'js', 'svg', 'webp', 'ico', 'ttf', 'woff', 'woff2',
+})
+# Path/query/fragment filters: one precompiled regex per URL part instead of a Python loop over substrings
+# (is_valid_url lowercases the URL once before parsing, so the patterns need no re.I)
+_EXCLUDED_PATH_RE = re.compile(r'/(?:search|find|query|login|register|signin|signup|cart|checkout|tag/|category/|author/)')
+# Search/filter parameters ('page'/'paged' are pagination - see is_valid_url)
+_EXCLUDED_QUERY_RE = re.compile(r'(?:q|query|search|keyword|term|text|s|find|sort|filter|order|page|paged|limit|offset)=')
+_PAGINATION_PARAM_RE = re.compile(r'paged?=')
+_SEARCH_PARAM_RE = re.compile(r'(?:q|query|search)=')
+_EXCLUDED_FRAGMENT_RE = re.compile(r'search|login|register')
+# Shared text helpers (debug filenames, whitespace cleanup)
+_SANITIZE_RE = re.compile(r'[^a-z0-9]+')
+_HSPACE_RE = re.compile(r'[ \t\r\f\v]+')
+_MULTI_NEWLINE_RE = re.compile(r'\n{3,}')
+
+# Tracking parameters that never change page content; dropped before URL fingerprinting
+_TRACKING_PARAMS = (
+    'utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content',
+    'fbclid', 'gclid', 'yclid', 'msclkid', 'ref', 'ref_src',
+)
+
+def url_fingerprint(url: str) -> str:
+    """Normalized key for URL deduplication: tracking params and fragment removed, query sorted, scheme/host lowercased."""
+    # unique=False: repeated keys (?id=1&id=2) are kept as-is, only _TRACKING_PARAMS are removed
+    cleaned = url_query_cleaner(url, _TRACKING_PARAMS, remove=True, unique=False)
+    return canonicalize_url(cleaned, keep_fragments=False, keep_blank_values=False)
+
+class BloomFilter:
+    """Simple Bloom filter for URL bookkeeping (no false negatives, rare false positives).
+
+    Memory is fixed (128KB by default) and does not grow with the number of URLs: ~1M bits, k=10 hashes, ~0.1% error up to ~70k URLs.
+    """
+
+    def __init__(self, size_bytes: int = 128 * 1024, num_hashes: int = 10):
+        self.num_bits = size_bytes * 8
+        self.num_hashes = num_hashes
+        self.bits = bytearray(size_bytes)
+        self.count = 0 # Approximate number of added items
+
+    def _positions(self, item: str):
+        # Double hashing: h1 + i*h2 from a single 128-bit digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str) -> None:
+        is_new = False
+        for pos in self._positions(item):
+            byte_index, mask = pos >> 3, 1 << (pos & 7)
+            if not self.bits[byte_index] & mask:
+                self.bits[byte_index] |= mask
+                is_new = True
+        if is_new:
+            self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def __len__(self) -> int:
+        return self.count
+
 # --- Helper Functions ---
 
+_QUERY_TEMPLATES = (
+    "{} подробное объяснение",
+    "что такое {}",
+    "{} руководство",
+    "{} документация",
+    "{} примеры использования",
+    "{} tutorial",
+    "{} how to",
+    "{} explained",
+    "understanding {}",
+    "{} guide",
+    "{} best practices",
+    "{} introduction",
+)
+
 def generate_alternative_queries(original_query: str) -> List[str]:
     """Генерирует альтернативные формулировки исходного запроса."""
-    query_templates = [
-        "{} подробное объяснение",
-        "что такое {}",
-        "{} руководство",
-        "{} документация",
-        "{} примеры использования",
-        "{} tutorial",
-        "{} how to",
-        "{} explained",
-        "understanding {}",
-        "{} guide",
-        "{} best practices",
-        "{} introduction"
-    ]
-    num_to_select = min(DIVERSE_QUERY_COUNT, len(query_templates))
-    selected_templates = random.sample(query_templates, num_to_select)
+    if DIVERSE_QUERY_COUNT <= 0: # Only the original query, nothing to sample
+        return [original_query]
+    num_to_select = min(DIVERSE_QUERY_COUNT, len(_QUERY_TEMPLATES))
+    selected_templates = random.sample(_QUERY_TEMPLATES, num_to_select)
     alternative_queries = [template.format(original_query) for template in selected_templates]
     if original_query not in alternative_queries:
         alternative_queries.insert(0, original_query)
     return alternative_queries[:DIVERSE_QUERY_COUNT + 1] # Limit total number
 
+# Pure function of the URL string: the same links come back for every query variation and engine,
+# and each search result is validated again in _yield_request_if_needed - memoize
+@functools.lru_cache(maxsize=131072)
 def is_valid_url(url: Optional[str]) -> bool:
     """Проверяет, является ли URL подходящим для парсинга (более строгая версия)."""
     if not url or not isinstance(url, str):
@@ -124,7 +326,8 @@ def is_valid_url(url: Optional[str]) -> bool:
         return False
 
     try:
-        parsed_url = urlparse(url)
+        # Lowercase once: every filter below matches lowercase keywords, and the host needs no separate .lower()
+        parsed_url = urlparse(url.lower())
     except Exception as e:
         logger.debug(f"URL parsing failed for validation: {url} - {e}")
         return False # Cannot validate if cannot parse
@@ -138,61 +341,28 @@ def is_valid_url(url: Optional[str]) -> bool:
         return False
 
     # 3. Check File Extensions in Path
-    excluded_extensions = ('.pdf', '.docx', '.xlsx', '.pptx', '.zip', '.rar', '.jpg', '.jpeg', '.png', '.gif', '.bmp',
-                           '.mp3', '.wav', '.mp4', '.avi', '.mov', '.wmv', '.flv',
-                           '.exe', '.dmg', '.iso', '.xml', '.json', '.css', '.js', '.svg', '.webp', '.ico', '.ttf', '.woff', '.woff2')
-    path = parsed_url.path.lower()
-    if path and path.endswith(excluded_extensions):
+    path = parsed_url.path
+    dot = path.rfind('.')
+    if dot >= 0 and path[dot + 1:] in _EXCLUDED_EXTENSIONS:
         # logger.debug(f"Excluding URL due to extension: {url}")
         return False
 
-    # 4. Check Excluded Domains (more comprehensive list)
-    excluded_domains = (
-        'facebook.com', 'twitter.com', 'instagram.com', 'youtube.com', 'tiktok.com', 'pinterest.com', 'linkedin.com',
-        't.me', 'telegram.org', 'vk.com', 'ok.ru', # Social media
-        'wikipedia.org', # Often too general or requires specific handling
-        'wikihow.com',
-        'quora.com', 'reddit.com', 'stackexchange.com', 'stackoverflow.com', # Q&A sites
-        'amazon.', 'ebay.', 'aliexpress.', 'walmart.com', 'target.com', # E-commerce
-        'google.com', 'yandex.ru', 'bing.com', 'duckduckgo.com', # Search engines themselves
-        'slideshare.net', 'scribd.com', 'academia.edu', 'researchgate.net', # Document sharing (often require login)
-        'github.com', 'gitlab.com', # Code repositories (unless specifically targeting code)
-        'codepen.io', 'jsfiddle.net', 'replit.com', # Code playgrounds
-        'archive.org', # Web archive - handle separately if needed
-        'goo.gl', 'bit.ly', 't.co', # URL shorteners
-        'microsoft.com', # Often support/product pages, less tutorial content unless specific subdomain
-        'apple.com',
-        'adobe.com',
-        'play.google.com', 'apps.apple.com', # App stores
-        # Add any other domains consistently giving poor results
-    )
-    domain = parsed_url.netloc.lower()
-    # Remove 'www.' prefix for matching
-    if domain.startswith('www.'):
-        domain = domain[4:]
-    # Check if the domain *ends with* or *is* an excluded domain root
-    if domain and any(domain == bad_domain or domain.endswith('.' + bad_domain) for bad_domain in excluded_domains if '.' in bad_domain) or \
-       domain and any(domain == bad_domain for bad_domain in excluded_domains if '.' not in bad_domain): # Match TLDs like t.me
-        # logger.debug(f"Excluding URL due to domain: {url}")
-        return False
-
-    # 5. Check for Common Search/Filter/Action Patterns in Path/Query
-    path_lower = parsed_url.path.lower()
-    query_lower = parsed_url.query.lower()
-    fragment_lower = parsed_url.fragment.lower() # Check fragment too
+    # Checks run cheapest first; the domain walk (a string slice + set lookups per label) comes last
+    # 4. Check for Common Search/Filter/Action Patterns in Path/Query
+    query = parsed_url.query
 
     # Path patterns
-    if any(p in path_lower for p in ['/search', '/find', '/query', '/login', '/register', '/signin', '/signup', '/cart', '/checkout', '/tag/', '/category/', '/author/']):
+    if _EXCLUDED_PATH_RE.search(path):
         # logger.debug(f"Excluding URL due to path pattern: {url}")
         return False
     # Query patterns (more specific checks)
-    if any(qp + '=' in query_lower for qp in ['q', 'query', 'search', 'keyword', 'term', 'text', 's', 'find', 'sort', 'filter', 'order', 'page', 'paged', 'limit', 'offset']):
+    if _EXCLUDED_QUERY_RE.search(query):
         # Be careful with 'page', might exclude valid multi-page articles if too broad
         # Check if it's likely just pagination vs. a primary search
-        if 'page=' in query_lower or 'paged=' in query_lower:
+        if _PAGINATION_PARAM_RE.search(query):
             # Allow if other significant parameters are missing (might be pagination)
-            other_params = query_lower.replace('page=', '').replace('paged=', '')
-            if 'q=' in other_params or 'query=' in other_params or 'search=' in other_params:
+            other_params = _PAGINATION_PARAM_RE.sub('', query)
+            if _SEARCH_PARAM_RE.search(other_params):
                  # logger.debug(f"Excluding URL due to search query param with pagination: {url}")
                  return False
             # else: logger.debug(f"Allowing URL potentially using pagination: {url}") # Allow simple pagination
@@ -200,49 +370,107 @@ def is_valid_url(url: Optional[str]) -> bool:
              # logger.debug(f"Excluding URL due to likely search/filter query param: {url}")
              return False # Exclude other search/filter params
     # Fragment patterns (less common for exclusion, but possible)
-    if any(f in fragment_lower for f in ['search', 'login', 'register']):
+    if _EXCLUDED_FRAGMENT_RE.search(parsed_url.fragment):
          # logger.debug(f"Excluding URL due to fragment pattern: {url}")
          return False
 
-    # 6. Basic check for excessive parameters (might indicate tracking or complex state)
-    try:
-         params = urllib.parse.parse_qs(parsed_url.query)
-         if len(params) > 7: # Arbitrary threshold
-              # logger.debug(f"Excluding URL due to excessive query parameters ({len(params)}): {url}")
-              return False
-    except Exception:
-         pass # Ignore errors parsing query string
+    # 5. Basic check for excessive parameters (might indicate tracking or complex state)
+    # Only the count matters: more than 7 parameters = 7+ separators, no need to decode the query
+    if query and query.count('&') >= 7: # Arbitrary threshold
+         # logger.debug(f"Excluding URL due to excessive query parameters: {url}")
+         return False
+
+    # 6. Check Excluded Domains (suffix lookups in EXCLUDED_DOMAINS)
+    domain = parsed_url.netloc
+    # Remove 'www.' prefix for matching
+    if domain.startswith('www.'):
+        domain = domain[4:]
+    if domain and _is_excluded_domain(domain):
+        # logger.debug(f"Excluding URL due to domain: {url}")
+        return False
 
     return True
 
+def build_serp_url(search_engine: str, query: str, num_results: int) -> Optional[str]:
+    """Builds the search results page URL for 'yandex' or 'bing' (None for unsupported engines)."""
+    encoded_query = quote_plus(query)
+    if search_engine == 'yandex':
+        return f"https://yandex.ru/search/?text={encoded_query}&lr=213" # lr=213 Moscow
+    if search_engine == 'bing':
+        return f"https://www.bing.com/search?q={encoded_query}&num={num_results+5}" # Ask Bing for more results
+    return None
+
+def serp_looks_blocked(body: bytes, final_url: str = '') -> bool:
+    """True if an HTTP search response is a CAPTCHA/stub page (worth retrying in a real browser)."""
+    if len(body) < SERP_MIN_BODY_BYTES or 'showcaptcha' in final_url:
+        return True
+    return any(marker in body for marker in SERP_CAPTCHA_MARKERS)
+
+def _serp_tree(page_source: Union[str, bytes], encoding: Optional[str] = None):
+    """Parses a search results page with lxml; bytes are decoded by libxml2 itself. Returns None for empty/broken pages."""
+    if isinstance(page_source, str): # e.g. Selenium page_source; lxml rejects str with an XML encoding declaration
+        page_source, encoding = page_source.encode('utf-8'), 'utf-8'
+    try: return lxml.html.fromstring(page_source, parser=lxml.html.HTMLParser(encoding=encoding))
+    except Exception: return None
+
+def extract_serp_links(page_source: Union[str, bytes], search_engine: str, num_results: int,
+                       encoding: Optional[str] = None) -> Tuple[List[Dict[str, str]], int]:
+    """
+    Extracts valid result links from a search results page (raw bytes with their encoding, or decoded str).
+
+    Returns:
+        (results [{'href': url, 'title': title}], number of link elements matched by the selector)
+    """
+    tree = _serp_tree(page_source, encoding)
+    links = _SERP_LINKS[search_engine](tree) if tree is not None else []
+    results: List[Dict[str, str]] = []
+    processed_urls = set() # Track URLs found in this specific search instance
+    for link in links:
+        url = link.get('href')
+        # Basic URL cleaning and validation
+        if not url or not url.startswith('http'):
+            continue
+        # Skip Yandex click-tracking URLs
+        if search_engine == 'yandex' and 'yandex.ru/clck/' in url:
+            continue
+        # Check global validity and if already processed in this search
+        if url not in processed_urls and is_valid_url(url):
+            results.append({'href': url, 'title': link.text_content().strip()})
+            processed_urls.add(url)
+            # Stop if we've found enough valid results for this specific request
+            if len(results) >= num_results:
+                break
+    return results, len(links)
+
+
 # --- Fallback Search Functions (Using requests - KEPT AS BACKUP/REFERENCE, but not used by default) ---
 # These are kept here but the primary search mechanism in the spider is now _search_with_selenium
 def fallback_search_yandex_requests(query: str, num_results: int = 10) -> List[Dict[str, str]]:
     # ... (Implementation using requests from previous examples) ...
     # ... (Includes improved headers and HTML saving for debugging) ...
     # --- THIS FUNCTION IS NOT CALLED BY DEFAULT IN THE SearchYieldingSpider ---
+    import requests # Only these reference fallbacks use requests (exceptions; the pooled session is _get_search_session)
     results = []
     encoded_query = quote_plus(query); search_url = f"https://yandex.ru/search/?text={encoded_query}&lr=213"
-    headers = { 'User-Agent': random.choice(USER_AGENTS), 'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7', 'Accept-Language': 'en-US,en;q=0.9,ru;q=0.8', 'Cache-Control': 'max-age=0', 'Connection': 'keep-alive', 'DNT': '1', 'Referer': 'https://yandex.ru/', 'Sec-Ch-Ua': '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"', 'Sec-Ch-Ua-Mobile': '?0', 'Sec-Ch-Ua-Platform': '"Windows"', 'Sec-Fetch-Dest': 'document', 'Sec-Fetch-Mode': 'navigate', 'Sec-Fetch-Site': 'same-origin', 'Sec-Fetch-User': '?1', 'Upgrade-Insecure-Requests': '1', }
-    html_filename = f"debug_yandex_req_{re.sub(r'[^a-z0-9]+', '_', query.lower())[:30]}.html"
+    headers = next(_YANDEX_HEADERS)
+    html_filename = f"debug_yandex_req_{_SANITIZE_RE.sub('_', query.lower())[:30]}.html"
     try:
         logger.debug(f"[Requests] Requesting Yandex: {search_url}")
-        response = requests.get(search_url, headers=headers, timeout=15)
+        response = _get_search_session().get(search_url, headers=headers, timeout=15)
         logger.info(f"[Requests] Yandex response status code for '{query}': {response.status_code}")
-        try:
-            with open(html_filename, "w", encoding="utf-8") as f: f.write(f"<!-- URL: {search_url} -->\n<!-- Status Code: {response.status_code} -->\n\n{response.text}")
-            logger.info(f"[Requests] Saved Yandex HTML response to '{html_filename}'")
-        except Exception as save_err: logger.error(f"Failed to save Yandex debug HTML: {save_err}")
+        if logger.isEnabledFor(logging.DEBUG): # Full-page dumps are for debugging selectors only
+            try:
+                with open(html_filename, "w", encoding="utf-8") as f: f.write(f"<!-- URL: {search_url} -->\n<!-- Status Code: {response.status_code} -->\n\n{response.text}")
+                logger.debug(f"[Requests] Saved Yandex HTML response to '{html_filename}'")
+            except Exception as save_err: logger.error(f"Failed to save Yandex debug HTML: {save_err}")
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        selector = 'li.serp-item ul.serp-list li.serp-item h2 a[href]' # CHECK THIS SELECTOR
-        links = soup.select(selector)
-        if not links: selector = 'a.Link.OrganicTitle-Link[href]'; links = soup.select(selector) # Fallback selector
-        if not links: logger.warning(f"[Requests] Yandex: No links found using selectors for query '{query}'. Check '{html_filename}'."); return []
+        tree = _serp_tree(response.content, response.encoding)
+        links = (_SERP_LINKS['yandex'](tree) or _YANDEX_ALT_LINKS(tree)) if tree is not None else [] # CHECK THESE SELECTORS
+        if not links: logger.warning(f"[Requests] Yandex: No links found using selectors for query '{query}'. Check '{html_filename}' (saved with DEBUG logging)."); return []
         logger.debug(f"[Requests] Yandex: Found {len(links)} potential links.")
         found_count = 0; processed_urls = set()
         for link in links:
-            url = link.get('href'); title = link.get_text(strip=True)
+            url = link.get('href'); title = link.text_content().strip()
             if url and url.startswith('http') and 'yandex.ru/clck/' not in url:
                 if url not in processed_urls and is_valid_url(url):
                     results.append({'href': url, 'title': title}); processed_urls.add(url); found_count += 1
@@ -257,27 +485,29 @@ def fallback_search_bing_requests(query: str, num_results: int = 10) -> List[Dic
     # ... (Implementation using requests from previous examples) ...
     # ... (Includes improved headers and HTML saving for debugging) ...
     # --- THIS FUNCTION IS NOT CALLED BY DEFAULT IN THE SearchYieldingSpider ---
+    import requests
     results = []
     encoded_query = quote_plus(query); search_url = f"https://www.bing.com/search?q={encoded_query}"
-    headers = { 'User-Agent': random.choice(USER_AGENTS), 'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7', 'Accept-Language': 'en-US,en;q=0.9,ru;q=0.8', 'Cache-Control': 'max-age=0', 'Connection': 'keep-alive', 'DNT': '1', 'Referer': 'https://www.bing.com/', 'Sec-Ch-Ua': '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"', 'Sec-Ch-Ua-Mobile': '?0', 'Sec-Ch-Ua-Platform': '"Windows"', 'Sec-Fetch-Dest': 'document', 'Sec-Fetch-Mode': 'navigate', 'Sec-Fetch-Site': 'same-origin', 'Sec-Fetch-User': '?1', 'Upgrade-Insecure-Requests': '1', }
-    html_filename = f"debug_bing_req_{re.sub(r'[^a-z0-9]+', '_', query.lower())[:30]}.html"
+    headers = next(_BING_HEADERS)
+    html_filename = f"debug_bing_req_{_SANITIZE_RE.sub('_', query.lower())[:30]}.html"
     try:
         logger.debug(f"[Requests] Requesting Bing: {search_url}")
-        response = requests.get(search_url, headers=headers, timeout=15)
+        response = _get_search_session().get(search_url, headers=headers, timeout=15)
         logger.info(f"[Requests] Bing response status code for '{query}': {response.status_code}")
-        try:
-            with open(html_filename, "w", encoding="utf-8") as f: f.write(f"<!-- URL: {search_url} -->\n<!-- Status Code: {response.status_code} -->\n\n{response.text}")
-            logger.info(f"[Requests] Saved Bing HTML response to '{html_filename}'")
-        except Exception as save_err: logger.error(f"Failed to save Bing debug HTML: {save_err}")
+        if logger.isEnabledFor(logging.DEBUG): # Full-page dumps are for debugging selectors only
+            try:
+                with open(html_filename, "w", encoding="utf-8") as f: f.write(f"<!-- URL: {search_url} -->\n<!-- Status Code: {response.status_code} -->\n\n{response.text}")
+                logger.debug(f"[Requests] Saved Bing HTML response to '{html_filename}'")
+            except Exception as save_err: logger.error(f"Failed to save Bing debug HTML: {save_err}")
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        selector = 'li.b_algo h2 a' # CHECK THIS SELECTOR
-        links = soup.select(selector)
-        if not links: logger.warning(f"[Requests] Bing: No links found using selector '{selector}' for query '{query}'. Check '{html_filename}'."); return []
+        tree = _serp_tree(response.content, response.encoding)
+        selector = SERP_SELECTORS['bing'] # CHECK THIS SELECTOR
+        links = _SERP_LINKS['bing'](tree) if tree is not None else []
+        if not links: logger.warning(f"[Requests] Bing: No links found using selector '{selector}' for query '{query}'. Check '{html_filename}' (saved with DEBUG logging)."); return []
         logger.debug(f"[Requests] Bing: Found {len(links)} potential links.")
         found_count = 0; processed_urls = set()
         for link in links:
-            url = link.get('href'); title = link.get_text(strip=True)
+            url = link.get('href'); title = link.text_content().strip()
             if url and url not in processed_urls and is_valid_url(url):
                 results.append({'href': url, 'title': title}); processed_urls.add(url); found_count += 1
                 if found_count >= num_results: break
@@ -290,16 +520,32 @@ def fallback_search_bing_requests(query: str, num_results: int = 10) -> List[Dic
 
 # --- Spider Class (Using Selenium for Search, Yielding from start_requests) ---
 
+@dataclass(slots=True)
+class TaskRecord:
+    """Per-task search state (no __dict__: fixed attribute slots instead of a dict per task)."""
+    info: Dict[str, Any]          # Original task dictionary
+    target: int                   # Target number of URLs for this task
+    found_urls: Set[str] = field(default_factory=set) # URLs found specifically for this task (for summary)
+    yielded_count: int = 0        # Number of requests yielded for this task
+    queries: List[str] = field(default_factory=list) # Query variations (generated once in the spider's __init__)
+
+
 class SearchYieldingSpider(Spider):
     name = 'search_yielding_spider' # Spider name used by Scrapy
 
     # --- Class Attributes ---
     # Structure to hold task information and progress
-    task_data: Dict[Tuple[str, str], Dict[str, Any]]
-    # Set to keep track of all URLs for which requests have been yielded globally
-    all_urls_yielded: Set[str]
-    # Selenium WebDriver instance (initialized in spider_opened)
-    selenium_driver = None
+    task_data: Dict[Tuple[str, str], TaskRecord]
+    # Bloom filter of fingerprints (url_fingerprint) of all URLs yielded globally (per-task found_urls stay exact sets)
+    all_urls_yielded: BloomFilter
+    # Exact number of requests yielded across all tasks (the filter's count is approximate)
+    total_urls_yielded: int
+    # Pool of up to SELENIUM_POOL_SIZE browsers shared by all spider instances in this process
+    # (started on first fallback, see _acquire_selenium_driver; reference-counted, quit by the last spider)
+    _drivers: List[Any] = []
+    _driver_pool: "queue.Queue" = queue.Queue()
+    _driver_users = 0
+    _driver_lock = threading.Lock()
     # Flag indicating if Selenium should be used
     use_selenium: bool
     # Target number of results per query task
@@ -312,9 +558,14 @@ class SearchYieldingSpider(Spider):
             raise ValueError("'search_tasks' list cannot be empty.")
         self.results_per_query = results_per_query
         self.task_data = {}
-        self.all_urls_yielded = set()
-        self.selenium_driver = None
+        self.all_urls_yielded = BloomFilter()
+        self.total_urls_yielded = 0
+        self._uses_driver_pool = False # Set once this spider starts/joins the shared driver pool
         self.use_selenium = USE_SELENIUM_FALLBACK and SELENIUM_AVAILABLE
+        # HTTP search: httpx client living on a private event loop in its own thread
+        self._search_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._search_thread: Optional[threading.Thread] = None
+        self._http: Optional[httpx.AsyncClient] = None
 
         # --- Prepare task data structure ---
         for i, task_info in enumerate(search_tasks):
@@ -329,16 +580,12 @@ class SearchYieldingSpider(Spider):
             if task_key in self.task_data:
                  self.logger.warning(f"Duplicate task key detected: {task_key}. Check plan_item_id/query_id uniqueness. Overwriting previous task info.")
             # Store task details
-            self.task_data[task_key] = {
-                'info': task_info,          # Original task dictionary
-                'target': results_per_query,# Target number of URLs for this task
-                'found_urls': set(),       # URLs found specifically for this task (for summary)
-                'yielded_count': 0         # Number of requests yielded for this task
-            }
+            self.task_data[task_key] = TaskRecord(info=task_info, target=results_per_query,
+                                                  queries=generate_alternative_queries(task_info['query']))
 
         # Log Selenium status clearly at initialization
         if self.use_selenium:
-            self.logger.info("Selenium use is ENABLED (for search and potentially parsing fallback).")
+            self.logger.info("Selenium use is ENABLED (last-resort search and parsing fallback).")
         elif USE_SELENIUM_FALLBACK and not SELENIUM_AVAILABLE:
             self.logger.warning("Selenium use requested but 'selenium' library not found. DISABLING Selenium features.")
         else:
@@ -355,19 +602,79 @@ class SearchYieldingSpider(Spider):
         return spider
 
     def spider_opened(self, spider):
-        """Called when the spider is opened. Initializes Selenium WebDriver if enabled."""
+        """Called when the spider is opened. The browser is not started here: searches go over HTTP."""
         if not self.use_selenium:
             self.logger.info("Spider opened. Selenium is disabled.")
             return
+        self.logger.info(f"Spider opened. Selenium WebDriver ({SELENIUM_BROWSER}) will be started on first fallback.")
 
-        self.logger.info(f"Spider opened. Initializing Selenium WebDriver ({SELENIUM_BROWSER})...")
+    def _acquire_selenium_driver(self):
+        """
+        Borrows a WebDriver from the shared pool, blocking until one is free (thread-safe).
+        The pool is started on first use; returns None if Selenium is unavailable.
+        Every driver obtained here must be handed back with _release_selenium_driver.
+        """
+        if not self.use_selenium:
+            return None
+        cls = SearchYieldingSpider
+        with cls._driver_lock:
+            if not self.use_selenium: # Another thread failed to start the pool while this one waited for the lock
+                return None
+            if not self._uses_driver_pool:
+                if not cls._drivers:
+                    self.logger.info(f"Starting Selenium driver pool ({SELENIUM_POOL_SIZE} x {SELENIUM_BROWSER})...")
+                    for _ in range(SELENIUM_POOL_SIZE):
+                        driver = self._init_selenium_driver()
+                        if driver is None:
+                            break
+                        cls._drivers.append(driver)
+                        cls._driver_pool.put(driver)
+                else:
+                    self.logger.info(f"Reusing the {len(cls._drivers)} Selenium browser(s) already started in this process.")
+                if not cls._drivers:
+                    self.logger.error("No Selenium browser could be started. Disabling Selenium.")
+                    self.use_selenium = False
+                    return None
+                self._uses_driver_pool = True
+                cls._driver_users += 1
+        return cls._driver_pool.get()
+
+    def _release_selenium_driver(self, driver) -> None:
+        """Returns a driver obtained from _acquire_selenium_driver to the pool."""
+        SearchYieldingSpider._driver_pool.put(driver)
+
+    def _close_selenium_pool(self):
+        """Leaves the shared driver pool; the last spider to leave quits all browsers."""
+        cls = SearchYieldingSpider
+        with cls._driver_lock:
+            self._uses_driver_pool = False
+            cls._driver_users -= 1
+            if cls._driver_users > 0:
+                self.logger.info(f"Selenium browsers still used by {cls._driver_users} other spider(s); not closing them.")
+                return
+            drivers, cls._drivers, cls._driver_pool = cls._drivers, [], queue.Queue()
+        self.logger.info(f"Closing {len(drivers)} Selenium WebDriver(s)...")
+        for driver in drivers:
+            try: driver.quit() # Closes the browser and ends the WebDriver process
+            except Exception as e: self.logger.error(f"Error occurred while closing Selenium WebDriver: {e}")
+        self.logger.info("Selenium WebDriver(s) closed.")
+
+    def _init_selenium_driver(self):
+        """Starts a new Selenium WebDriver. Returns None on failure (missing package/unsupported browser disable Selenium)."""
+        self.logger.info(f"Initializing Selenium WebDriver ({SELENIUM_BROWSER})...")
+        try: sel = _get_selenium()
+        except ImportError as e:
+            self.logger.error(f"Failed to import Selenium: {e}. Disabling Selenium.")
+            self.use_selenium = False
+            return None
         try:
             service = None
             options = None
+            driver = None
 
             # --- Configure Chrome Options ---
             if SELENIUM_BROWSER.lower() == 'chrome':
-                options = ChromeOptions()
+                options = sel.ChromeOptions()
                 options.add_argument("--headless") # Run in headless mode (no GUI)
                 options.add_argument("--disable-gpu") # Often needed for headless stability
                 options.add_argument("--no-sandbox") # Often needed in Docker/Linux environments
@@ -382,20 +689,27 @@ class SearchYieldingSpider(Spider):
                     "profile.managed_default_content_settings.images": 2,
                     # "profile.managed_default_content_settings.stylesheets": 2 # Disabling CSS can break sites
                 })
+                options.add_argument("--blink-settings=imagesEnabled=false") # Belt-and-braces over the prefs above
 
                 # --- Initialize WebDriver (Chrome) ---
                 if WEBDRIVER_PATH:
                     self.logger.info(f"Using specified ChromeDriver path: {WEBDRIVER_PATH}")
-                    service = ChromeService(executable_path=WEBDRIVER_PATH)
-                    self.selenium_driver = webdriver.Chrome(service=service, options=options)
+                    service = sel.ChromeService(executable_path=WEBDRIVER_PATH)
+                    driver = sel.webdriver.Chrome(service=service, options=options)
                 else: # Assume chromedriver is in the system's PATH
                     self.logger.info("Using ChromeDriver from system PATH.")
                     # If chromedriver is in PATH, Service is not explicitly needed for basic cases
-                    self.selenium_driver = webdriver.Chrome(options=options)
+                    driver = sel.webdriver.Chrome(options=options)
+
+                # Block CSS/fonts/media/trackers for every page (element waits only need the DOM, not the styles)
+                try:
+                    driver.execute_cdp_cmd('Network.enable', {})
+                    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': SELENIUM_BLOCKED_URLS})
+                except Exception as e: self.logger.warning(f"Could not set CDP URL blocking (continuing without it): {e}")
 
             # --- Configure Firefox Options ---
             elif SELENIUM_BROWSER.lower() == 'firefox':
-                options = FirefoxOptions()
+                options = sel.FirefoxOptions()
                 options.add_argument("--headless")
                 options.add_argument("--disable-gpu")
                 options.set_preference("general.useragent.override", SELENIUM_USER_AGENT)
@@ -406,49 +720,54 @@ class SearchYieldingSpider(Spider):
                  # --- Initialize WebDriver (Firefox) ---
                 if WEBDRIVER_PATH:
                     self.logger.info(f"Using specified GeckoDriver path: {WEBDRIVER_PATH}")
-                    service = FirefoxService(executable_path=WEBDRIVER_PATH)
-                    self.selenium_driver = webdriver.Firefox(service=service, options=options)
+                    service = sel.FirefoxService(executable_path=WEBDRIVER_PATH)
+                    driver = sel.webdriver.Firefox(service=service, options=options)
                 else: # Assume geckodriver is in PATH
                     self.logger.info("Using GeckoDriver from system PATH.")
-                    self.selenium_driver = webdriver.Firefox(options=options)
+                    driver = sel.webdriver.Firefox(options=options)
 
             # --- Unsupported Browser ---
             else:
                 self.logger.error(f"Unsupported Selenium browser configured: {SELENIUM_BROWSER}. Supported: 'chrome', 'firefox'. Disabling Selenium.")
                 self.use_selenium = False
-                return
+                return None
 
             # --- Set Timeouts ---
-            self.selenium_driver.set_page_load_timeout(SELENIUM_PAGE_LOAD_TIMEOUT)
+            driver.set_page_load_timeout(SELENIUM_PAGE_LOAD_TIMEOUT)
             # Implicit waits are generally discouraged; use explicit WebDriverWait instead.
-            # self.selenium_driver.implicitly_wait(5) # Avoid if possible
+            # driver.implicitly_wait(5) # Avoid if possible
 
             self.logger.info("Selenium WebDriver initialized successfully.")
+            return driver
 
         # --- Handle Initialization Errors ---
-        except WebDriverException as e:
+        except sel.WebDriverException as e:
             self.logger.error(f"Failed to initialize Selenium WebDriver: {e}", exc_info=True)
             self.logger.error("Ensure the correct WebDriver executable (e.g., chromedriver, geckodriver) matching your browser version is installed and accessible via system PATH or the 'WEBDRIVER_PATH' setting in the script.")
-            self.selenium_driver = None # Ensure driver is None if init fails
-            self.use_selenium = False # Disable Selenium features if driver failed
+            return None
         except Exception as e:
             self.logger.error(f"An unexpected error occurred during Selenium initialization: {e}", exc_info=True)
-            self.selenium_driver = None
-            self.use_selenium = False
+            return None
 
 
     def spider_closed(self, spider):
-        """Called when the spider finishes. Closes the Selenium WebDriver and logs summary."""
+        """Called when the spider finishes. Closes the HTTP search client, the Selenium WebDriver and logs summary."""
+        # --- Close HTTP Search Client and its Event Loop ---
+        if self._search_loop is not None:
+            if self._http is not None:
+                try: self._run_search(self._http.aclose())
+                except Exception as e: self.logger.error(f"Error occurred while closing the search HTTP client: {e}")
+                self._http = None
+            self._search_loop.call_soon_threadsafe(self._search_loop.stop)
+            self._search_thread.join(timeout=5)
+            self._search_loop.close()
+            self._search_loop = None
+
         # --- Close Selenium Driver ---
-        if self.selenium_driver:
-            self.logger.info("Closing Selenium WebDriver...")
-            try:
-                self.selenium_driver.quit() # Closes the browser and ends the WebDriver process
-                self.logger.info("Selenium WebDriver closed.")
-            except Exception as e:
-                self.logger.error(f"Error occurred while closing Selenium WebDriver: {e}")
+        if self._uses_driver_pool:
+            self._close_selenium_pool()
         else:
-             self.logger.info("Spider closed. Selenium was not active.")
+             self.logger.info("Spider closed. Selenium was not started.")
 
         # --- Log Final Summary ---
         # Called here ensures summary logs after all potential items are processed/errors handled.
@@ -457,21 +776,21 @@ class SearchYieldingSpider(Spider):
     def log_summary(self):
         """Logs summary statistics about the crawl results at the end."""
         self.logger.info("--- Final Crawl Summary ---")
-        total_yielded = len(self.all_urls_yielded)
+        total_yielded = self.total_urls_yielded
         tasks_failed_to_find_urls = 0
         tasks_met_target = 0
         tasks_below_target = 0
 
         # Analyze results per task
         for key, data in self.task_data.items():
-            found_count = len(data['found_urls'])   # How many unique valid URLs were found for this task
-            yielded_count = data['yielded_count'] # How many requests were actually yielded for this task
-            target = data['target']             # The target number of URLs for this task
+            found_count = len(data.found_urls)  # How many unique valid URLs were found for this task
+            yielded_count = data.yielded_count  # How many requests were actually yielded for this task
+            target = data.target                # The target number of URLs for this task
 
             if yielded_count == 0 and found_count == 0:
                  # This task truly failed to find any relevant URLs during search
                  tasks_failed_to_find_urls += 1
-                 self.logger.warning(f"Task {key}: Found 0 URLs for query '{data['info']['query']}'")
+                 self.logger.warning(f"Task {key}: Found 0 URLs for query '{data.info['query']}'")
             elif yielded_count >= target:
                  # Task met or exceeded the target number of yielded requests
                  tasks_met_target += 1
@@ -492,125 +811,181 @@ class SearchYieldingSpider(Spider):
     def start_requests(self):
         """
         The entry point for Scrapy. Manages the search process and yields Scrapy Requests.
-        This method is a generator. It iterates through tasks and query variations,
-        performs searches (using Selenium in this version), and yields requests
-        for found URLs immediately to the Scrapy engine.
+        This method is a generator. All HTTP searches (every task, query variation and engine)
+        run concurrently first; then results are walked task by task and requests for found URLs
+        are yielded to the Scrapy engine until each task reaches its target.
         """
         self.logger.info(f"--- Starting Search & Yield Phase for {len(self.task_data)} tasks ---")
         if not self.task_data:
              self.logger.warning("No tasks loaded into spider. Nothing to search.")
              return # Exit generator if no tasks
 
-        # --- Iterate through each task defined in __init__ ---
-        task_counter = 0
+        # --- Build every (task, query variation, engine) search job up front ---
+        jobs: List[Tuple[Tuple[str, str], str, str]] = []
         for task_key, data in self.task_data.items():
-            task_counter += 1
-            task_info = data['info']
-            base_query = task_info['query']
-            self.logger.info(f"\n--- Processing Task {task_counter}/{len(self.task_data)} (ID: {task_key}): Base Query = '{base_query}' ---")
-            alternative_queries = generate_alternative_queries(base_query)
-
-            # --- Iterate through query variations for the current task ---
-            for query_index, query in enumerate(alternative_queries):
-                # Check if target for this task has already been met before starting search
-                if self.task_data[task_key]['yielded_count'] >= self.task_data[task_key]['target']:
-                    self.logger.info(f"Target of {self.task_data[task_key]['target']} yielded URLs reached for task {task_key}. Skipping remaining variations.")
-                    break # Stop trying variations for THIS task, move to the next task
-
-                self.logger.info(f"Task {task_key}: Trying query variation {query_index+1}/{len(alternative_queries)}: '{query}'")
-
-                # --- Perform Search using selected method ---
-                search_results : List[Dict[str, str]] = [] # List to hold {'href': '...', 'title': '...'}
-                try:
-                    # Calculate how many more URLs are needed for this task right now
-                    needed_urls = self.task_data[task_key]['target'] - self.task_data[task_key]['yielded_count']
-
-                    # --- Primary Search Method: Selenium ---
-                    if needed_urls > 0:
-                        self.logger.debug(f"Task {task_key}: Calling Selenium search (Yandex, Need: {needed_urls})...")
-                        # Use _search_with_selenium, requesting slightly more results for buffer
-                        yandex_search_results = self._search_with_selenium(query, 'yandex', needed_urls + 3, task_key)
-                        search_results.extend(yandex_search_results)
-                        # Add a pause after using Selenium for one engine
-                        if yandex_search_results:
-                             time.sleep(random.uniform(1.5, 3.0))
-
-                    # Recalculate needed URLs after the first search engine attempt
-                    needed_urls = self.task_data[task_key]['target'] - self.task_data[task_key]['yielded_count']
-                    if needed_urls > 0:
-                         self.logger.debug(f"Task {task_key}: Calling Selenium search (Bing, Need: {needed_urls})...")
-                         bing_search_results = self._search_with_selenium(query, 'bing', needed_urls + 3, task_key)
-                         search_results.extend(bing_search_results)
-                         # Optional shorter pause after the second engine
-                         if bing_search_results:
-                              time.sleep(random.uniform(0.5, 1.5))
-
-                    # --- End Primary Search Method ---
-
-                    # --- ALTERNATIVE: Fallback using requests (Uncomment to use instead of Selenium for search) ---
-                    # if needed_urls > 0:
-                    #     self.logger.debug(f"Task {task_key}: Calling fallback_search_yandex_requests (Need: {needed_urls})...")
-                    #     search_results.extend(fallback_search_yandex_requests(query, needed_urls + 3))
-                    #     time.sleep(random.uniform(0.5, 1.0)) # Short pause between requests fallbacks
-                    # needed_urls = self.task_data[task_key]['target'] - self.task_data[task_key]['yielded_count']
-                    # if needed_urls > 0:
-                    #      self.logger.debug(f"Task {task_key}: Calling fallback_search_bing_requests (Need: {needed_urls})...")
-                    #      search_results.extend(fallback_search_bing_requests(query, needed_urls + 3))
-                    # --- End ALTERNATIVE ---
-
-                    self.logger.debug(f"Task {task_key}: Search variation '{query}' returned {len(search_results)} total potential results.")
-
-                    # --- Process search results and yield Scrapy Requests ---
-                    if search_results:
-                        processed_in_variation = 0
-                        # Use a set to avoid yielding duplicate URLs found within the *same* search variation batch
-                        yielded_in_variation = set()
-                        for r in search_results:
-                            # Check task target again inside the loop
-                            if self.task_data[task_key]['yielded_count'] >= self.task_data[task_key]['target']:
-                                break # Stop processing results if target met
-
-                            result_url = r.get('href')
-                            # Check if we already processed this specific URL in this batch
-                            if result_url and result_url not in yielded_in_variation:
-                                # Use 'yield from' because _yield_request_if_needed is a generator
-                                # It will handle global uniqueness and task counts internally
-                                yield from self._yield_request_if_needed(result_url, task_key, task_info, "search_results")
-                                yielded_in_variation.add(result_url) # Mark as processed for this batch
-                                processed_in_variation += 1
-
-                        self.logger.debug(f"Task {task_key}: Processed {processed_in_variation} unique results from variation '{query}'.")
-                    else:
-                        # Log if a specific search variation yielded nothing
-                        self.logger.warning(f"Task {task_key}: Search variation '{query}' returned no results from any engine.")
+            for query in data.queries:
+                for search_engine in SEARCH_ENGINES:
+                    jobs.append((task_key, query, search_engine))
 
-                except Exception as e:
-                     # Catch errors during the search execution itself
-                     self.logger.error(f"Task {task_key}: Error during search execution/processing for query '{query}': {e}", exc_info=True)
-
-                # --- Delay between query variations for the same task ---
-                # Apply delay only if target not met and there are more variations left
-                if self.task_data[task_key]['yielded_count'] < self.task_data[task_key]['target'] and query_index < len(alternative_queries) - 1:
-                     # Use a potentially longer delay since Selenium search is intensive
-                     delay_variation = SEARCH_DELAY_BETWEEN_VARIATIONS * random.uniform(1.0, 1.5)
-                     self.logger.debug(f"Pausing {delay_variation:.1f}s before next query variation...")
-                     time.sleep(delay_variation)
-
-            # --- Delay after finishing all variations for a task ---
-            self.logger.debug(f"Finished all search variations for Task {task_key}.")
-            # Apply delay before starting the *next task* in the outer loop
-            if task_counter < len(self.task_data): # Only pause if not the last task
-                delay_after_task = SEARCH_DELAY_AFTER_TASK * random.uniform(1.0, 1.5)
-                self.logger.debug(f"Pausing {delay_after_task:.1f}s before starting next task...")
-                time.sleep(delay_after_task)
+        # --- Run all HTTP searches concurrently (bounded per engine) ---
+        self.logger.info(f"Running {len(jobs)} HTTP searches concurrently (up to {SEARCH_ENGINE_CONCURRENCY} per engine)...")
+        try:
+            job_results = self._run_search(self._search_all_http(jobs))
+        except Exception as e:
+            self.logger.error(f"Search phase failed: {e}", exc_info=True)
+            job_results = [([], True) for _ in jobs] # Nothing was fetched: let Selenium try every search
+        results_by_task: Dict[Tuple[str, str], List[Tuple[str, str, List[Dict[str, str]], bool]]] = defaultdict(list)
+        for (task_key, query, search_engine), (search_results, blocked) in zip(jobs, job_results):
+            results_by_task[task_key].append((query, search_engine, search_results, blocked))
+
+        # --- Yield requests task by task, in variation/engine order ---
+        for task_counter, (task_key, data) in enumerate(self.task_data.items(), 1):
+            task_info = data.info
+            self.logger.info(f"\n--- Processing Task {task_counter}/{len(self.task_data)} (ID: {task_key}): Base Query = '{task_info['query']}' ---")
+
+            # 1. HTTP results, in variation/engine order
+            blocked_searches: List[Tuple[str, str]] = []
+            for query, search_engine, search_results, blocked in results_by_task[task_key]:
+                # Check if target for this task has already been met
+                if data.yielded_count >= data.target:
+                    self.logger.info(f"Target of {data.target} yielded URLs reached for task {task_key}. Skipping remaining results.")
+                    break # Move to the next task
+                if not search_results:
+                    self.logger.warning(f"Task {task_key}: HTTP {search_engine} search for '{query}' returned no results{' (blocked)' if blocked else ''}.")
+                    if blocked: # A browser would only re-fetch the same page for plain empty/filtered results
+                        blocked_searches.append((query, search_engine))
+                    continue
+                yield from self._yield_search_results(search_results, task_key, task_info, search_engine, query)
+
+            # 2. Last resort: Selenium for the searches that hit a CAPTCHA/stub page, only while the task still needs URLs
+            if blocked_searches and self.use_selenium and data.yielded_count < data.target:
+                yield from self._yield_selenium_search_results(blocked_searches, task_key, data)
+
+            self.logger.debug(f"Finished all search results for Task {task_key}.")
 
         self.logger.info("--- Search & Yield Phase Completed for all tasks ---")
         # The generator naturally ends here after iterating through all tasks
 
 
+    def _yield_search_results(self, search_results: List[Dict[str, str]], task_key: Tuple[str, str],
+                              task_info: Dict[str, Any], search_engine: str, query: str):
+        """Yields Scrapy requests for one search's results until the task target is met. This is a generator."""
+        data = self.task_data[task_key]
+        try:
+            self.logger.debug(f"Task {task_key}: {search_engine} search for '{query}' returned {len(search_results)} potential results.")
+            processed_in_variation = 0
+            # Use a set to avoid yielding duplicate URLs found within the *same* search batch
+            yielded_in_variation = set()
+            for r in search_results:
+                # Check task target again inside the loop
+                if data.yielded_count >= data.target:
+                    break # Stop processing results if target met
+
+                result_url = r.get('href')
+                # Check if we already processed this specific URL in this batch
+                if result_url and result_url not in yielded_in_variation:
+                    # Use 'yield from' because _yield_request_if_needed is a generator
+                    # It will handle global uniqueness and task counts internally
+                    yield from self._yield_request_if_needed(result_url, task_key, task_info, "search_results")
+                    yielded_in_variation.add(result_url) # Mark as processed for this batch
+                    processed_in_variation += 1
+
+            self.logger.debug(f"Task {task_key}: Processed {processed_in_variation} unique results from {search_engine} '{query}'.")
+        except Exception as e:
+            self.logger.error(f"Task {task_key}: Error while processing results for query '{query}': {e}", exc_info=True)
+
+    def _yield_selenium_search_results(self, searches: List[Tuple[str, str]], task_key: Tuple[str, str], data: TaskRecord):
+        """
+        Runs (query, engine) Selenium searches concurrently on the driver pool and yields requests
+        for results as each search completes. Stops once the task target is met (pending searches are cancelled).
+        This is a generator.
+        """
+        needed_urls = data.target - data.yielded_count
+        self.logger.warning(f"Task {task_key}: Trying Selenium for {len(searches)} blocked HTTP searches on up to {SELENIUM_POOL_SIZE} browsers (Need: {needed_urls})...")
+        executor = ThreadPoolExecutor(max_workers=min(SELENIUM_POOL_SIZE, len(searches)), thread_name_prefix='selenium-search')
+        try:
+            futures = {executor.submit(self._search_with_selenium, query, search_engine, needed_urls + 3, task_key): (query, search_engine)
+                       for query, search_engine in searches}
+            for future in as_completed(futures):
+                query, search_engine = futures[future]
+                try: search_results = future.result()
+                except Exception as e:
+                    self.logger.error(f"Task {task_key}: Selenium {search_engine} search for '{query}' failed: {e}", exc_info=True)
+                    continue
+                if search_results:
+                    yield from self._yield_search_results(search_results, task_key, data.info, search_engine, query)
+                if data.yielded_count >= data.target:
+                    self.logger.info(f"Target of {data.target} yielded URLs reached for task {task_key}. Cancelling remaining Selenium searches.")
+                    break
+        finally:
+            # Waits only for searches already running (their browsers go back to the pool)
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _run_search(self, coro):
+        """Runs a coroutine on the spider's search event loop (started on first use) and waits for its result."""
+        if self._search_loop is None:
+            self._search_loop = asyncio.new_event_loop()
+            self._search_thread = threading.Thread(target=self._search_loop.run_forever, name='search-loop', daemon=True)
+            self._search_thread.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._search_loop).result()
+
+    async def _search_all_http(self, jobs: List[Tuple[Tuple[str, str], str, str]]) -> List[Tuple[List[Dict[str, str]], bool]]:
+        """Runs all (task_key, query, engine) HTTP searches concurrently; (results, blocked) come back in job order."""
+        # Semaphores are created here, on the search loop they belong to
+        semaphores = {search_engine: asyncio.Semaphore(SEARCH_ENGINE_CONCURRENCY) for search_engine in SEARCH_ENGINES}
+
+        async def bounded_search(task_key: Tuple[str, str], query: str, search_engine: str) -> Tuple[List[Dict[str, str]], bool]:
+            async with semaphores[search_engine]:
+                outcome = await self._search_http(query, search_engine, self.task_data[task_key].target + 3, task_key)
+                # The delay is taken inside the slot: it only slows down this engine, other engines keep going
+                await asyncio.sleep(SEARCH_ENGINE_DELAY * random.uniform(1.0, 1.5))
+                return outcome
+
+        return await asyncio.gather(*(bounded_search(*job) for job in jobs))
+
+    async def _search_http(self, query: str, search_engine: str, num_results: int,
+                           task_key: Tuple[str,str]) -> Tuple[List[Dict[str, str]], bool]:
+        """
+        Performs a search with the spider's pooled httpx client (runs on the search event loop).
+
+        Returns:
+            (results [{'href': url, 'title': title}] or an empty list on failure,
+             True if the engine served a CAPTCHA/stub page - the only case worth a Selenium retry)
+        """
+        search_url = build_serp_url(search_engine, query, num_results)
+        if search_url is None:
+            self.logger.error(f"Task {task_key}: Unsupported search engine: {search_engine}")
+            return [], False
+        if self._http is None:
+            self._http = httpx.AsyncClient(http2=HTTP2_AVAILABLE, limits=SEARCH_HTTP_LIMITS, timeout=SEARCH_HTTP_TIMEOUT,
+                                           headers={**SEARCH_HTTP_HEADERS, 'User-Agent': random.choice(USER_AGENTS)},
+                                           follow_redirects=True)
+
+        results: List[Dict[str, str]] = []
+        self.logger.debug(f"Task {task_key}: HTTP search ({search_engine}) executing for '{query}' at {search_url}")
+        try:
+            response = await self._http.get(search_url)
+            if serp_looks_blocked(response.content, str(response.url)): # Checked first: CAPTCHA pages may come with 4xx
+                self.logger.warning(f"Task {task_key}: HTTP search ({search_engine}) got a CAPTCHA/stub page for query '{query}' "
+                                    f"(status {response.status_code}, {len(response.content)} bytes).")
+                return [], True
+            response.raise_for_status()
+            results, link_count = extract_serp_links(response.content, search_engine, num_results, response.encoding)
+            if not link_count:
+                self.logger.warning(f"Task {task_key}: HTTP search ({search_engine}) found 0 links using selector '{SERP_SELECTORS[search_engine]}' for query '{query}' (check the selector).")
+        except httpx.TimeoutException:
+            self.logger.error(f"Task {task_key}: HTTP search ({search_engine}) TIMED OUT for query '{query}'. URL: {search_url}")
+        except httpx.HTTPError as e:
+            self.logger.error(f"Task {task_key}: HTTP error during {search_engine} search for '{query}': {e}")
+        except Exception as e:
+            self.logger.error(f"Task {task_key}: Unexpected error during HTTP {search_engine} search for '{query}': {e}", exc_info=True)
+
+        self.logger.info(f"Task {task_key}: HTTP {search_engine} search for '{query}' returning {len(results)} valid results.")
+        return results, False
+
     def _search_with_selenium(self, query: str, search_engine: str, num_results: int, task_key: Tuple[str,str]) -> List[Dict[str, str]]:
         """
-        Performs a search using Selenium for the specified engine.
+        Last-resort search using Selenium for the specified engine (e.g. when the HTTP search hit a CAPTCHA).
 
         Args:
             query: The search query string.
@@ -621,60 +996,48 @@ class SearchYieldingSpider(Spider):
         Returns:
             A list of dictionaries [{'href': url, 'title': title}] or an empty list on failure.
         """
-        # Check if Selenium is available and initialized
-        if not self.use_selenium or not self.selenium_driver:
-            self.logger.warning(f"Task {task_key}: Selenium search requested for {search_engine} but Selenium not available/initialized.")
-            return []
-
         results: List[Dict[str, str]] = []
-        encoded_query = quote_plus(query)
-        search_url = ""
-        # --- !!! CRITICAL: UPDATE THESE SELECTORS BASED ON MANUAL INSPECTION !!! ---
-        selector_yandex = 'li.serp-item ul.serp-list li.serp-item h2 a[href]' # Example Yandex Selector (Likely needs update)
-        selector_bing = 'li.b_algo h2 a'                     # Example Bing Selector (Likely needs update)
-        # --- !!! END CRITICAL SELECTOR SECTION !!! ---
-        selector = ""
-
-        # Configure URL and Selector based on the search engine
-        if search_engine == 'yandex':
-            search_url = f"https://yandex.ru/search/?text={encoded_query}&lr=213" # lr=213 Moscow
-            selector = selector_yandex
-        elif search_engine == 'bing':
-            search_url = f"https://www.bing.com/search?q={encoded_query}&num={num_results+5}" # Ask Bing for more results
-            selector = selector_bing
-        else:
+        search_url = build_serp_url(search_engine, query, num_results)
+        if search_url is None:
             self.logger.error(f"Task {task_key}: Unsupported search engine for Selenium search: {search_engine}")
             return []
+        selector = SERP_SELECTORS[search_engine]
+
+        # Borrow a browser from the shared pool (started on first use; waits while all are busy)
+        driver = self._acquire_selenium_driver()
+        if driver is None:
+            self.logger.warning(f"Task {task_key}: Selenium search requested for {search_engine} but Selenium not available/initialized.")
+            return []
+        sel = _get_selenium() # Already imported by the driver initialization
 
         self.logger.debug(f"Task {task_key}: Selenium search ({search_engine}) executing for '{query}' at {search_url}")
 
         try:
             # Navigate to the search URL
-            self.selenium_driver.get(search_url)
+            driver.get(search_url)
 
             # --- Wait for results to appear (Crucial Step) ---
             # Wait for the *first element* matching the main selector part to be present.
             # This is a basic wait; more robust waits might target a container div.
             wait_selector = selector.split(" ")[0] # e.g., 'li.serp-item' or 'li.b_algo'
             self.logger.debug(f"Task {task_key}: Waiting for element matching '{wait_selector}'...")
-            WebDriverWait(self.selenium_driver, SELENIUM_WAIT_TIMEOUT + 5).until( # Allow slightly longer wait
-                 EC.presence_of_element_located((By.CSS_SELECTOR, wait_selector))
+            sel.WebDriverWait(driver, SELENIUM_WAIT_TIMEOUT + 5).until( # Allow slightly longer wait
+                 sel.EC.presence_of_element_located((sel.By.CSS_SELECTOR, wait_selector))
             )
             self.logger.debug(f"Task {task_key}: Initial element found. Pausing briefly for potential JS rendering...")
             # Short explicit pause can help ensure dynamic content loads after initial element appears
             time.sleep(random.uniform(2.0, 4.0)) # Adjust pause as needed
 
             # --- Get Page Source and Parse ---
-            page_source = self.selenium_driver.page_source
-            soup = BeautifulSoup(page_source, 'html.parser')
-            links = soup.select(selector)
+            page_source = driver.page_source
+            results, link_count = extract_serp_links(page_source, search_engine, num_results)
 
             # --- Log and Handle No Results ---
-            if not links:
+            if not link_count:
                  self.logger.warning(f"Task {task_key}: Selenium search ({search_engine}) found 0 links using selector '{selector}' for query '{query}'.")
                  self.logger.warning(f"Task {task_key}: Check if the selector is correct or if the page indicates blocking/CAPTCHA.")
                  # Save HTML for debugging when selectors fail
-                 html_filename = f"debug_selenium_{search_engine}_{re.sub(r'[^a-z0-9]+', '_', query.lower())[:25]}.html"
+                 html_filename = f"debug_selenium_{search_engine}_{_SANITIZE_RE.sub('_', query.lower())[:25]}.html"
                  try:
                      with open(html_filename, "w", encoding="utf-8") as f:
                           f.write(f"<!-- URL: {search_url} -->\n")
@@ -686,46 +1049,19 @@ class SearchYieldingSpider(Spider):
                      self.logger.error(f"Task {task_key}: Failed to save debug HTML: {save_err}")
                  return [] # Return empty list if no links found
 
-            self.logger.debug(f"Task {task_key}: Selenium search ({search_engine}) found {len(links)} potential link elements using '{selector}'.")
-
-            # --- Extract Valid URLs ---
-            found_count = 0
-            processed_urls = set() # Track URLs found in this specific search instance
-            for i, link in enumerate(links):
-                url = link.get('href')
-                title = link.get_text(strip=True)
-                # self.logger.debug(f"  Raw Link {i+1}: Title='{title}', URL='{url}'") # Very verbose
-
-                # Basic URL cleaning and validation
-                if url and url.startswith('http'):
-                     # Skip Yandex click-tracking URLs
-                     if search_engine == 'yandex' and 'yandex.ru/clck/' in url:
-                          # self.logger.debug(f"    -> Skipping Yandex click URL: {url}")
-                          continue
-                     # Check global validity and if already processed in this search
-                     if url not in processed_urls and is_valid_url(url):
-                         results.append({'href': url, 'title': title})
-                         processed_urls.add(url)
-                         found_count += 1
-                         # self.logger.debug(f"    -> Added valid URL #{found_count} from Selenium {search_engine}")
-                         # Stop if we've found enough valid results for this specific request
-                         if found_count >= num_results:
-                             self.logger.debug(f"Task {task_key}: Reached target ({num_results}) for Selenium {search_engine} search.")
-                             break
-                     # elif url in processed_urls: self.logger.debug(f"    -> Skipping duplicate URL within this search: {url}")
-                     # else: self.logger.debug(f"    -> Skipping invalid URL (is_valid_url=False): {url}")
-                # else: self.logger.debug(f"    -> Skipping URL with invalid scheme or None: {url}")
-
+            self.logger.debug(f"Task {task_key}: Selenium search ({search_engine}) found {link_count} potential link elements using '{selector}'.")
 
         # --- Handle Selenium Errors ---
-        except TimeoutException:
+        except sel.TimeoutException:
             self.logger.error(f"Task {task_key}: Selenium search ({search_engine}) TIMED OUT waiting for page elements for query '{query}'. URL: {search_url}")
-        except WebDriverException as e:
+        except sel.WebDriverException as e:
              # Catch broad Selenium errors (navigation, browser crashes, etc.)
              self.logger.error(f"Task {task_key}: Selenium WebDriverException during {search_engine} search for '{query}': {e}", exc_info=False) # Log less detail by default
         except Exception as e:
             # Catch any other unexpected errors during the Selenium process
             self.logger.error(f"Task {task_key}: Unexpected error during Selenium {search_engine} search for '{query}': {e}", exc_info=True) # Log full traceback
+        finally:
+            self._release_selenium_driver(driver)
 
         # --- Log Final Result Count and Return ---
         self.logger.info(f"Task {task_key}: Selenium {search_engine} search for '{query}' returning {len(results)} valid results.")
@@ -744,7 +1080,7 @@ class SearchYieldingSpider(Spider):
         task_stats = self.task_data[task_key]
 
         # 1. Check if task target already met
-        if task_stats['yielded_count'] >= task_stats['target']:
+        if task_stats.yielded_count >= task_stats.target:
             return # Target met, don't yield more for this task
 
         # 2. Check URL validity using the helper function
@@ -752,20 +1088,23 @@ class SearchYieldingSpider(Spider):
             # self.logger.debug(f"Task {task_key}: Invalid URL skipped ({source}): {url}")
             return
 
-        # 3. Check if URL has already been yielded *globally* across all tasks
-        if url in self.all_urls_yielded:
+        # 3. Check if URL has already been yielded *globally* across all tasks (by fingerprint, so
+        #    '?utm_source=...', '#section' or reordered query variants of the same page count as duplicates)
+        fingerprint = url_fingerprint(url)
+        if fingerprint in self.all_urls_yielded:
             # self.logger.debug(f"Task {task_key}: URL already yielded globally, skipping: {url} (From {source})")
             return
 
         # --- If all checks pass, proceed to yield ---
-        self.logger.info(f"Task {task_key}: Yielding request [{task_stats['yielded_count']+1}/{task_stats['target']}] from {source}: {url}")
+        self.logger.info(f"Task {task_key}: Yielding request [{task_stats.yielded_count+1}/{task_stats.target}] from {source}: {url}")
 
         # Mark URL as yielded globally *before* yielding
-        self.all_urls_yielded.add(url)
+        self.all_urls_yielded.add(fingerprint)
+        self.total_urls_yielded += 1
         # Track found URL specifically for this task (for summary)
-        task_stats['found_urls'].add(url)
+        task_stats.found_urls.add(url)
         # Increment yielded count for this specific task
-        task_stats['yielded_count'] += 1
+        task_stats.yielded_count += 1
 
         # Yield the Scrapy request to the engine
         yield scrapy.Request(
@@ -779,7 +1118,7 @@ class SearchYieldingSpider(Spider):
                 'download_timeout': 35,         # Timeout for this specific download
                 'retry_times': 0                # Scrapy retry middleware uses this
             },
-            headers={'User-Agent': random.choice(USER_AGENTS)}, # Vary user agent per request
+            headers=next(_UA_HEADERS), # Vary user agent per request
             # dont_filter=False # Let Scrapy's default duplicate filter run, our set handles cross-task uniqueness
         )
 
@@ -830,7 +1169,7 @@ class SearchYieldingSpider(Spider):
         # 4. Decide whether to use Selenium *parsing* fallback
         # Stricter trigger: Only if initial extraction failed badly (very short or no text)
         should_try_selenium_parsing = (
-            self.use_selenium and self.selenium_driver and
+            self.use_selenium and # The browser itself is started by the fallback on first use
             (extracted_text is None or len(extracted_text) < 50) # Threshold for significant failure
         )
 
@@ -901,7 +1240,7 @@ class SearchYieldingSpider(Spider):
         # --- 1. Trafilatura (Primary) ---
         try:
             # Pass original bytes, Trafilatura handles encoding detection well
-            text = trafilatura.extract(html_content,
+            text = _get_trafilatura().extract(html_content,
                                        include_comments=False, include_tables=True,
                                        include_formatting=True, include_links=False,
                                        output_format='text', url=url,
@@ -923,7 +1262,7 @@ class SearchYieldingSpider(Spider):
             try:
                 if decoded_html: # Newspaper needs decoded string
                     lang = 'ru' if '.ru/' in url or '.рф/' in url else 'en' # Basic language hint
-                    article = Article(url=url, language=lang)
+                    article = _get_newspaper_article()(url=url, language=lang)
                     article.download(input_html=decoded_html)
                     article.parse()
                     if article.text:
@@ -988,8 +1327,8 @@ class SearchYieldingSpider(Spider):
                     raw_text = '\n\n'.join(text_parts)
 
                     # Cleaning
-                    clean_text = re.sub(r'[ \t\r\f\v]+', ' ', raw_text).strip() # Collapse whitespace
-                    clean_text = re.sub(r'\n{3,}', '\n\n', clean_text) # Collapse newlines
+                    clean_text = _HSPACE_RE.sub(' ', raw_text).strip() # Collapse whitespace
+                    clean_text = _MULTI_NEWLINE_RE.sub('\n\n', clean_text) # Collapse newlines
 
                     # Check length (use lower threshold for this last resort)
                     if len(clean_text) >= MIN_CONTENT_LENGTH:
@@ -1014,29 +1353,34 @@ class SearchYieldingSpider(Spider):
         Fallback using Selenium to *re-fetch and parse* a page if initial libraries failed significantly.
         Yields a success or failure item. This is a generator.
         """
-        # Check if Selenium is enabled and driver is ready
-        if not self.use_selenium or not self.selenium_driver:
+        # Check if Selenium is enabled and borrow a browser from the shared pool (started on first use)
+        driver = self._acquire_selenium_driver()
+        if driver is None:
              self.logger.error(f"Task {task_info.get('plan_item_id', 'N/A')}: Selenium PARSING fallback requested for {url} but Selenium is disabled or not initialized.")
              yield self._create_failure_item(task_info, url, "selenium_disabled", title=initial_title)
              return # Stop generator
+        sel = _get_selenium()
 
         self.logger.info(f"🚀 Attempting Selenium PARSING fallback for: {url}")
         page_source: Optional[str] = None
         selenium_title: Optional[str] = None
 
         try:
-            # --- Navigate and Wait ---
-            self.selenium_driver.get(url)
-            # Wait for body, could potentially wait longer or for a specific element if known
-            WebDriverWait(self.selenium_driver, SELENIUM_WAIT_TIMEOUT).until(
-                EC.presence_of_element_located((By.TAG_NAME, "body"))
-            )
-            # Optional brief pause for JS execution after body is present
-            # time.sleep(random.uniform(1.0, 2.0))
-
-            # --- Get Rendered Source and Title ---
-            page_source = self.selenium_driver.page_source
-            selenium_title = self.selenium_driver.title # Title after JS execution
+            # --- Navigate and Wait (the browser goes back to the pool before anything is yielded) ---
+            try:
+                driver.get(url)
+                # Wait for body, could potentially wait longer or for a specific element if known
+                sel.WebDriverWait(driver, SELENIUM_WAIT_TIMEOUT).until(
+                    sel.EC.presence_of_element_located((sel.By.TAG_NAME, "body"))
+                )
+                # Optional brief pause for JS execution after body is present
+                # time.sleep(random.uniform(1.0, 2.0))
+
+                # --- Get Rendered Source and Title ---
+                page_source = driver.page_source
+                selenium_title = driver.title # Title after JS execution
+            finally:
+                self._release_selenium_driver(driver)
 
             # Check if source was retrieved
             if not page_source:
@@ -1068,10 +1412,10 @@ class SearchYieldingSpider(Spider):
                  yield self._create_failure_item(task_info, url, fail_reason, title=final_title)
 
         # --- Handle Selenium Errors during Fallback ---
-        except TimeoutException:
+        except sel.TimeoutException:
             self.logger.error(f"Task {task_info.get('plan_item_id', 'N/A')}: Selenium PARSING fallback TIMED OUT for {url}")
             yield self._create_failure_item(task_info, url, "selenium_timeout_parse", title=initial_title)
-        except WebDriverException as e:
+        except sel.WebDriverException as e:
             self.logger.error(f"Task {task_info.get('plan_item_id', 'N/A')}: Selenium WebDriverException during PARSING fallback for {url}: {e}", exc_info=False)
             yield self._create_failure_item(task_info, url, "selenium_webdriver_error_parse", title=initial_title)
         except Exception as e:
@@ -1082,8 +1426,8 @@ class SearchYieldingSpider(Spider):
     def _create_item(self, task_info, url, title, text, method):
         """Helper: Creates a dictionary for a successful scrape result."""
         cleaned_text = text.strip()
-        cleaned_text = re.sub(r'[ \t\r\f\v]+', ' ', cleaned_text) # Normalize whitespace
-        cleaned_text = re.sub(r'\n{3,}', '\n\n', cleaned_text)    # Normalize newlines
+        cleaned_text = _HSPACE_RE.sub(' ', cleaned_text) # Normalize whitespace
+        cleaned_text = _MULTI_NEWLINE_RE.sub('\n\n', cleaned_text) # Normalize newlines
         return {
             'query': task_info.get('query'),
             'plan_item': task_info.get('plan_item'),
@@ -1164,7 +1508,7 @@ def run_search_yielding_scrape(search_tasks: List[Dict[str, Any]], results_per_q
 
     # --- Log Setup Messages ---
     if USE_SELENIUM_FALLBACK:
-        logger.info("Selenium use is ENABLED (for search and potentially parsing fallback).")
+        logger.info("Selenium use is ENABLED (last-resort search and parsing fallback).")
         if not SELENIUM_AVAILABLE:
              logger.warning("However, 'selenium' library is NOT installed. Selenium features will be disabled.")
     else:
@@ -0,0 +1,26 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+# scraper6 imports these at module level
+for _module in ('scrapy', 'w3lib', 'dotenv', 'bs4', 'httpx', 'lxml.cssselect'):
+    pytest.importorskip(_module)
+
+_SPEC = importlib.util.spec_from_file_location('scraper6', Path(__file__).resolve().parents[1] / 'oldversback' / 'scraper6.py')
+scraper6 = importlib.util.module_from_spec(_SPEC)
+_SPEC.loader.exec_module(scraper6)
+url_fingerprint = scraper6.url_fingerprint
+
+
+def test_repeated_query_keys_are_distinct():
+    assert url_fingerprint('https://example.com/a?id=1&id=2') != url_fingerprint('https://example.com/a?id=1&id=3')
+
+
+def test_repeated_query_keys_keep_all_values():
+    assert url_fingerprint('https://example.com/a?id=1&id=2') == 'https://example.com/a?id=1&id=2'
+
+
+def test_tracking_params_and_fragment_removed():
+    assert (url_fingerprint('https://example.com/a?b=2&utm_source=x&a=1&fbclid=y#top')
+            == url_fingerprint('https://example.com/a?a=1&b=2'))